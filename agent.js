@@ -5,6 +5,10 @@ class AIAgent {
         this.isActive = false;
         this.sessionId = this.generateSessionId();
         this.currentContext = {};
+        this.socket = null;
+        this.socketOpening = null;
+        this.pendingMessages = new Map();
+        this.nextMessageId = 1;
     }
 
     generateSessionId() {
@@ -41,6 +45,215 @@ class AIAgent {
         }
     }
 
+    // Send a command to the streaming endpoint; onEvent(event, data) is called for each
+    // server-sent event as it arrives, and the final response is returned
+    async sendCommandStream(command, onEvent) {
+        let response;
+        try {
+            response = await fetch(`${this.apiUrl}/command/stream`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream'
+                },
+                body: JSON.stringify({
+                    command: command,
+                    context: this.currentContext,
+                    session_id: this.sessionId
+                })
+            });
+
+            if (!response.ok || !response.body) {
+                throw new Error('API request failed');
+            }
+        } catch (error) {
+            // Streaming unavailable; the command hasn't run, so send it the usual way
+            console.error('Agent stream error:', error);
+            return this.sendCommand(command);
+        }
+
+        try {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let finalResponse = null;
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    let event = 'message';
+                    let data = '';
+                    frame.split('\n').forEach(line => {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    });
+                    if (!data) continue;
+
+                    const payload = JSON.parse(data);
+                    if (event === 'response') {
+                        finalResponse = payload;
+                    } else if (event === 'error') {
+                        throw new Error(payload.detail);
+                    } else if (onEvent) {
+                        onEvent(event, payload);
+                    }
+                }
+            }
+
+            if (!finalResponse) {
+                throw new Error('Stream ended without a response');
+            }
+            return finalResponse;
+        } catch (error) {
+            console.error('Agent stream error:', error);
+            return {
+                action: 'unknown',
+                message: 'Sorry, I couldn\'t process that command. Please try again.',
+                status: 'error'
+            };
+        }
+    }
+
+    // Open (or reuse) the session's WebSocket; resolves to null if it can't be opened
+    connectSocket() {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            return Promise.resolve(this.socket);
+        }
+        if (this.socketOpening) {
+            return this.socketOpening;
+        }
+        if (typeof WebSocket === 'undefined') {
+            return Promise.resolve(null);
+        }
+
+        const url = `${this.apiUrl.replace(/^http/, 'ws')}/ws?session_id=${encodeURIComponent(this.sessionId)}`;
+        this.socketOpening = new Promise(resolve => {
+            const socket = new WebSocket(url);
+            socket.onopen = () => {
+                this.socket = socket;
+                this.socketOpening = null;
+                resolve(socket);
+            };
+            socket.onerror = () => {
+                if (this.socketOpening) {
+                    this.socketOpening = null;
+                    resolve(null);
+                }
+            };
+            socket.onmessage = event => this.handleSocketMessage(JSON.parse(event.data));
+            socket.onclose = () => {
+                if (this.socket === socket) {
+                    this.socket = null;
+                }
+                // Commands in flight are lost with the connection
+                this.pendingMessages.forEach(pending => pending.reject(new Error('Connection closed')));
+                this.pendingMessages.clear();
+            };
+        });
+        return this.socketOpening;
+    }
+
+    handleSocketMessage(message) {
+        const pending = message.id != null ? this.pendingMessages.get(message.id) : undefined;
+
+        switch (message.type) {
+            case 'response':
+            case 'suggestions':
+                if (pending) {
+                    this.pendingMessages.delete(message.id);
+                    pending.resolve(message.type === 'response' ? message.data : message.suggestions);
+                }
+                break;
+
+            case 'event':
+                if (pending && pending.onEvent) {
+                    pending.onEvent(message.event, message.data);
+                }
+                break;
+
+            case 'error':
+                if (pending) {
+                    this.pendingMessages.delete(message.id);
+                    pending.reject(new Error(message.detail));
+                }
+                break;
+
+            case 'cart':
+                this.handleCartUpdate(message.data);
+                break;
+
+            case 'prices':
+                showNotification('Store prices have been updated.');
+                break;
+        }
+    }
+
+    // Send a command over the session's WebSocket, falling back to the streaming HTTP
+    // endpoint if the socket can't be opened. Several commands can be in flight at once;
+    // the server answers them in the order they were sent.
+    async sendCommandLive(command, onEvent) {
+        const socket = await this.connectSocket();
+        if (!socket) {
+            return this.sendCommandStream(command, onEvent);
+        }
+
+        const id = this.nextMessageId++;
+        try {
+            return await new Promise((resolve, reject) => {
+                this.pendingMessages.set(id, { resolve, reject, onEvent });
+                socket.send(JSON.stringify({
+                    type: 'command',
+                    id: id,
+                    command: command,
+                    context: this.currentContext,
+                    stream: Boolean(onEvent)
+                }));
+            });
+        } catch (error) {
+            this.pendingMessages.delete(id);
+            console.error('Agent socket error:', error);
+            return {
+                action: 'unknown',
+                message: 'Sorry, I couldn\'t process that command. Please try again.',
+                status: 'error'
+            };
+        }
+    }
+
+    // The server pushes the cart whenever it changes, including from another tab
+    handleCartUpdate(cart) {
+        this.updateContext('cart_items', cart.cart_items);
+    }
+
+    // Progress updates while a streamed command is being worked out
+    handleStreamEvent(event, data) {
+        switch (event) {
+            case 'candidates':
+                if (data.top_product) {
+                    showNotification(`Top pick so far: ${data.top_product.product}. Checking store prices and reviews...`);
+                }
+                break;
+
+            case 'comparison':
+                showNotification('Comparison ready, summarizing...');
+                break;
+
+            case 'summary':
+                if (data.message) {
+                    showNotification(data.message);
+                }
+                break;
+        }
+    }
+
     processResponse(response) {
         // Handle navigation
         if (response.navigation) {
@@ -628,8 +841,8 @@ async function handleAICommand() {
     // Show processing notification
     showNotification('Processing your request...');
     
-    // Send command to AI agent
-    const response = await aiAgent.sendCommand(command);
+    // Send command to AI agent, showing progress as the answer streams in
+    const response = await aiAgent.sendCommandLive(command, (event, data) => aiAgent.handleStreamEvent(event, data));
     
     // Process the response
     aiAgent.processResponse(response);
@@ -0,0 +1,26 @@
+"""
+Convert the mock product catalog into a memory-mapped catalog file
+
+Usage (from the backend directory):
+    python -m app.convert_catalog catalog.spk
+
+Serve the file by starting the API with SPARK_CATALOG_PATH=catalog.spk.
+"""
+import sys
+
+from app.services.catalog_storage import write_catalog
+from app.services.mock_data import get_mock_products
+
+
+def main(argv) -> int:
+    if len(argv) != 1:
+        print("usage: python -m app.convert_catalog <output path>")
+        return 2
+
+    count = write_catalog(argv[0], get_mock_products())
+    print(f"wrote {count} products to {argv[0]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
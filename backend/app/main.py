@@ -1,11 +1,20 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import agent, comparison, recommendations
+from app.routes import agent, comparison, recommendations, catalog, stores
+from app.services.http_client import close_http_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release the pooled connections of the shared HTTP client
+    await close_http_client()
 
 app = FastAPI(
     title="Spark AI Navigation Agent",
     description="AI-powered navigation agent for Walmart clone",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -21,6 +30,8 @@ app.add_middleware(
 app.include_router(agent.router, prefix="/api/agent", tags=["agent"])
 app.include_router(comparison.router, prefix="/api/agent", tags=["comparison"])
 app.include_router(recommendations.router, prefix="/api/agent", tags=["recommendations"])
+app.include_router(catalog.router, prefix="/api/agent", tags=["catalog"])
+app.include_router(stores.router, prefix="/api/agent", tags=["stores"])
 
 @app.get("/")
 async def root():
@@ -34,7 +45,10 @@ async def root():
             "summarize": "/api/agent/summarize",
             "action": "/api/agent/action",
             "compare": "/api/agent/compare",
-            "recommend": "/api/agent/recommend"
+            "recommend": "/api/agent/recommend",
+            "catalog": "/api/agent/catalog/stats",
+            "store_prices": "/api/agent/stores/prices",
+            "websocket": "/api/agent/ws"
         }
     }
 
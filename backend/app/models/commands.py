@@ -43,5 +43,6 @@ class SummarizeRequest(BaseModel):
 class ActionRequest(BaseModel):
     action_type: str
     product_id: Optional[str] = None
-    quantity: Optional[int] = 1
-    context: Optional[Dict[str, Any]] = {}
\ No newline at end of file
+    quantity: Optional[int] = 1  # remove_from_cart removes every unit when null
+    context: Optional[Dict[str, Any]] = {}
+    session_id: Optional[str] = None
\ No newline at end of file
@@ -1,22 +1,149 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-import httpx
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import uuid
+from pydantic import ValidationError
 from app.models import (
     CommandRequest, AgentResponse, ExtractRequest, 
-    SummarizeRequest, ActionRequest, ActionType
+    SummarizeRequest, ActionRequest, ActionType, NavigationTarget
 )
-from app.services import CommandParser, Navigator, ActionHandler
+from app.services import CachedCommandParser, Navigator, ActionHandler
+from app.services.cart import Cart, CartService
+from app.services.catalog import get_catalog
+from app.services.connections import ConnectionManager
+from app.services.dispatcher import service_dispatcher
+from app.services.order_index import DEFAULT_USER, MAX_PAGE_SIZE
+from app.services.session_store import Session, SessionStore
+from app.services.sqlite_store import get_store
+from app.services.store_locator import parse_location
 
 router = APIRouter()
-parser = CommandParser()
+parser = CachedCommandParser(max_size=1024, ttl_seconds=300)
 navigator = Navigator()
-action_handler = ActionHandler()
+action_handler = ActionHandler(store=get_store())
+sessions = SessionStore(spill=get_store())
+connections = ConnectionManager()
+
+# Seconds between checks for redrawn store prices while clients are connected
+PRICE_CHECK_SECONDS = 5.0
+# Commands a WebSocket client can send ahead before reading from it pauses
+MAX_PIPELINED_COMMANDS = 32
+
+SUGGESTIONS = [
+    # Main Demo Flow - Copy & Paste These in Order:
+    "Show me phones under 50k",
+    "Show me iPhone 13",
+    "Add it to my cart",
+    "Show me OnePlus 11", 
+    "Add it to my cart",
+    "Compare phones in my cart for battery and camera",
+    "What do reviews say?",
+    "Take me to my cart",
+    
+    # Alternative Commands
+    "Show me Samsung phones",
+    "Show my recent orders",
+    "Find phones",
+    "Show me all phones"
+]
+
+def push_cart(session_id: str, cart: Cart) -> None:
+    """Push a session's cart to its open connections after it changed"""
+    if connections.has_connections(session_id):
+        connections.push(session_id, {"type": "cart", "data": cart.snapshot().to_dict()})
+
+carts = CartService(sessions, products=action_handler.mock_products, on_change=push_cart)
+
+async def run_handler(func, *args):
+    """Call an ActionHandler method; database-backed calls run off the event loop"""
+    if action_handler.store is not None:
+        return await action_handler.store.run_async(func, *args)
+    return func(*args)
+
+def current_product_id(context: Dict[str, Any], session: Optional[Session]) -> Any:
+    """Product a command refers to: the page's current product, else the session's"""
+    product_id = context.get("current_product_id")
+    if product_id is None and session is not None:
+        product_id = session.current_product_id
+    return product_id if product_id is not None else "unknown"
+
+# Called as await emit(event, data) when part of a command's answer is ready
+EmitEvent = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+async def ignore_event(event: str, data: Dict[str, Any]) -> None:
+    pass
 
 @router.post("/command", response_model=AgentResponse)
 async def process_command(request: CommandRequest):
     """Process natural language commands from the user"""
+    return await run_command(request)
+
+@router.post("/command/stream")
+async def stream_command(request: CommandRequest):
+    """
+    Process a command, streaming the answer as Server-Sent Events
+    
+    The first event, "action", carries the action and navigation target
+    as soon as the command is parsed. Partial results follow as they are
+    ready ("candidates", "store_prices", "review_analysis", "comparison",
+    "summary"), and the last event is "response" with the full
+    AgentResponse that /command returns, or "error" with a detail.
+    """
+    events: "asyncio.Queue[Optional[tuple]]" = asyncio.Queue()
+    
+    async def emit(event: str, data: Dict[str, Any]) -> None:
+        await events.put((event, data))
+    
+    async def run() -> None:
+        try:
+            response = await run_command(request, emit)
+            await events.put(("response", response))
+        except HTTPException as e:
+            await events.put(("error", {"detail": e.detail}))
+        finally:
+            await events.put(None)
+    
+    async def stream() -> AsyncIterator[str]:
+        task = asyncio.create_task(run())
+        try:
+            while (item := await events.get()) is not None:
+                event, data = item
+                yield f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+        finally:
+            # Stop working on the command if the client went away
+            task.cancel()
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def run_command(request: CommandRequest, emit: EmitEvent = ignore_event) -> AgentResponse:
+    """
+    Process a natural language command
+    
+    Args:
+        request: The command, the page context and the session id
+        emit: Called with each part of the answer as it is ready, for
+            stream_command; the returned response includes them all
+    
+    Returns:
+        The complete response
+    """
     
     try:
+        context = request.context or {}
+        
+        # Server-side state for follow-up commands, when the client sends a session id
+        session = await sessions.get_or_create_async(request.session_id) if request.session_id else None
+        if session is not None and context.get("current_product_id") is not None:
+            session.current_product_id = context["current_product_id"]
+        
         # Parse the command
         action_type, data = parser.parse_command(request.command)
         
@@ -36,10 +163,32 @@ async def process_command(request: CommandRequest):
         
         # Get navigation target if needed
         navigation = navigator.get_navigation_target(action_type, data)
+        if action_type == ActionType.RECOMMEND:
+            # Navigate to products page with budget filter
+            navigation = NavigationTarget(
+                page="products.html",
+                params={
+                    "budget": str(data.get("budget", 30000)),
+                    "aiMode": "true",
+                    "action": "recommend"
+                }
+            )
+        
+        # A streaming client can navigate while the answer is worked out
+        await emit("action", {"action": action_type, "navigation": navigation})
         
         # Process based on action type
         if action_type == ActionType.SEARCH:
-            products = action_handler.search_products(data.get("query", ""))
+            query = data.get("query", "")
+            catalog_version = get_catalog().version
+            
+            # Repeating the session's last search reuses its results
+            products = session.search_results(query, catalog_version) if session is not None else None
+            if products is None:
+                products = await run_handler(action_handler.search_products, query)
+                if session is not None:
+                    session.record_search(query, catalog_version, products)
+            
             return AgentResponse(
                 action=action_type,
                 message=f"Found {len(products)} products for '{data.get('query', '')}'",
@@ -49,20 +198,36 @@ async def process_command(request: CommandRequest):
             )
         
         elif action_type == ActionType.ADD_TO_CART:
-            # Get product ID from context if available
-            product_id = request.context.get("current_product_id", "unknown")
-            result = action_handler.add_to_cart(product_id)
+            # Get product ID from context, or the session's current product
+            product_id = current_product_id(context, session)
+            if session is None:
+                return AgentResponse(
+                    action=action_type,
+                    message="Carts are kept per session; send a session_id to add items.",
+                    status="error"
+                )
+            
+            try:
+                result = carts.add(session.session_id, product_id)
+            except ValueError:
+                return AgentResponse(
+                    action=action_type,
+                    message="I'm not sure which product to add. Search for a product first.",
+                    status="error",
+                    suggestions=["Show me iPhone 13", "Show me phones under 50k"]
+                )
+            result["cart_items"] = session.cart.snapshot().product_ids
             
             return AgentResponse(
                 action=action_type,
                 message=result["message"],
                 data=result,
-                status="success" if result["success"] else "error"
+                status="success"
             )
         
         elif action_type == ActionType.SUMMARIZE:
-            # Get product ID from context
-            product_id = request.context.get("current_product_id", "unknown")
+            # Get product ID from context, or the session's current product
+            product_id = current_product_id(context, session)
             review_summary = action_handler.get_review_summary(product_id)
             
             return AgentResponse(
@@ -74,13 +239,20 @@ async def process_command(request: CommandRequest):
             )
         
         elif action_type == ActionType.SHOW_ORDERS:
-            orders = action_handler.get_recent_orders(data.get("count", 10))
+            # A client paging through the history sends back the previous page's next_cursor
+            cursor = context.get("orders_cursor")
+            try:
+                page = await run_handler(action_handler.get_orders, DEFAULT_USER, data.get("count", 10), cursor)
+            except ValueError:
+                cursor = None
+                page = await run_handler(action_handler.get_orders, DEFAULT_USER, data.get("count", 10))
+            orders = page["orders"]
             
             return AgentResponse(
                 action=action_type,
-                message=f"Here are your last {len(orders)} orders",
+                message=f"Here are {len(orders)} more orders" if cursor else f"Here are your last {len(orders)} orders",
                 navigation=navigation,
-                data={"orders": orders},
+                data={"orders": orders, "next_cursor": page["next_cursor"]},
                 status="success"
             )
         
@@ -94,73 +266,57 @@ async def process_command(request: CommandRequest):
         
         elif action_type == ActionType.COMPARE:
             # Handle product comparison
-            cart_items = request.context.get("cart_items", [])
-            criteria = data.get("criteria", ["performance", "camera", "battery"])
+            criteria = data.get("criteria") or ["performance", "camera", "battery"]
             
-            # DEMO HACK: Predefined comparison for iPhone 13 vs OnePlus 11
-            comparison_data = {
-                "comparison": {
-                    "product_13": {
-                        "name": "iPhone 13",
-                        "price": 45999,
-                        "specs": {
-                            "battery": "3227 mAh",
-                            "camera": "12MP Dual Camera"
-                        },
-                        "review_analysis": {
-                            "battery": {
-                                "average_rating": 4.2,
-                                "mention_count": 523
-                            },
-                            "camera": {
-                                "average_rating": 4.8,
-                                "mention_count": 892
-                            }
-                        }
-                    },
-                    "product_14": {
-                        "name": "OnePlus 11",
-                        "price": 38999,
-                        "specs": {
-                            "battery": "5000 mAh",
-                            "camera": "50MP Triple Camera"
-                        },
-                        "review_analysis": {
-                            "battery": {
-                                "average_rating": 4.6,
-                                "mention_count": 412
-                            },
-                            "camera": {
-                                "average_rating": 4.5,
-                                "mention_count": 734
-                            }
-                        }
-                    }
-                },
-                "summary": "Comparing iPhone 13 vs OnePlus 11:\n\nBattery:\n- iPhone 13: 3227 mAh (User rating: 4.2/5)\n- OnePlus 11: 5000 mAh (User rating: 4.6/5)\n\nCamera:\n- iPhone 13: 12MP Dual Camera (User rating: 4.8/5)\n- OnePlus 11: 50MP Triple Camera (User rating: 4.5/5)",
-                "recommendation": {
-                    "recommended_product": "OnePlus 11",
-                    "reason": "OnePlus 11 offers better battery life with 5000 mAh and excellent camera performance at a lower price of ₹38,999.",
-                    "scores": {
-                        "iPhone 13": {
-                            "total": 85,
-                            "criteria_scores": {"battery": 75, "camera": 95}
-                        },
-                        "OnePlus 11": {
-                            "total": 88,
-                            "criteria_scores": {"battery": 92, "camera": 85}
-                        }
-                    }
-                },
-                "winner_by_criteria": {
-                    "battery": "OnePlus 11",
-                    "camera": "iPhone 13"
-                }
-            }
+            snapshot = None
+            product_ids = []
+            if data.get("product1") and data.get("product2"):
+                # Named products, e.g. "compare iPhone 13 and OnePlus 11"
+                named_products = [
+                    service_dispatcher.find_product_by_name(data["product1"]),
+                    service_dispatcher.find_product_by_name(data["product2"])
+                ]
+                product_ids = list(dict.fromkeys(p["id"] for p in named_products if p))
+            
+            if len(product_ids) < 2:
+                # No names, or names that don't resolve to two phones: the cart or the last comparison
+                if context.get("cart_items"):
+                    product_ids = context["cart_items"]
+                elif session is not None and session.cart:
+                    # The session's cart, compared from its snapshot's product records
+                    snapshot = session.cart.snapshot()
+                    product_ids = snapshot.product_ids
+                elif session is not None and session.comparison:
+                    # "Compare them for battery": the products of the last comparison
+                    product_ids = session.comparison["product_ids"]
+            
+            try:
+                if snapshot is not None:
+                    comparison_data = await service_dispatcher.compare_cart_async(snapshot, criteria)
+                else:
+                    comparison_data = await service_dispatcher.compare_async(product_ids, criteria)
+            except ValueError as e:
+                return AgentResponse(
+                    action=action_type,
+                    message=f"{e}. Add phones to your cart or name two phones to compare.",
+                    status="error",
+                    suggestions=["Show me phones under 50k", "Compare iPhone 13 and OnePlus 11"]
+                )
+            
+            if session is not None:
+                session.comparison = {"product_ids": list(product_ids), "criteria": criteria}
+            
+            await emit("comparison", {
+                "comparison": comparison_data["comparison"],
+                "winner_by_criteria": comparison_data["winner_by_criteria"]
+            })
+            await emit("summary", {"summary": comparison_data.get("summary", "")})
+            
+            product_names = [product["name"] for product in comparison_data["comparison"].values()]
             
             return AgentResponse(
                 action=action_type,
-                message="Here's the detailed comparison of iPhone 13 vs OnePlus 11:",
+                message=f"Here's the detailed comparison of {' vs '.join(product_names)}:",
                 data=comparison_data,
                 summary=comparison_data.get("summary", ""),
                 status="success"
@@ -171,13 +327,33 @@ async def process_command(request: CommandRequest):
             budget = data.get("budget", 30000)
             priorities = data.get("priorities", ["performance", "camera", "battery"])
             
-            # Make internal API call to recommendation endpoint
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "http://localhost:8000/api/agent/recommend",
-                    json={"budget": budget, "priorities": priorities, "include_stores": True}
+            # Call the recommender in-process, passing on each step as it completes
+            try:
+                async for event in service_dispatcher.stream_recommend(
+                    budget=budget,
+                    priorities=priorities,
+                    include_stores=True,
+                    location=parse_location(context.get("location"))
+                ):
+                    if event["event"] == "candidates":
+                        await emit("candidates", {
+                            "top_product": event["recommendations"][0],
+                            "recommendations": event["recommendations"]
+                        })
+                    elif event["event"] == "result":
+                        recommendation_data = event["result"]
+                    else:
+                        await emit(event["event"], {
+                            "product_id": event["product_id"],
+                            "status": event["status"],
+                            event["event"]: event["value"]
+                        })
+            except ValueError as e:
+                return AgentResponse(
+                    action=action_type,
+                    message=str(e),
+                    status="error"
                 )
-                recommendation_data = response.json()
             
             best_choice = recommendation_data.get("best_choice")
             message = f"Based on your ₹{budget} budget and priorities ({', '.join(priorities)}), "
@@ -185,16 +361,9 @@ async def process_command(request: CommandRequest):
                 message += f"I recommend the {best_choice['product']}."
             else:
                 message += "I couldn't find suitable options."
-            
-            # Navigate to products page with budget filter
-            navigation = NavigationTarget(
-                page="products.html",
-                params={
-                    "budget": str(budget),
-                    "aiMode": "true",
-                    "action": "recommend"
-                }
-            )
+            if recommendation_data.get("partial"):
+                message += " Some store prices or review details took too long and were left out."
+            await emit("summary", {"message": message})
             
             return AgentResponse(
                 action=action_type,
@@ -275,19 +444,23 @@ async def summarize_content(request: SummarizeRequest):
 async def perform_action(request: ActionRequest):
     """Perform specific actions like add to cart"""
     
-    if request.action_type == "add_to_cart":
-        result = action_handler.add_to_cart(
-            request.product_id or "unknown",
-            request.quantity
-        )
-        return result
-    
-    elif request.action_type == "remove_from_cart":
-        return {
-            "success": True,
-            "message": "Item removed from cart",
-            "cart_total_items": 2
-        }
+    if request.action_type in ("add_to_cart", "remove_from_cart"):
+        if not request.session_id:
+            raise HTTPException(status_code=400, detail="session_id is required for cart actions")
+        if request.product_id is None:
+            raise HTTPException(status_code=400, detail="product_id is required for cart actions")
+        
+        # Bring a spilled session back off the event loop before touching its cart
+        await sessions.get_or_create_async(request.session_id)
+        
+        try:
+            if request.action_type == "add_to_cart":
+                return carts.add(request.session_id, request.product_id, 1 if request.quantity is None else request.quantity)
+            return carts.remove(request.session_id, request.product_id, request.quantity)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=e.args[0])
     
     else:
         return {
@@ -299,22 +472,183 @@ async def perform_action(request: ActionRequest):
 async def get_suggestions():
     """Get command suggestions for users - Demo flow optimized"""
     
+    return {"suggestions": SUGGESTIONS}
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss counters for the command parse and comparison caches, and session counts"""
+    
     return {
-        "suggestions": [
-            # Main Demo Flow - Copy & Paste These in Order:
-            "Show me phones under 50k",
-            "Show me iPhone 13",
-            "Add it to my cart",
-            "Show me OnePlus 11", 
-            "Add it to my cart",
-            "Compare phones in my cart for battery and camera",
-            "What do reviews say?",
-            "Take me to my cart",
+        "parse_cache": parser.cache.stats(),
+        "comparison_cache": service_dispatcher.comparison_cache.stats(),
+        "sessions": sessions.stats(),
+        "connections": connections.stats()
+    }
+
+@router.get("/orders")
+async def get_orders(
+    limit: int = Query(default=10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    since: Optional[str] = Query(default=None, description="Earliest order date, YYYY-MM-DD"),
+    until: Optional[str] = Query(default=None, description="Latest order date, YYYY-MM-DD"),
+    status: Optional[str] = Query(default=None, description="Comma-separated statuses, e.g. Delivered,In Transit")
+):
+    """
+    Get a page of the user's orders, newest first
+    
+    Follow next_cursor to fetch the next page; it is null on the last page.
+    """
+    for value in (since, until):
+        if value is not None:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date: {value} (expected YYYY-MM-DD)")
+    statuses = [s.strip() for s in status.split(",") if s.strip()] if status else None
+    
+    try:
+        return await run_handler(action_handler.get_orders, DEFAULT_USER, limit, cursor, since, until, statuses)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/cart/{session_id}")
+async def get_cart(session_id: str):
+    """Get a session's cart: its lines and running totals"""
+    
+    session = await sessions.get_async(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session.cart.snapshot().to_dict()
+
+@router.get("/session/{session_id}")
+async def get_session(session_id: str):
+    """Get the server-side state kept for a session"""
+    
+    session = await sessions.get_async(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session.to_dict()
+
+@router.delete("/session/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a session's server-side state"""
+    
+    if not await sessions.delete_async(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "success", "session_id": session_id}
+
+@router.websocket("/ws")
+async def agent_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    Persistent channel for the voice agent, one per session
+    
+    Client messages (JSON):
+        {"type": "command", "id": .., "command": "..", "context": {..}, "stream": false}
+        {"type": "suggestions", "id": ..}
+        {"type": "ping", "id": ..}
+    
+    Server messages:
+        {"type": "session", "session_id": ..}  on connecting
+        {"type": "response", "id": .., "data": <AgentResponse>}
+        {"type": "event", "id": .., "event": .., "data": ..}  partial results, with "stream": true
+        {"type": "suggestions", "id": .., "suggestions": [..]}
+        {"type": "pong", "id": ..}
+        {"type": "error", "id": .., "detail": ..}
+        {"type": "cart", "data": <cart>}  pushed when the session's cart changes
+        {"type": "prices", "catalog_version": .., "epoch": ..}  pushed when store prices change
+    
+    Commands run one at a time in the order they arrive, so a client can
+    send several without waiting for each answer and "add it to my cart"
+    still follows the search before it. Replies carry the id of the
+    message they answer.
+    """
+    await websocket.accept()
+    session_id = session_id or f"ws_{uuid.uuid4().hex}"
+    connection = connections.connect(session_id, websocket.send_text)
+    inbox: "asyncio.Queue[str]" = asyncio.Queue(maxsize=MAX_PIPELINED_COMMANDS)
+    tasks = [
+        asyncio.create_task(connection.write()),
+        asyncio.create_task(handle_messages(session_id, connection, inbox))
+    ]
+    start_price_watcher()
+    
+    await connection.reply({"type": "session", "session_id": session_id})
+    try:
+        while True:
+            await inbox.put(await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        connections.disconnect(connection)
+        for task in tasks:
+            task.cancel()
+
+async def handle_messages(session_id: str, connection, inbox: "asyncio.Queue[str]") -> None:
+    """Answer a WebSocket client's messages in order"""
+    while True:
+        text = await inbox.get()
+        try:
+            message = json.loads(text)
+            if not isinstance(message, dict):
+                raise ValueError
+        except ValueError:
+            await connection.reply({"type": "error", "id": None, "detail": "Messages must be JSON objects"})
+            continue
+        
+        message_id = message.get("id")
+        message_type = message.get("type")
+        
+        if message_type == "command":
+            try:
+                request = CommandRequest(
+                    command=message.get("command"),
+                    context=message.get("context") or {},
+                    session_id=session_id
+                )
+            except ValidationError:
+                await connection.reply({"type": "error", "id": message_id, "detail": "command must be a string"})
+                continue
             
-            # Alternative Commands
-            "Show me Samsung phones",
-            "Show my recent orders",
-            "Find phones",
-            "Show me all phones"
-        ]
-    }
\ No newline at end of file
+            emit = ignore_event
+            if message.get("stream"):
+                async def emit(event: str, data: Dict[str, Any]) -> None:
+                    await connection.reply({"type": "event", "id": message_id, "event": event, "data": jsonable_encoder(data)})
+            
+            try:
+                response = await run_command(request, emit)
+                await connection.reply({"type": "response", "id": message_id, "data": response.model_dump(mode="json")})
+            except HTTPException as e:
+                await connection.reply({"type": "error", "id": message_id, "detail": e.detail})
+        
+        elif message_type == "suggestions":
+            await connection.reply({"type": "suggestions", "id": message_id, "suggestions": SUGGESTIONS})
+        
+        elif message_type == "ping":
+            await connection.reply({"type": "pong", "id": message_id})
+        
+        else:
+            await connection.reply({"type": "error", "id": message_id, "detail": f"Unknown message type: {message_type}"})
+
+_price_watcher: Optional[asyncio.Task] = None
+
+def start_price_watcher() -> None:
+    """Start watch_prices unless it is already running"""
+    global _price_watcher
+    if _price_watcher is None or _price_watcher.done():
+        _price_watcher = asyncio.create_task(watch_prices())
+
+async def watch_prices() -> None:
+    """Push an update to every connection when store prices are redrawn or the catalog is swapped"""
+    locator = service_dispatcher.recommender.store_locator
+    last = (get_catalog().version, locator.current_epoch())
+    while len(connections):
+        await asyncio.sleep(min(PRICE_CHECK_SECONDS, locator.seconds_until_refresh()))
+        current = (get_catalog().version, locator.current_epoch())
+        if current != last:
+            last = current
+            connections.broadcast({
+                "type": "prices",
+                "catalog_version": current[0],
+                "epoch": current[1],
+                "refresh_in": locator.seconds_until_refresh()
+            })
@@ -0,0 +1,33 @@
+"""
+Catalog API Routes
+"""
+from fastapi import APIRouter, HTTPException
+
+from ..services.catalog import get_catalog, reload_catalog
+
+
+router = APIRouter()
+
+
+@router.get("/catalog/stats")
+async def get_catalog_stats():
+    """
+    Get the catalog version, product count and memory per product
+    """
+    return get_catalog().memory_report()
+
+
+@router.post("/catalog/reload")
+async def reload_product_catalog():
+    """
+    Reload the product catalog and hot-swap it in without a restart
+    """
+    try:
+        catalog = reload_catalog()
+        return {
+            "status": "success",
+            "version": catalog.version,
+            "products": len(catalog)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -5,8 +5,7 @@ from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any
 from pydantic import BaseModel
 
-from ..services.comparator import ProductComparator
-from ..services.actions import get_mock_products
+from ..services.dispatcher import service_dispatcher
 
 
 class ComparisonRequest(BaseModel):
@@ -23,7 +22,6 @@ class ComparisonResponse(BaseModel):
 
 
 router = APIRouter()
-comparator = ProductComparator()
 
 
 @router.post("/compare", response_model=ComparisonResponse)
@@ -32,24 +30,8 @@ async def compare_products(request: ComparisonRequest):
     Compare multiple products based on specified criteria
     """
     try:
-        # Get product data for the requested items
-        all_products = get_mock_products()
-        
-        # Filter to get only the products in cart
-        cart_products = []
-        for product_id in request.cart_items:
-            product = next((p for p in all_products if str(p['id']) == product_id), None)
-            if product:
-                cart_products.append(product)
-        
-        if len(cart_products) < 2:
-            raise HTTPException(
-                status_code=400, 
-                detail="At least 2 products are required for comparison"
-            )
-        
-        # Perform comparison
-        comparison_result = comparator.compare_products(cart_products, request.criteria)
+        # Compare the cart products, reusing a cached result when available
+        comparison_result = await service_dispatcher.compare_async(request.cart_items, request.criteria)
         
         return ComparisonResponse(
             comparison=comparison_result['comparison'],
@@ -58,6 +40,8 @@ async def compare_products(request: ComparisonRequest):
             winner_by_criteria=comparison_result['winner_by_criteria']
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3,22 +3,26 @@ Product Recommendation API Routes
 """
 from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from ..services.recommender import ProductRecommender
-from ..services.actions import get_mock_products
+from ..services.dispatcher import service_dispatcher
+from ..services.store_locator import parse_location
 
 
 class RecommendationRequest(BaseModel):
     budget: float
     priorities: List[str]  # e.g., ['camera', 'storage', 'gaming']
     include_stores: bool = True
+    include_reviews: bool = True  # Review analysis for the priorities, per product
+    top_k: int = Field(default=3, ge=1, le=50)  # Number of recommendations to return
+    location: Optional[Any] = None  # {"lat": .., "lon": ..} for stores near the user
 
 
 class StorePrice(BaseModel):
     store: str
     store_id: int
     distance: str
+    distance_km: float
     price: float
     availability: str
     savings: float
@@ -32,6 +36,7 @@ class ProductRecommendation(BaseModel):
     overall_score: float
     value_score: float
     store_prices: Optional[List[Dict[str, Any]]] = None
+    review_analysis: Optional[Dict[str, Dict[str, Any]]] = None
 
 
 class BestChoice(BaseModel):
@@ -48,11 +53,12 @@ class RecommendationResponse(BaseModel):
     best_choice: Optional[BestChoice]
     priorities_analyzed: List[str]
     budget: float
+    partial: bool = False  # True when some store or review lookups timed out
+    incomplete: List[Dict[str, Any]] = []
     status: str = "success"
 
 
 router = APIRouter()
-recommender = ProductRecommender()
 
 
 @router.post("/recommend", response_model=RecommendationResponse)
@@ -61,31 +67,20 @@ async def get_recommendations(request: RecommendationRequest):
     Get product recommendations based on budget and priorities
     """
     try:
-        # Validate priorities
-        valid_priorities = ['camera', 'storage', 'gaming', 'battery', 'display', 'performance']
-        invalid_priorities = [p for p in request.priorities if p not in valid_priorities]
-        
-        if invalid_priorities:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid priorities: {invalid_priorities}. Valid options: {valid_priorities}"
-            )
-        
-        # Get all products
-        all_products = get_mock_products()
-        
-        # Get recommendations
-        result = recommender.get_budget_recommendations(
-            products=all_products,
+        # Get recommendations (priorities are validated by the dispatcher)
+        result = await service_dispatcher.recommend_async(
             budget=request.budget,
             priorities=request.priorities,
-            include_stores=request.include_stores
+            include_stores=request.include_stores,
+            include_reviews=request.include_reviews,
+            top_k=request.top_k,
+            location=parse_location(request.location)
         )
         
         return RecommendationResponse(**result)
         
-    except HTTPException:
-        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -140,10 +135,8 @@ async def quick_recommendation(budget: float):
         # Use balanced priorities for quick recommendation
         default_priorities = ['performance', 'camera', 'battery']
         
-        all_products = get_mock_products()
-        
-        result = recommender.get_budget_recommendations(
-            products=all_products,
+        result = await service_dispatcher.run_blocking(
+            service_dispatcher.recommend,
             budget=budget,
             priorities=default_priorities,
             include_stores=True
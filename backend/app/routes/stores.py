@@ -0,0 +1,117 @@
+"""
+Store Price API Routes
+"""
+from typing import Any, List, Optional, Union
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field
+
+from ..services.catalog import get_catalog
+from ..services.dispatcher import service_dispatcher
+from ..services.store_locator import parse_location
+
+
+class DealItem(BaseModel):
+    product_id: Union[int, str]
+    online_price: Optional[float] = Field(default=None, gt=0)  # Defaults to the catalog price
+
+
+class BestDealsRequest(BaseModel):
+    items: List[DealItem] = Field(..., min_length=1, max_length=500)
+    location: Optional[Any] = None  # {"lat": .., "lon": ..} for stores near the user
+
+
+router = APIRouter()
+
+
+@router.get("/stores/prices")
+async def get_store_prices(
+    request: Request,
+    response: Response,
+    product_ids: str = Query(..., description="Comma-separated product ids, e.g. 1,2,13"),
+    limit: int = Query(default=3, ge=1, le=10),
+    lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    lon: Optional[float] = Query(default=None, ge=-180, le=180)
+):
+    """
+    Get nearby store prices and availability for products
+
+    Pass lat and lon for stores near the user; otherwise stores near the
+    default location are used. Prices are fixed for the current price
+    epoch, so the response carries Cache-Control and ETag headers for
+    browsers and CDNs to reuse it until the prices are redrawn.
+    """
+    ids = [product_id.strip() for product_id in product_ids.split(',') if product_id.strip()]
+    if not ids:
+        raise HTTPException(status_code=400, detail="product_ids is required")
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="lat and lon must be given together")
+    location = (lat, lon) if lat is not None else None
+
+    catalog = get_catalog()
+    locator = service_dispatcher.recommender.store_locator
+    matrix = locator.price_matrix()
+
+    etag = f'"prices-{catalog.version}-{matrix.epoch}"'
+    headers = {
+        "Cache-Control": f"public, max-age={locator.seconds_until_refresh()}",
+        "ETag": etag
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    prices = {}
+    missing = []
+    for product_id in ids:
+        product = catalog.get(product_id)
+        if product is None:
+            missing.append(product_id)
+            continue
+        prices[str(product['id'])] = {
+            "product": product['name'],
+            "online_price": product['price'],
+            "stores": locator.get_nearby_stores_with_prices(
+                product['id'], product['price'], limit=limit, location=location
+            )
+        }
+
+    return {
+        "prices": prices,
+        "missing": missing,
+        "epoch": matrix.epoch,
+        "catalog_version": catalog.version
+    }
+
+
+@router.post("/stores/best-deals")
+async def get_best_deals(request: BestDealsRequest):
+    """
+    Get the best nearby store deal for each of several products
+
+    Deals for all products (e.g. a cart or a results page) are scored in
+    one pass; see StoreLocator.calculate_best_deals.
+    """
+    try:
+        location = parse_location(request.location)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    catalog = get_catalog()
+    items = []
+    missing = []
+    for item in request.items:
+        if item.online_price is not None:
+            items.append((item.product_id, item.online_price))
+            continue
+        product = catalog.get(item.product_id)
+        if product is None:
+            missing.append(item.product_id)
+        else:
+            items.append((product['id'], product['price']))
+
+    locator = service_dispatcher.recommender.store_locator
+    return {
+        "deals": locator.calculate_best_deals(items, location=location),
+        "missing": missing,
+        "epoch": locator.price_matrix().epoch
+    }
@@ -1,3 +1,3 @@
-from .parser import CommandParser
+from .parser import CommandParser, CachedCommandParser
 from .navigator import Navigator
 from .actions import ActionHandler
\ No newline at end of file
@@ -1,11 +1,38 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Tuple
+import hashlib
 import random
-from .mock_data import get_mock_products
+import re
+import threading
+from .catalog import get_catalog
+from .search_index import ProductSearchIndex
+from .order_index import DEFAULT_PAGE_SIZE, DEFAULT_USER, MAX_PAGE_SIZE, OrderIndex
+from .sqlite_store import SQLiteStore
+
+
+# Trailing budget in a search query, e.g. "phones under 30k"
+BUDGET_PATTERN = re.compile(r'\s*\b(?:under|below|within|less than)\s+[$₹]?(\d+(?:\.\d+)?)\s*(k)?\s*$', re.IGNORECASE)
+
+
+def products_signature(products: Iterable[Mapping[str, Any]]) -> str:
+    """Fingerprint of the product fields a store serves, to tell whether it is current"""
+    digest = hashlib.blake2b(digest_size=16)
+    for product in products:
+        digest.update(repr((
+            product['id'], product['name'], product['price'],
+            product.get('rating'), product.get('reviews_count'), len(product.get('reviews', ()))
+        )).encode())
+    return digest.hexdigest()
 
 class ActionHandler:
     """Handle various agent actions"""
     
-    def __init__(self):
+    def __init__(self, store: Optional[SQLiteStore] = None):
+        """
+        Args:
+            store: Optional SQLite store to query instead of the in-memory mocks
+        """
+        self.store = store
+        
         # Mock data for demo
         self.mock_products = {
             "iphone-13": {
@@ -54,18 +81,59 @@ class ActionHandler:
                 "status": "In Transit"
             }
         ]
+        
+        self.order_index = OrderIndex(self.mock_orders)
+        
+        # Search and price indexes over the phone catalog and the demo products above
+        self._catalog_version: Optional[int] = None
+        self._refresh_indexes()
+        
+        # Keep the database's products in step with the catalog; seed a new one's orders
+        self._store_version: Optional[int] = None
+        self._store_lock = threading.Lock()
+        if self.store is not None:
+            seed_orders = self.store.is_empty()
+            self.sync_store()
+            if seed_orders:
+                self.store.load_orders(self.mock_orders)
     
-    def add_to_cart(self, product_id: str, quantity: int = 1) -> Dict[str, Any]:
-        """Simulate adding item to cart"""
+    def _refresh_indexes(self) -> None:
+        """(Re)build the search index when the shared catalog changed"""
+        catalog = get_catalog()
+        if catalog.version == self._catalog_version:
+            return
         
-        # Mock successful addition
-        return {
-            "success": True,
-            "product_id": product_id,
-            "quantity": quantity,
-            "cart_total_items": random.randint(1, 5),
-            "message": f"Added {quantity} item(s) to your cart"
-        }
+        searchable_products = self._searchable_products(catalog)
+        self.search_index = ProductSearchIndex.from_products(searchable_products)
+        self._catalog_version = catalog.version
+    
+    def sync_store(self) -> None:
+        """
+        Reload the store's products when the shared catalog changed
+        
+        A store already holding this catalog's products (same signature,
+        e.g. after a restart) is left alone. Blocks on the database; call
+        it off the event loop.
+        """
+        catalog = get_catalog()
+        if self.store is None or catalog.version == self._store_version:
+            return
+        
+        with self._store_lock:
+            if catalog.version == self._store_version:
+                return
+            products = self._searchable_products(catalog)
+            self.store.sync_products(products, products_signature(products))
+            self._store_version = catalog.version
+    
+    def _searchable_products(self, catalog) -> List[Dict[str, Any]]:
+        """Products indexed for search"""
+        products = list(catalog.products)
+        
+        for product_id, product in self.mock_products.items():
+            products.append({"id": product_id, **product})
+        
+        return products
     
     def get_product_summary(self, product_id: str) -> str:
         """Get a summary of product information"""
@@ -106,38 +174,63 @@ class ActionHandler:
         }
     
     def get_recent_orders(self, count: int = 10) -> List[Dict[str, Any]]:
-        """Get recent orders (mocked)"""
+        """Get recent orders (mocked unless a store is configured)"""
+        return self.get_orders(limit=count)["orders"]
+    
+    def get_orders(
+        self,
+        user_id: str = DEFAULT_USER,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        statuses: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a page of a user's orders, newest first
         
-        # Return mock orders up to requested count
-        return self.mock_orders[:min(count, len(self.mock_orders))]
+        Args:
+            user_id: Whose orders
+            limit: Page size (at most MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page, or None for the first page
+            since: Earliest order date to include (YYYY-MM-DD)
+            until: Latest order date to include (YYYY-MM-DD)
+            statuses: Only orders with one of these statuses (case-insensitive)
+            
+        Returns:
+            {'orders': [...], 'next_cursor': cursor or None}
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        orders = self.store if self.store is not None else self.order_index
+        return orders.get_orders(user_id, max(1, min(limit, MAX_PAGE_SIZE)), cursor, since, until, statuses)
     
-    def search_products(self, query: str) -> List[Dict[str, Any]]:
-        """Search for products (mocked)"""
+    def search_products(self, query: str, limit: int = 10, fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """Search for products ranked by relevance, tolerating speech-to-text typos"""
         
-        query_lower = query.lower()
-        results = []
+        query, max_price = self._split_budget(query)
         
-        # Simple keyword matching
-        for product_id, product in self.mock_products.items():
-            if query_lower in product["name"].lower():
-                results.append({
-                    "id": product_id,
-                    "name": product["name"],
-                    "price": product["price"],
-                    "rating": product["rating"],
-                    "match_score": 0.9
-                })
-        
-        # If no exact matches, return some products anyway (simulating fuzzy search)
-        if not results:
-            results = [
-                {
-                    "id": list(self.mock_products.keys())[0],
-                    "name": list(self.mock_products.values())[0]["name"],
-                    "price": list(self.mock_products.values())[0]["price"],
-                    "rating": list(self.mock_products.values())[0]["rating"],
-                    "match_score": 0.6
-                }
-            ]
-        
-        return results
\ No newline at end of file
+        if self.store is not None:
+            # Full-text search in the database (no typo tolerance)
+            self.sync_store()
+            if max_price is not None and not query:
+                return self.store.products_under(max_price, limit=limit)
+            return self.store.search_products(query, limit=limit, max_price=max_price)
+        
+        self._refresh_indexes()
+        
+        # "under 30k" on its own: everything within budget, priciest first
+        if max_price is not None and not query:
+            return self.search_index.under_budget(max_price, limit=limit)
+        
+        return self.search_index.search(query, limit=limit, fuzzy=fuzzy, max_price=max_price)
+    
+    def _split_budget(self, query: str) -> Tuple[str, Optional[float]]:
+        """Separate a trailing "under X" budget from a search query"""
+        match = BUDGET_PATTERN.search(query)
+        if not match:
+            return query, None
+        
+        budget = float(match.group(1)) * (1000 if match.group(2) else 1)
+        return query[:match.start()].strip(), budget
\ No newline at end of file
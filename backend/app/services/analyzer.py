@@ -4,6 +4,9 @@ Review Analysis Service for extracting insights from product reviews
 from typing import Dict, List, Any
 import re
 from collections import defaultdict
+from .catalog import get_catalog
+from .review_index import ReviewFeatureIndex
+from .keyword_matcher import KeywordMatcher
 
 
 class ReviewAnalyzer:
@@ -25,6 +28,57 @@ class ReviewAnalyzer:
             'negative': ['poor', 'bad', 'terrible', 'worst', 'hate', 'disappointing', 'awful', 'horrible',
                         'mediocre', 'slow', 'issue', 'problem', 'fails']
         }
+        
+        # One matcher for every feature and sentiment keyword
+        keyword_groups = {('feature', feature): keywords for feature, keywords in self.feature_keywords.items()}
+        keyword_groups.update({('sentiment', polarity): words for polarity, words in self.sentiment_words.items()})
+        self.keyword_matcher = KeywordMatcher(keyword_groups)
+        
+        self.feature_index = ReviewFeatureIndex(self)
+        
+        # Optional SQLiteStore; when set, reviews are read from the database
+        self.review_store = None
+    
+    def analyze_product_features(self, product: Dict[str, Any], features: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze a product's reviews for specific features using the precomputed index
+        
+        Args:
+            product: Product dictionary with 'id' and 'reviews' fields
+            features: List of features to analyze (e.g., ['battery', 'camera'])
+            
+        Returns:
+            Dictionary with feature analysis results
+        """
+        if self.review_store is not None:
+            analysis = self.feature_index.get_stored([product['id']], features, self.review_store, get_catalog().version)
+            return analysis.get(product['id']) or self.analyze_reviews_for_features([], features)
+        return self.feature_index.get(product, features)
+    
+    def analyze_products_for_features(self, products: List[Dict[str, Any]], features: List[str]) -> Dict[Any, Dict[str, Dict[str, Any]]]:
+        """
+        Analyze several products for several features in one call
+        
+        Each product's reviews are scanned at most once for all features
+        (and not at all if the feature index is already warm).
+        
+        Args:
+            products: Product dictionaries with 'id' and 'reviews' fields
+            features: List of features to analyze
+            
+        Returns:
+            Dictionary of product id -> feature analysis results, for every
+            product that has reviews
+        """
+        if self.review_store is not None:
+            return self.feature_index.get_stored(
+                [product['id'] for product in products], features, self.review_store, get_catalog().version
+            )
+        return {
+            product['id']: self.feature_index.get(product, features)
+            for product in products
+            if 'reviews' in product
+        }
     
     def analyze_reviews_for_features(self, reviews: List[Dict[str, Any]], features: List[str]) -> Dict[str, Dict[str, Any]]:
         """
@@ -37,46 +91,57 @@ class ReviewAnalyzer:
         Returns:
             Dictionary with feature analysis results
         """
+        # Running tallies per requested feature:
+        # [mention count, rating sum, positive, negative, first mentioning reviews]
+        tallies = {
+            ('feature', feature): [0, 0, 0, 0, []]
+            for feature in features
+            if feature in self.feature_keywords
+        }
+        
+        # Scan each review once for all feature and sentiment keywords
+        for review in reviews:
+            review_text = review.get('text', '').lower()
+            hits = self.keyword_matcher.scan(review_text)
+            sentiment = None
+            
+            for label in hits:
+                tally = tallies.get(label)
+                if tally is None:
+                    continue
+                
+                if sentiment is None:
+                    sentiment = self._sentiment_from_hits(hits)
+                
+                tally[0] += 1
+                tally[1] += review.get('rating', 3)
+                if sentiment > 0:
+                    tally[2] += 1
+                elif sentiment < 0:
+                    tally[3] += 1
+                if len(tally[4]) < 3:
+                    tally[4].append(review_text)
+        
         results = {}
         
         for feature in features:
-            if feature not in self.feature_keywords:
+            tally = tallies.get(('feature', feature))
+            if tally is None:
                 continue
-                
-            feature_mentions = []
-            feature_ratings = []
-            positive_count = 0
-            negative_count = 0
-            
-            keywords = self.feature_keywords[feature]
             
-            for review in reviews:
-                review_text = review.get('text', '').lower()
-                review_rating = review.get('rating', 3)
-                
-                # Check if review mentions this feature
-                if any(keyword in review_text for keyword in keywords):
-                    feature_mentions.append(review_text)
-                    feature_ratings.append(review_rating)
-                    
-                    # Analyze sentiment
-                    sentiment = self._analyze_sentiment(review_text)
-                    if sentiment > 0:
-                        positive_count += 1
-                    elif sentiment < 0:
-                        negative_count += 1
+            mention_count, rating_sum, positive_count, negative_count, mentions = tally
             
-            if feature_mentions:
-                avg_rating = sum(feature_ratings) / len(feature_ratings)
-                sentiment_score = (positive_count - negative_count) / len(feature_mentions)
+            if mention_count:
+                avg_rating = rating_sum / mention_count
+                sentiment_score = (positive_count - negative_count) / mention_count
                 
                 results[feature] = {
                     'average_rating': round(avg_rating, 2),
-                    'mention_count': len(feature_mentions),
+                    'mention_count': mention_count,
                     'positive_mentions': positive_count,
                     'negative_mentions': negative_count,
                     'sentiment_score': round(sentiment_score, 2),
-                    'sample_reviews': self._extract_sample_reviews(feature_mentions[:3], feature)
+                    'sample_reviews': self._extract_sample_reviews(mentions, feature)
                 }
             else:
                 results[feature] = {
@@ -95,9 +160,12 @@ class ReviewAnalyzer:
         Simple sentiment analysis
         Returns: 1 for positive, -1 for negative, 0 for neutral
         """
-        text_lower = text.lower()
-        positive_score = sum(1 for word in self.sentiment_words['positive'] if word in text_lower)
-        negative_score = sum(1 for word in self.sentiment_words['negative'] if word in text_lower)
+        return self._sentiment_from_hits(self.keyword_matcher.scan(text.lower()))
+    
+    def _sentiment_from_hits(self, hits: Dict[Any, int]) -> int:
+        """Sentiment from the distinct sentiment words found by the keyword matcher"""
+        positive_score = hits.get(('sentiment', 'positive'), 0)
+        negative_score = hits.get(('sentiment', 'negative'), 0)
         
         if positive_score > negative_score:
             return 1
@@ -108,13 +176,13 @@ class ReviewAnalyzer:
     def _extract_sample_reviews(self, reviews: List[str], feature: str) -> List[str]:
         """Extract relevant snippets from reviews mentioning the feature"""
         samples = []
-        keywords = self.feature_keywords.get(feature, [])
+        feature_label = ('feature', feature)
         
         for review in reviews:
             # Find sentences containing feature keywords
             sentences = re.split(r'[.!?]+', review)
             for sentence in sentences:
-                if any(keyword in sentence.lower() for keyword in keywords):
+                if feature_label in self.keyword_matcher.scan(sentence.lower()):
                     samples.append(sentence.strip())
                     break
         
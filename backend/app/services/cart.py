@@ -0,0 +1,308 @@
+"""
+Cart Service for per-session shopping carts
+"""
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional, Tuple
+import threading
+from .catalog import get_catalog
+
+if TYPE_CHECKING:
+    from .session_store import SessionStore
+
+
+class CartLine:
+    """
+    One product in a cart.
+
+    Lines are never modified once created (a quantity change replaces the
+    line), so snapshots can share them without copying.
+    """
+
+    __slots__ = ('product', 'unit_price', 'quantity', 'catalog_version')
+
+    def __init__(self, product: Mapping[str, Any], unit_price: float, quantity: int, catalog_version: Optional[int]):
+        self.product = product
+        self.unit_price = unit_price
+        self.quantity = quantity
+        # Catalog version the product record came from; None for products outside the catalog
+        self.catalog_version = catalog_version
+
+    @property
+    def product_id(self) -> Any:
+        return self.product['id']
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'product_id': self.product['id'],
+            'name': self.product['name'],
+            'unit_price': self.unit_price,
+            'quantity': self.quantity,
+            'line_total': round(self.unit_price * self.quantity, 2)
+        }
+
+
+class CartSnapshot:
+    """Immutable view of a cart at one point: its lines, totals and change counter"""
+
+    __slots__ = ('lines', 'total_items', 'total_price', 'version')
+
+    def __init__(self, lines: Tuple[CartLine, ...], total_items: int, total_price: float, version: int):
+        self.lines = lines
+        self.total_items = total_items
+        self.total_price = total_price
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    @property
+    def product_ids(self) -> List[Any]:
+        return [line.product_id for line in self.lines]
+
+    def catalog_products(self, catalog_version: int) -> Optional[Tuple[Mapping[str, Any], ...]]:
+        """
+        Catalog product records of the cart's lines, for the comparator
+
+        Returns:
+            The records, in cart order, or None if any was taken from a
+            catalog other than catalog_version (look them up again instead)
+        """
+        products = []
+        for line in self.lines:
+            if line.catalog_version is None:
+                continue
+            if line.catalog_version != catalog_version:
+                return None
+            products.append(line.product)
+        return tuple(products)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'items': [line.to_dict() for line in self.lines],
+            'cart_items': self.product_ids,
+            'cart_total_items': self.total_items,
+            'cart_total_price': self.total_price,
+            'version': self.version
+        }
+
+
+class Cart:
+    """
+    Product lines with running totals.
+
+    Lines are kept in a dict by product id (in the order products were
+    added) and the item count and price total are adjusted on every add
+    and remove, so updates cost the same for a cart of any size. Prices
+    are summed in cents to keep the running total exact. A lock makes
+    concurrent requests from the same session apply one at a time.
+    """
+
+    def __init__(self):
+        self._lines: Dict[str, CartLine] = {}
+        self._total_items = 0
+        self._total_cents = 0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __contains__(self, product_id: Any) -> bool:
+        return str(product_id) in self._lines
+
+    def add(
+        self,
+        product: Mapping[str, Any],
+        quantity: int = 1,
+        catalog_version: Optional[int] = None
+    ) -> Tuple[CartLine, int, float]:
+        """
+        Add units of a product, at its current price if it is new to the cart
+
+        Returns:
+            (the product's line, total items, total price) after the change
+
+        Raises:
+            ValueError: If quantity is less than 1
+        """
+        if quantity < 1:
+            raise ValueError("quantity must be at least 1")
+
+        key = str(product['id'])
+        with self._lock:
+            line = self._lines.get(key)
+            if line is None:
+                line = CartLine(product, float(product['price']), quantity, catalog_version)
+            else:
+                # Keep the price the product was first added at
+                line = CartLine(line.product, line.unit_price, line.quantity + quantity, line.catalog_version)
+            self._lines[key] = line
+            self._total_items += quantity
+            self._total_cents += round(line.unit_price * 100) * quantity
+            self._version += 1
+            return line, self._total_items, self._total_cents / 100
+
+    def remove(self, product_id: Any, quantity: Optional[int] = None) -> Tuple[CartLine, int, float]:
+        """
+        Remove units of a product (all of them when quantity is None)
+
+        Returns:
+            (the product's line after the change, with quantity 0 if it
+            was removed, total items, total price)
+
+        Raises:
+            KeyError: If the product is not in the cart
+            ValueError: If quantity is less than 1
+        """
+        if quantity is not None and quantity < 1:
+            raise ValueError("quantity must be at least 1")
+
+        key = str(product_id)
+        with self._lock:
+            line = self._lines.get(key)
+            if line is None:
+                raise KeyError(f"Product {product_id} is not in the cart")
+
+            removed = line.quantity if quantity is None else min(quantity, line.quantity)
+            self._total_items -= removed
+            self._total_cents -= round(line.unit_price * 100) * removed
+            line = CartLine(line.product, line.unit_price, line.quantity - removed, line.catalog_version)
+            if line.quantity:
+                self._lines[key] = line
+            else:
+                del self._lines[key]
+            self._version += 1
+            return line, self._total_items, self._total_cents / 100
+
+    def snapshot(self) -> CartSnapshot:
+        with self._lock:
+            return CartSnapshot(
+                tuple(self._lines.values()), self._total_items, self._total_cents / 100, self._version
+            )
+
+    def to_list(self) -> List[List[Any]]:
+        """Lines as [product_id, name, unit_price, quantity], for serializing the cart"""
+        with self._lock:
+            return [
+                [line.product_id, line.product['name'], line.unit_price, line.quantity]
+                for line in self._lines.values()
+            ]
+
+    @classmethod
+    def from_list(cls, lines: List[List[Any]]) -> "Cart":
+        """Rebuild a cart from to_list output, taking product records from the current catalog"""
+        catalog = get_catalog()
+        cart = cls()
+        for product_id, name, unit_price, quantity in lines:
+            product = catalog.get(product_id)
+            catalog_version = catalog.version
+            if product is None:
+                product, catalog_version = {'id': product_id, 'name': name, 'price': unit_price}, None
+            cart._lines[str(product_id)] = CartLine(product, unit_price, quantity, catalog_version)
+            cart._total_items += quantity
+            cart._total_cents += round(unit_price * 100) * quantity
+        return cart
+
+
+class CartService:
+    """
+    Carts kept on the sessions of a SessionStore, one per session_id.
+
+    Products are looked up in the catalog by id, or else among extra
+    products (the demo products search also returns), which are added at
+    their own price.
+    """
+
+    def __init__(
+        self,
+        sessions: "SessionStore",
+        products: Optional[Mapping[Any, Mapping[str, Any]]] = None,
+        on_change: Optional[Callable[[str, Cart], None]] = None
+    ):
+        """
+        Args:
+            sessions: SessionStore whose sessions hold the carts
+            products: Extra products that can be added, by id
+            on_change: Called with (session_id, cart) after each add or remove
+        """
+        self.sessions = sessions
+        self.products = {str(product_id): product for product_id, product in (products or {}).items()}
+        self.on_change = on_change
+
+    def resolve(self, product_id: Any) -> Tuple[Mapping[str, Any], Optional[int]]:
+        """
+        Product record for an id and the catalog version it came from
+
+        Raises:
+            ValueError: If the product is unknown
+        """
+        catalog = get_catalog()
+        product = catalog.get(product_id)
+        if product is not None:
+            return product, catalog.version
+
+        extra = self.products.get(str(product_id))
+        if extra is None:
+            raise ValueError(f"Unknown product: {product_id}")
+        return {'id': product_id, **extra}, None
+
+    def cart(self, session_id: str) -> Cart:
+        return self.sessions.get_or_create(session_id).cart
+
+    def snapshot(self, session_id: str) -> CartSnapshot:
+        return self.cart(session_id).snapshot()
+
+    def add(self, session_id: str, product_id: Any, quantity: int = 1) -> Dict[str, Any]:
+        """
+        Add a product to a session's cart
+
+        Returns:
+            The added product's line and the cart totals
+
+        Raises:
+            ValueError: If the product is unknown or quantity is less than 1
+        """
+        product, catalog_version = self.resolve(product_id)
+        cart = self.cart(session_id)
+        line, total_items, total_price = cart.add(product, quantity, catalog_version)
+        if self.on_change is not None:
+            self.on_change(session_id, cart)
+        return {
+            "success": True,
+            "product_id": line.product_id,
+            "product_name": line.product['name'],
+            "quantity": quantity,
+            "line_quantity": line.quantity,
+            "cart_total_items": total_items,
+            "cart_total_price": total_price,
+            "message": f"Added {quantity} {line.product['name']} to your cart"
+        }
+
+    def remove(self, session_id: str, product_id: Any, quantity: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Remove a product (or some of its units) from a session's cart
+
+        Returns:
+            The product's remaining quantity and the cart totals
+
+        Raises:
+            KeyError: If the product is not in the cart
+            ValueError: If quantity is less than 1
+        """
+        cart = self.cart(session_id)
+        if product_id not in cart:
+            # Lines are keyed by the resolved product ("iphone-13" is added as catalog product 1)
+            try:
+                product_id = self.resolve(product_id)[0]['id']
+            except ValueError:
+                pass
+        line, total_items, total_price = cart.remove(product_id, quantity)
+        if self.on_change is not None:
+            self.on_change(session_id, cart)
+        return {
+            "success": True,
+            "product_id": line.product_id,
+            "line_quantity": line.quantity,
+            "cart_total_items": total_items,
+            "cart_total_price": total_price,
+            "message": "Item removed from cart"
+        }
@@ -0,0 +1,256 @@
+"""
+Catalog Repository for indexed product lookups
+"""
+from typing import Dict, Any, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+import os
+import threading
+import numpy as np
+from .mock_data import get_mock_products
+from .records import ProductRecord, deep_sizeof
+from .catalog_storage import MappedCatalog, slugify
+
+
+# Path of a columnar catalog file to serve instead of the mock catalog
+CATALOG_PATH_ENV = "SPARK_CATALOG_PATH"
+
+# Shortest name (as a slug) find_by_name will look up
+MIN_NAME_LENGTH = 2
+
+
+class CatalogRepository:
+    """
+    Product catalog with lookup indexes.
+
+    Products are frozen into immutable ProductRecords when the catalog is
+    loaded, or served from a memory-mapped catalog file (MappedCatalog),
+    and indexed by id (as a string, so "13" and 13 find the same product),
+    by category, by name slug and by the words of the slug. Lookups are
+    dictionary hits that hand out the shared records, with no copying per
+    request. A mapped catalog carries these indexes as sorted columns in
+    the file: lookups binary-search them and resolve only the rows found,
+    so no per-product index is built in each worker.
+    """
+    
+    def __init__(self, products: Iterable[Mapping[str, Any]], version: int = 0):
+        """
+        Args:
+            products: Product dicts (or records) to load, or a MappedCatalog
+            version: Catalog version, bumped on every hot swap
+        """
+        self.version = version
+        self.source_bytes = 0
+        self.storage: Optional[MappedCatalog] = None
+        
+        self._by_id: Dict[str, Mapping[str, Any]] = {}
+        self._by_category: Dict[str, Tuple[Mapping[str, Any], ...]] = {}
+        self._by_slug: Dict[str, Mapping[str, Any]] = {}
+        # slug word -> slugs containing it, in catalog order (dicts as ordered sets)
+        self._slugs_by_word: Dict[str, Dict[str, None]] = {}
+        
+        if isinstance(products, MappedCatalog):
+            # Served from the mapped file, which holds its own lookup tables
+            self.storage = products
+            self.products: Sequence[Mapping[str, Any]] = products
+            return
+        
+        records = []
+        for product in products:
+            if not isinstance(product, ProductRecord):
+                self.source_bytes += deep_sizeof([product])
+                product = ProductRecord.from_dict(product)
+            records.append(product)
+        self.products = tuple(records)
+        
+        by_category: Dict[str, list] = {}
+        for product in self.products:
+            self._by_id[str(product['id'])] = product
+            by_category.setdefault(product.get('category', ''), []).append(product)
+            self._by_slug.setdefault(slugify(product['name']), product)
+        
+        self._by_category = {
+            category: tuple(products) for category, products in by_category.items()
+        }
+        
+        for slug in self._by_slug:
+            for word in slug.split('-'):
+                self._slugs_by_word.setdefault(word, {})[slug] = None
+    
+    @classmethod
+    def from_mock_data(cls, version: int = 0) -> "CatalogRepository":
+        return cls(get_mock_products(), version=version)
+    
+    @classmethod
+    def from_file(cls, path: str, version: int = 0) -> "CatalogRepository":
+        """Serve a columnar catalog file written by catalog_storage.write_catalog"""
+        return cls(MappedCatalog(path), version=version)
+    
+    @classmethod
+    def from_source(cls, version: int = 0) -> "CatalogRepository":
+        """The catalog file named by SPARK_CATALOG_PATH, or the mock catalog"""
+        path = os.environ.get(CATALOG_PATH_ENV)
+        if path:
+            return cls.from_file(path, version=version)
+        return cls.from_mock_data(version=version)
+    
+    def __len__(self) -> int:
+        return len(self.products)
+    
+    def __iter__(self) -> Iterator[Mapping[str, Any]]:
+        return iter(self.products)
+    
+    def __contains__(self, product_id: Any) -> bool:
+        if self.storage is not None:
+            return self._mapped_row(product_id) is not None
+        return str(product_id) in self._by_id
+    
+    def ids(self) -> Tuple[str, ...]:
+        """Product ids as strings, in catalog order"""
+        if self.storage is not None:
+            return tuple(dict.fromkeys(str(product_id) for product_id in self.storage.column('id').tolist()))
+        return tuple(self._by_id)
+    
+    def get(self, product_id: Any) -> Optional[Mapping[str, Any]]:
+        """Product by id (int or string), or None"""
+        if self.storage is not None:
+            row = self._mapped_row(product_id)
+            return None if row is None else self.storage[row]
+        return self._by_id.get(str(product_id))
+    
+    def get_many(self, product_ids: Iterable[Any]) -> Tuple[Mapping[str, Any], ...]:
+        """Products for the given ids, in order, skipping unknown ids"""
+        products = []
+        for product_id in product_ids:
+            product = self.get(product_id)
+            if product is not None:
+                products.append(product)
+        return tuple(products)
+    
+    def by_category(self, category: str) -> Tuple[Mapping[str, Any], ...]:
+        """Products in a category, in catalog order"""
+        if self.storage is not None:
+            return tuple(self.storage[row] for row in self.storage.lookup('category', category).tolist())
+        return self._by_category.get(category, ())
+    
+    def by_slug(self, slug: str) -> Optional[Mapping[str, Any]]:
+        """Product by name slug (e.g. 'oneplus-11'), or None"""
+        if self.storage is not None:
+            rows = self.storage.lookup('slug', slug)
+            return self.storage[int(rows[0])] if len(rows) else None
+        return self._by_slug.get(slug)
+    
+    def _mapped_row(self, product_id: Any) -> Optional[int]:
+        """Row of a product id in the mapped catalog; ids match as strings, as in the dict index"""
+        key = str(product_id)
+        try:
+            number = int(key)
+        except ValueError:
+            return None
+        if str(number) != key:
+            return None
+        return self.storage.row_of_id(number)
+    
+    def find_by_name(self, name: str) -> Optional[Mapping[str, Any]]:
+        """
+        Product whose name matches, or else contains every word of, the given name
+        
+        "samsung s23" finds Samsung Galaxy S23; among several products with
+        all the words, the one with the fewest other words wins, then the
+        first in catalog order. Names shorter than MIN_NAME_LENGTH find nothing.
+        """
+        slug = slugify(name)
+        if len(slug) < MIN_NAME_LENGTH:
+            return None
+        
+        product = self.by_slug(slug)
+        if product is not None:
+            return product
+        
+        if self.storage is not None:
+            return self._find_mapped_by_words(slug)
+        
+        slug_sets = [self._slugs_by_word.get(word) for word in set(slug.split('-'))]
+        if not all(slug_sets):
+            return None
+        
+        rarest = min(slug_sets, key=len)
+        matches = [candidate for candidate in rarest if all(candidate in slugs for slugs in slug_sets)]
+        if not matches:
+            return None
+        return self._by_slug[min(matches, key=lambda candidate: candidate.count('-'))]
+    
+    def _find_mapped_by_words(self, slug: str) -> Optional[Mapping[str, Any]]:
+        """find_by_name over the slug word table of a mapped catalog"""
+        row_sets = sorted((self.storage.lookup('slug_word', word) for word in set(slug.split('-'))), key=len)
+        rows = row_sets[0]
+        for other in row_sets[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        if not len(rows):
+            return None
+        # Rows are in catalog order, so min() keeps the first of the shortest names
+        return min(
+            (self.storage[row] for row in rows.tolist()),
+            key=lambda product: slugify(product['name']).count('-')
+        )
+    
+    def memory_report(self) -> Dict[str, Any]:
+        """Memory held by the catalog, in total and per product"""
+        count = len(self.products)
+        
+        if self.storage is not None:
+            # Only the views of products looked up so far live on the heap; the data is in shared pages
+            views = self.storage.views()
+            view_bytes = deep_sizeof(views)
+            return {
+                'version': self.version,
+                'backend': 'mmap',
+                'path': self.storage.path,
+                'products': count,
+                'mapped_bytes': self.storage.nbytes,
+                'mapped_bytes_per_product': round(self.storage.nbytes / count) if count else 0,
+                'resolved_products': len(views),
+                'heap_bytes_per_product': round(view_bytes / count) if count else 0
+            }
+        
+        record_bytes = deep_sizeof(self.products)
+        return {
+            'version': self.version,
+            'backend': 'records',
+            'products': count,
+            'record_bytes': record_bytes,
+            'bytes_per_product': round(record_bytes / count) if count else 0,
+            'source_bytes_per_product': round(self.source_bytes / count) if count else 0
+        }
+
+
+_catalog: Optional[CatalogRepository] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> CatalogRepository:
+    """The shared catalog, loaded on first use and reused by every service"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = CatalogRepository.from_source()
+    return _catalog
+
+
+def swap_catalog(catalog: CatalogRepository) -> CatalogRepository:
+    """
+    Atomically replace the shared catalog
+    
+    The new catalog gets the next version number. Requests already holding
+    the old catalog finish with it; services pick up the new one on their
+    next call.
+    """
+    global _catalog
+    with _catalog_lock:
+        catalog.version = (_catalog.version + 1) if _catalog is not None else catalog.version
+        _catalog = catalog
+    return catalog
+
+
+def reload_catalog() -> CatalogRepository:
+    """Load the product source again and hot-swap it in"""
+    return swap_catalog(CatalogRepository.from_source())
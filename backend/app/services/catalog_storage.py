@@ -0,0 +1,402 @@
+"""
+Memory-mapped columnar catalog storage
+
+A catalog file holds one column per product field: numeric columns (price,
+rating, parsed spec values) as fixed-width arrays, and strings (names,
+categories, specifications, review text) in a shared UTF-8 heap addressed
+by offset columns. Lookup tables (products by id, name slug, category and
+slug word) are stored as sorted key columns with the rows filed under each
+key, so readers binary-search them instead of building dictionaries. The
+file is opened with mmap, so the columns are read straight from the page
+cache and several uvicorn workers share the same pages instead of each
+holding a copy of the catalog.
+
+Convert the mock catalog with:
+    python -m app.convert_catalog catalog.spk
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+import json
+import mmap
+import re
+import struct
+
+import numpy as np
+
+
+MAGIC = b'SPKCAT01'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sIQQI')
+COLUMN_ENTRY = struct.Struct('<32s8sQQ')
+ALIGNMENT = 8
+
+# Product fields, in the bit order of the 'present' mask column
+PRODUCT_FIELDS = (
+    'id', 'name', 'price', 'originalPrice', 'rating', 'reviews_count',
+    'category', 'specifications', 'reviews'
+)
+NUMERIC_FIELDS = ('price', 'originalPrice', 'rating', 'reviews_count')
+STRING_FIELDS = ('name', 'category')
+
+# Spec values parsed into integer columns (-1 when the spec doesn't mention them)
+SPEC_COLUMNS = {
+    'megapixels': ('main_camera', re.compile(r'(\d+)\s*MP', re.IGNORECASE)),
+    'storage_gb': ('storage', re.compile(r'(\d+)\s*GB', re.IGNORECASE)),
+    'ram_gb': ('ram', re.compile(r'(\d+)\s*GB', re.IGNORECASE)),
+    'battery_mah': ('battery', re.compile(r'(\d+)\s*mAh', re.IGNORECASE)),
+}
+
+# Lookup tables written with every catalog: sorted keys, and the rows filed under each
+LOOKUP_TABLES = ('slug', 'category', 'slug_word')
+
+# Distinct spec sheets kept parsed; products often share one
+SPEC_CACHE_SIZE = 4096
+
+
+class CatalogFormatError(ValueError):
+    """Raised when a file is not a readable catalog file"""
+
+
+def slugify(name: str) -> str:
+    """URL-style slug for a product name, e.g. 'Galaxy S23' -> 'galaxy-s23'"""
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+@lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _parse_specifications(text: str) -> Mapping[str, Any]:
+    """Read-only spec sheet from its JSON text, shared by every product with that text"""
+    return MappingProxyType(json.loads(text))
+
+
+class _StringHeap:
+    """Accumulates UTF-8 strings and their offsets for the writer"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add_column(self, values: Iterable[str]) -> np.ndarray:
+        offsets = [self.size]
+        for value in values:
+            encoded = value.encode('utf-8')
+            self.chunks.append(encoded)
+            self.size += len(encoded)
+            offsets.append(self.size)
+        return np.array(offsets, dtype='<u8')
+
+
+def _lookup_table(heap: _StringHeap, name: str, rows_by_key: Mapping[str, List[int]]) -> Dict[str, np.ndarray]:
+    """Columns of a lookup table: keys in UTF-8 byte order, and their rows"""
+    keys = sorted(rows_by_key, key=lambda key: key.encode('utf-8'))
+    rows = [rows_by_key[key] for key in keys]
+    return {
+        f'{name}_key_offsets': heap.add_column(keys),
+        f'{name}_start': np.cumsum([0] + [len(key_rows) for key_rows in rows]).astype('<u8'),
+        f'{name}_rows': np.array([row for key_rows in rows for row in key_rows], dtype='<u4'),
+    }
+
+
+def _numeric_column(values: List[Any]) -> np.ndarray:
+    """int64 column when every value is an int, float64 otherwise"""
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return np.array(values, dtype='<i8')
+    return np.array(values, dtype='<f8')
+
+
+def write_catalog(path: str, products: Iterable[Mapping[str, Any]]) -> int:
+    """
+    Write products to a columnar catalog file
+
+    Args:
+        path: Output file path
+        products: Product dicts in the get_mock_products() structure
+
+    Returns:
+        Number of products written
+
+    Raises:
+        CatalogFormatError: If a product id is not an integer
+    """
+    products = list(products)
+    count = len(products)
+
+    present = np.zeros(count, dtype='<u2')
+    columns: Dict[str, np.ndarray] = {}
+    heap = _StringHeap()
+
+    for i, product in enumerate(products):
+        if not isinstance(product['id'], int):
+            raise CatalogFormatError(f"Product ids must be integers, got {product['id']!r}")
+        for bit, field in enumerate(PRODUCT_FIELDS):
+            if field in product:
+                present[i] |= 1 << bit
+
+    columns['present'] = present
+    columns['id'] = np.array([product['id'] for product in products], dtype='<i8')
+    for field in NUMERIC_FIELDS:
+        columns[field] = _numeric_column([product.get(field, 0) for product in products])
+
+    for name, (spec, pattern) in SPEC_COLUMNS.items():
+        parsed = []
+        for product in products:
+            match = pattern.search(str((product.get('specifications') or {}).get(spec, '')))
+            parsed.append(int(match.group(1)) if match else -1)
+        columns[name] = np.array(parsed, dtype='<i4')
+
+    for field in STRING_FIELDS:
+        columns[f'{field}_offsets'] = heap.add_column(str(product.get(field, '')) for product in products)
+    columns['specifications_offsets'] = heap.add_column(
+        json.dumps(dict(product.get('specifications') or {}), ensure_ascii=False) for product in products
+    )
+
+    review_start = [0]
+    review_ratings: List[Any] = []
+    review_texts: List[str] = []
+    for product in products:
+        for review in product.get('reviews', ()):
+            review_ratings.append(review.get('rating', 3))
+            review_texts.append(review.get('text', ''))
+        review_start.append(len(review_texts))
+    columns['review_start'] = np.array(review_start, dtype='<u8')
+    columns['review_rating'] = _numeric_column(review_ratings)
+    columns['review_text_offsets'] = heap.add_column(review_texts)
+
+    # Ids sorted, with their rows; equal ids keep catalog order
+    id_order = np.argsort(columns['id'], kind='stable')
+    columns['id_sorted'] = columns['id'][id_order]
+    columns['id_rows'] = id_order.astype('<u4')
+
+    # A slug names the first product with it; its words file that product
+    rows_by_key: Dict[str, Dict[str, List[int]]] = {table: {} for table in LOOKUP_TABLES}
+    for row, product in enumerate(products):
+        rows_by_key['slug'].setdefault(slugify(str(product.get('name', ''))), [row])
+        rows_by_key['category'].setdefault(str(product.get('category', '')), []).append(row)
+    for slug, (row,) in rows_by_key['slug'].items():
+        for word in dict.fromkeys(slug.split('-')):
+            rows_by_key['slug_word'].setdefault(word, []).append(row)
+    for table in LOOKUP_TABLES:
+        columns.update(_lookup_table(heap, table, rows_by_key[table]))
+
+    columns['heap'] = np.frombuffer(b''.join(heap.chunks), dtype='u1')
+
+    # Lay the sections out after the header and column table, 8-byte aligned
+    offset = HEADER.size + COLUMN_ENTRY.size * len(columns)
+    layout: List[Tuple[str, np.ndarray, int]] = []
+    for name, array in columns.items():
+        offset += -offset % ALIGNMENT
+        layout.append((name, array, offset))
+        offset += array.nbytes
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, len(review_texts), len(columns)))
+        for name, array, position in layout:
+            file.write(COLUMN_ENTRY.pack(
+                name.encode('ascii'), array.dtype.str.encode('ascii'), position, len(array)
+            ))
+        for name, array, position in layout:
+            file.write(b'\0' * (position - file.tell()))
+            file.write(array.tobytes())
+
+    return count
+
+
+class MappedProduct(Mapping):
+    """
+    Read-only view of one product in a MappedCatalog.
+
+    Fields are decoded from the mapped columns on access; the view itself
+    only holds the catalog and a row number.
+    """
+
+    __slots__ = ('_catalog', '_row')
+
+    def __init__(self, catalog: "MappedCatalog", row: int):
+        self._catalog = catalog
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self:
+            raise KeyError(key)
+        return self._catalog._value(self._row, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain, mutable dict copy of the product"""
+        product = dict(self)
+        if 'specifications' in product:
+            product['specifications'] = dict(product['specifications'])
+        if 'reviews' in product:
+            product['reviews'] = [dict(review) for review in product['reviews']]
+        return product
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            bit = PRODUCT_FIELDS.index(key)
+        except ValueError:
+            return False
+        return bool(self._catalog._present[self._row] >> bit & 1)
+
+    def __iter__(self) -> Iterator[str]:
+        return (field for field in PRODUCT_FIELDS if field in self)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"MappedProduct({self._catalog.path!r}, row={self._row})"
+
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))
+
+
+class MappedCatalog(Sequence):
+    """
+    Catalog file opened with mmap.
+
+    Indexing returns MappedProduct views, created when a row is first
+    reached and then reused, so a product is the same object however it is
+    reached. Lookups by id and by the keys of the lookup tables are binary
+    searches over the mapped columns. Numeric columns are exposed as
+    zero-copy NumPy arrays through column(), for consumers such as the
+    scoring engine that work on whole columns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise CatalogFormatError(f"{path} is empty")
+
+        if len(self._map) < HEADER.size:
+            raise CatalogFormatError(f"{path} is too short to be a catalog file")
+        magic, version, self._count, self.review_count, column_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise CatalogFormatError(f"{path} is not a version {FORMAT_VERSION} catalog file")
+
+        self._columns: Dict[str, np.ndarray] = {}
+        for i in range(column_count):
+            name, dtype, offset, length = COLUMN_ENTRY.unpack_from(self._map, HEADER.size + i * COLUMN_ENTRY.size)
+            self._columns[name.rstrip(b'\0').decode('ascii')] = np.frombuffer(
+                self._map, dtype=np.dtype(dtype.rstrip(b'\0').decode('ascii')), count=length, offset=offset
+            )
+
+        self._present = self._columns['present']
+        self._heap = self._columns['heap']
+        self._views: Dict[int, MappedProduct] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self._count))]
+        if row < 0:
+            row += self._count
+        if not 0 <= row < self._count:
+            raise IndexError("catalog index out of range")
+        view = self._views.get(row)
+        if view is None:
+            view = self._views.setdefault(row, MappedProduct(self, row))
+        return view
+
+    def scan(self) -> Iterator[MappedProduct]:
+        """
+        Views of every product, for one pass over the catalog
+
+        Unlike indexing, the views are not kept, so building an index over
+        the catalog leaves nothing behind per product.
+        """
+        return (MappedProduct(self, row) for row in range(self._count))
+
+    def views(self) -> Tuple[MappedProduct, ...]:
+        """The views handed out by indexing so far"""
+        return tuple(self._views.values())
+
+    def row_of_id(self, product_id: int) -> Optional[int]:
+        """Row of the product with an id (the last one if ids repeat), or None"""
+        ids = self._columns['id_sorted']
+        if not len(ids) or not int(ids[0]) <= product_id <= int(ids[-1]):
+            return None
+        i = int(np.searchsorted(ids, product_id, side='right')) - 1
+        if int(ids[i]) != product_id:
+            return None
+        return int(self._columns['id_rows'][i])
+
+    def lookup(self, table: str, key: str) -> np.ndarray:
+        """
+        Rows filed under a key of a lookup table
+
+        Args:
+            table: 'slug', 'category' or 'slug_word'
+            key: Slug, category or slug word
+
+        Returns:
+            Rows in catalog order (empty if the key isn't in the table)
+        """
+        offsets = self._columns[f'{table}_key_offsets']
+        target = key.encode('utf-8')
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(offsets, middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        rows = self._columns[f'{table}_rows']
+        if low == len(offsets) - 1 or self._bytes(offsets, low) != target:
+            return rows[:0]
+        start, end = self._columns[f'{table}_start'][low:low + 2].tolist()
+        return rows[start:end]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the mapped file"""
+        return len(self._map)
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only NumPy view of a column (e.g. 'price', 'megapixels')"""
+        return self._columns[name]
+
+    def has_field(self, field: str) -> np.ndarray:
+        """Boolean column: which products carry a field (e.g. 'reviews')"""
+        return (self._present >> PRODUCT_FIELDS.index(field) & 1).astype(bool)
+
+    def specifications_json(self, row: int) -> str:
+        """Raw JSON text of a product's specifications"""
+        return self._string(self._columns['specifications_offsets'], row)
+
+    def _bytes(self, offsets: np.ndarray, row: int) -> bytes:
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        return self._heap[start:end].tobytes()
+
+    def _string(self, offsets: np.ndarray, row: int) -> str:
+        return self._bytes(offsets, row).decode('utf-8')
+
+    def _value(self, row: int, field: str) -> Any:
+        if field in STRING_FIELDS:
+            return self._string(self._columns[f'{field}_offsets'], row)
+        if field == 'specifications':
+            return _parse_specifications(self.specifications_json(row))
+        if field == 'reviews':
+            start, end = int(self._columns['review_start'][row]), int(self._columns['review_start'][row + 1])
+            ratings = self._columns['review_rating']
+            offsets = self._columns['review_text_offsets']
+            return tuple(
+                {'text': self._string(offsets, i), 'rating': ratings[i].item()}
+                for i in range(start, end)
+            )
+        return self._columns[field][row].item()
+
+    def close(self) -> None:
+        """Unmap the file; if column views are still referenced it is unmapped when they go"""
+        self._columns = {}
+        self._present = self._heap = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+
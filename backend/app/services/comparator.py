@@ -24,6 +24,9 @@ class ProductComparator:
         """
         comparison = {}
         
+        # Full products x criteria review analysis in one batch
+        review_matrix = self.review_analyzer.analyze_products_for_features(products, criteria)
+        
         for product in products:
             product_id = product['id']
             comparison[f"product_{product_id}"] = {
@@ -38,12 +41,9 @@ class ProductComparator:
                 spec_value = self._extract_spec(product.get('specifications', {}), criterion)
                 comparison[f"product_{product_id}"]['specs'][criterion] = spec_value
                 
-                # Analyze reviews for this criterion
-                if 'reviews' in product:
-                    review_analysis = self.review_analyzer.analyze_reviews_for_features(
-                        product['reviews'], [criterion]
-                    )
-                    comparison[f"product_{product_id}"]['review_analysis'][criterion] = review_analysis.get(criterion, {})
+                # Review analysis for this criterion
+                if product_id in review_matrix:
+                    comparison[f"product_{product_id}"]['review_analysis'][criterion] = review_matrix[product_id].get(criterion, {})
         
         # Generate comparison summary and recommendation
         summary = self._generate_comparison_summary(comparison, criteria)
@@ -0,0 +1,106 @@
+"""
+Comparison Result Cache for repeated product comparisons
+"""
+from typing import Dict, Any, Hashable, Iterable, Optional, Tuple
+import threading
+from .cache import LRUCache
+
+
+ComparisonKey = Tuple[Tuple[str, ...], Tuple[str, ...], int]
+
+
+class ComparisonCache:
+    """
+    LRU cache of comparison results.
+
+    Entries are keyed on (sorted product ids, sorted criteria, catalog
+    version), so asking again for the same products and criteria in any
+    order is a single lookup. Bumping the catalog version retires every
+    entry; invalidate_product() drops only the comparisons involving one
+    product, for when its price or reviews change.
+    
+    Comparisons can run while a product is invalidated, so put() takes the
+    generation read before the comparison started and drops the result if
+    any of its products was invalidated since.
+    """
+    
+    def __init__(self, max_size: int = 256, ttl_seconds: Optional[float] = 600):
+        self.cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.catalog_version = 0
+        # Bumped by every invalidation; product id -> generation it was last invalidated at
+        self.generation = 0
+        self._invalidated: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def make_key(self, product_ids: Iterable[Hashable], criteria: Iterable[str]) -> ComparisonKey:
+        """Order-insensitive cache key for a comparison at the current catalog version"""
+        return (
+            tuple(sorted({str(product_id) for product_id in product_ids})),
+            tuple(sorted(set(criteria))),
+            self.catalog_version
+        )
+    
+    def get(self, key: ComparisonKey) -> Optional[Dict[str, Any]]:
+        """Cached comparison result (shared; treat as read-only), or None"""
+        return self.cache.get(key)
+    
+    def put(self, key: ComparisonKey, result: Dict[str, Any], generation: Optional[int] = None) -> None:
+        """
+        Cache a comparison result
+        
+        Args:
+            key: Key from make_key
+            result: Comparison result
+            generation: self.generation when the comparison started; the
+                result is dropped if one of its products was invalidated since
+        """
+        with self._lock:
+            # A result computed against an older catalog version is not worth keeping
+            if key[2] != self.catalog_version:
+                return
+            if generation is not None and any(
+                self._invalidated.get(product_id, -1) >= generation for product_id in key[0]
+            ):
+                return
+            self.cache.put(key, result)
+    
+    def invalidate_product(self, product_id: Hashable) -> int:
+        """
+        Drop every cached comparison that includes a product
+        
+        Returns:
+            Number of entries removed
+        """
+        return self.invalidate_products([product_id])
+    
+    def invalidate_products(self, product_ids: Iterable[Hashable]) -> int:
+        """
+        Drop every cached comparison that includes any of the products
+        
+        Returns:
+            Number of entries removed
+        """
+        product_ids = {str(product_id) for product_id in product_ids}
+        with self._lock:
+            for product_id in product_ids:
+                self._invalidated[product_id] = self.generation
+            self.generation += 1
+        
+        removed = 0
+        for key in self.cache.keys():
+            if not product_ids.isdisjoint(key[0]) and self.cache.pop(key) is not None:
+                removed += 1
+        return removed
+    
+    def bump_version(self) -> int:
+        """Retire all cached comparisons after a catalog-wide change"""
+        with self._lock:
+            self.catalog_version += 1
+            self.cache.clear()
+            self._invalidated.clear()
+            return self.catalog_version
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats['catalog_version'] = self.catalog_version
+        return stats
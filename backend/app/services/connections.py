@@ -0,0 +1,135 @@
+"""
+Connection Manager for persistent client connections (WebSockets)
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import asyncio
+import json
+
+
+# Messages queued for a client before pushed updates to it are dropped
+MAX_QUEUED_MESSAGES = 256
+
+
+class Connection:
+    """
+    One client connection, written to by a single writer task.
+
+    Replies and pushed updates go through the connection's queue, so
+    messages from the command worker and from pushes never interleave on
+    the socket. Replies wait for room in the queue (a client that stops
+    reading stops its own commands); pushes are dropped when it is full.
+    """
+
+    def __init__(self, session_id: str, send: Callable[[str], Awaitable[None]], max_queued: int = MAX_QUEUED_MESSAGES):
+        self.session_id = session_id
+        self._send = send
+        self._queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=max_queued)
+        self.sent = 0
+        self.dropped = 0
+
+    async def reply(self, message: Dict[str, Any]) -> None:
+        await self._queue.put(message)
+
+    def push(self, message: Dict[str, Any]) -> bool:
+        """Queue an update without waiting; returns False if it was dropped"""
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def write(self) -> None:
+        """Send queued messages until close() (run as the connection's writer task)"""
+        while True:
+            message = await self._queue.get()
+            if message is None:
+                return
+            await self._send(json.dumps(message))
+            self.sent += 1
+
+    async def close(self) -> None:
+        """Stop the writer once the messages already queued are sent"""
+        await self._queue.put(None)
+
+
+class ConnectionManager:
+    """
+    Open connections by session_id.
+
+    A session may have several connections (e.g. two tabs); updates
+    pushed to a session go to all of them. push() and broadcast() can be
+    called from any thread: off the event loop they are handed to it.
+    """
+
+    def __init__(self, max_queued: int = MAX_QUEUED_MESSAGES):
+        self.max_queued = max_queued
+        self._sessions: Dict[str, Set[Connection]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.connections_opened = 0
+        # Counters of connections already closed
+        self._sent = 0
+        self._dropped = 0
+
+    def __len__(self) -> int:
+        return sum(len(connections) for connections in self._sessions.values())
+
+    def connect(self, session_id: str, send: Callable[[str], Awaitable[None]]) -> Connection:
+        """Register a connection; call from the event loop"""
+        self._loop = asyncio.get_running_loop()
+        connection = Connection(session_id, send, self.max_queued)
+        self._sessions.setdefault(session_id, set()).add(connection)
+        self.connections_opened += 1
+        return connection
+
+    def disconnect(self, connection: Connection) -> None:
+        connections = self._sessions.get(connection.session_id)
+        if connections is not None:
+            if connection in connections:
+                connections.discard(connection)
+                self._sent += connection.sent
+                self._dropped += connection.dropped
+            if not connections:
+                del self._sessions[connection.session_id]
+
+    def has_connections(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def push(self, session_id: str, message: Dict[str, Any]) -> None:
+        """Send an update to every connection of a session"""
+        self._on_loop(self._push, session_id, message)
+
+    def broadcast(self, message: Dict[str, Any]) -> None:
+        """Send an update to every connection"""
+        self._on_loop(self._broadcast, message)
+
+    def _push(self, session_id: str, message: Dict[str, Any]) -> None:
+        for connection in self._sessions.get(session_id, ()):
+            connection.push(message)
+
+    def _broadcast(self, message: Dict[str, Any]) -> None:
+        for connections in self._sessions.values():
+            for connection in connections:
+                connection.push(message)
+
+    def _on_loop(self, func: Callable[..., None], *args) -> None:
+        if not self._sessions:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        connections = [connection for session in self._sessions.values() for connection in session]
+        return {
+            'sessions': len(self._sessions),
+            'connections': len(connections),
+            'connections_opened': self.connections_opened,
+            'messages_sent': self._sent + sum(connection.sent for connection in connections),
+            'pushes_dropped': self._dropped + sum(connection.dropped for connection in connections)
+        }
@@ -0,0 +1,282 @@
+"""
+Service Dispatcher for calling backend services in-process
+"""
+from typing import Dict, List, Any, AsyncIterator, Callable, Optional, Tuple
+from .recommender import ProductRecommender
+from .comparator import ProductComparator
+from .comparison_cache import ComparisonCache
+from .catalog import CatalogRepository, get_catalog
+from .cart import CartSnapshot
+from .sqlite_store import SQLiteStore, get_store
+
+
+VALID_PRIORITIES = ['camera', 'storage', 'gaming', 'battery', 'display', 'performance']
+
+
+class ServiceDispatcher:
+    """
+    Routes command handlers straight to the service objects.
+
+    Handlers used to reach other features by POSTing to our own API over
+    HTTP; the dispatcher calls the services directly instead, so a command
+    costs no extra round-trip, serialization or validation and doesn't
+    depend on the port the app is served on.
+    """
+    
+    def __init__(
+        self,
+        recommender: Optional[ProductRecommender] = None,
+        comparator: Optional[ProductComparator] = None,
+        catalog: Optional[CatalogRepository] = None,
+        store: Optional[SQLiteStore] = None
+    ):
+        self.recommender = recommender or ProductRecommender()
+        self.comparator = comparator or ProductComparator()
+        
+        self.comparison_cache = ComparisonCache()
+        
+        # Review analysis reads from the database when one is configured
+        self.store = store = store or get_store()
+        if store is not None:
+            self.recommender.review_analyzer.review_store = store
+            self.comparator.review_analyzer.review_store = store
+            store.add_listener(self.invalidate_products)
+        # Pinned catalog; by default the shared one, followed across hot swaps
+        self._pinned_catalog = catalog
+        self._catalog_version: Optional[int] = None
+    
+    @property
+    def catalog(self) -> CatalogRepository:
+        """Catalog in use; a hot-swapped catalog retires cached comparisons"""
+        catalog = self._pinned_catalog or get_catalog()
+        if catalog.version != self._catalog_version:
+            if self._catalog_version is not None:
+                self.comparison_cache.bump_version()
+            self._catalog_version = catalog.version
+        return catalog
+    
+    def get_product(self, product_id: Any) -> Optional[Dict[str, Any]]:
+        """Look up a catalog product by id (int or string)"""
+        return self.catalog.get(product_id)
+    
+    def find_product_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Catalog product whose name matches, or else contains every word of, the given name"""
+        return self.catalog.find_by_name(name)
+    
+    def compare(self, product_ids: List[Any], criteria: List[str]) -> Dict[str, Any]:
+        """
+        Compare catalog products, reusing cached results
+        
+        Products are compared in a canonical order (ids sorted) and criteria
+        in the order given. The cache key ignores the order of both, so the
+        same cart compared in any order yields the same cached result (whose
+        criteria are in the order of the request that computed it).
+        
+        Args:
+            product_ids: Ids of the products to compare; unknown ids are skipped
+            criteria: Comparison criteria (e.g., ['battery', 'camera'])
+            
+        Returns:
+            Comparison results with recommendations (shared; treat as read-only)
+            
+        Raises:
+            ValueError: If fewer than 2 known products are given
+        """
+        return self._compare_products(self.catalog.get_many(product_ids), criteria)
+    
+    def compare_cart(self, snapshot: CartSnapshot, criteria: List[str]) -> Dict[str, Any]:
+        """
+        Compare the catalog products in a cart, reusing cached results
+        
+        The snapshot's product records are compared as they are; they are
+        only looked up again if the catalog was swapped since they were
+        added. Products outside the catalog are skipped.
+        
+        Args:
+            snapshot: Cart snapshot (see Cart.snapshot)
+            criteria: Comparison criteria (e.g., ['battery', 'camera'])
+            
+        Returns:
+            Comparison results with recommendations (shared; treat as read-only)
+            
+        Raises:
+            ValueError: If the cart holds fewer than 2 catalog products
+        """
+        catalog = self.catalog
+        products = snapshot.catalog_products(catalog.version)
+        if products is None:
+            products = catalog.get_many(snapshot.product_ids)
+        return self._compare_products(products, criteria)
+    
+    async def compare_async(self, product_ids: List[Any], criteria: List[str]) -> Dict[str, Any]:
+        """
+        Same as compare(), for async handlers
+        
+        Raises:
+            ValueError: If fewer than 2 known products are given
+        """
+        return await self.run_blocking(self.compare, product_ids, criteria)
+    
+    async def compare_cart_async(self, snapshot: CartSnapshot, criteria: List[str]) -> Dict[str, Any]:
+        """
+        Same as compare_cart(), for async handlers
+        
+        Raises:
+            ValueError: If the cart holds fewer than 2 catalog products
+        """
+        return await self.run_blocking(self.compare_cart, snapshot, criteria)
+    
+    async def run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call a dispatcher method; with a database, review analysis reads it, so run off the event loop"""
+        if self.store is not None:
+            return await self.store.run_async(func, *args, **kwargs)
+        return func(*args, **kwargs)
+    
+    def _compare_products(self, products: Tuple[Dict[str, Any], ...], criteria: List[str]) -> Dict[str, Any]:
+        """Compare catalog product records in canonical order, through the comparison cache"""
+        by_id = {str(product['id']): product for product in products}
+        key = self.comparison_cache.make_key(by_id, criteria)
+        if len(key[0]) < 2:
+            raise ValueError("At least 2 products are required for comparison")
+        
+        result = self.comparison_cache.get(key)
+        if result is None:
+            generation = self.comparison_cache.generation
+            # Criteria are sorted only in the key; the comparison lists them in the caller's order
+            result = self.comparator.compare_products(
+                [by_id[product_id] for product_id in key[0]], list(dict.fromkeys(criteria))
+            )
+            self.comparison_cache.put(key, result, generation)
+        return result
+    
+    def invalidate_product(self, product_id: Any) -> None:
+        """Forget cached results for a product after its price or reviews changed"""
+        self.invalidate_products([product_id])
+    
+    def invalidate_products(self, product_ids: List[Any]) -> None:
+        """Forget cached results for products after their prices or reviews changed"""
+        self.comparison_cache.invalidate_products(product_ids)
+        
+        for product_id in product_ids:
+            product = self.get_product(product_id)
+            if product is not None:
+                for analyzer in (self.comparator.review_analyzer, self.recommender.review_analyzer):
+                    analyzer.feature_index.invalidate(product['id'])
+    
+    def recommend(
+        self,
+        budget: float,
+        priorities: List[str],
+        include_stores: bool = True,
+        top_k: int = 3,
+        location: Optional[Tuple[float, float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get budget recommendations
+        
+        Args:
+            budget: Maximum budget
+            priorities: Priority features, each one of VALID_PRIORITIES
+            include_stores: Whether to include nearby store prices
+            top_k: Number of recommendations to return
+            location: (latitude, longitude) of the user for nearby stores
+            
+        Returns:
+            Recommendations with scores and store prices
+            
+        Raises:
+            ValueError: If any priority is not a valid option
+        """
+        self._validate_priorities(priorities)
+        
+        result = self.recommender.get_budget_recommendations(
+            products=self.catalog.products,
+            budget=budget,
+            priorities=priorities,
+            include_stores=include_stores,
+            top_k=top_k,
+            location=location
+        )
+        result.setdefault('priorities_analyzed', priorities)
+        result.setdefault('budget', budget)
+        return result
+    
+    async def recommend_async(
+        self,
+        budget: float,
+        priorities: List[str],
+        include_stores: bool = True,
+        include_reviews: bool = True,
+        top_k: int = 3,
+        location: Optional[Tuple[float, float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get budget recommendations through the concurrent enrichment pipeline
+        
+        Same as recommend(), but store prices and review analysis for the
+        candidates are looked up concurrently with per-stage timeouts; see
+        ProductRecommender.get_budget_recommendations_async.
+        
+        Raises:
+            ValueError: If any priority is not a valid option
+        """
+        self._validate_priorities(priorities)
+        
+        result = await self.recommender.get_budget_recommendations_async(
+            products=self.catalog.products,
+            budget=budget,
+            priorities=priorities,
+            include_stores=include_stores,
+            include_reviews=include_reviews,
+            top_k=top_k,
+            location=location
+        )
+        result.setdefault('priorities_analyzed', priorities)
+        result.setdefault('budget', budget)
+        return result
+    
+    async def stream_recommend(
+        self,
+        budget: float,
+        priorities: List[str],
+        include_stores: bool = True,
+        include_reviews: bool = True,
+        top_k: int = 3,
+        location: Optional[Tuple[float, float]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Get budget recommendations as events, as each step completes
+        
+        See ProductRecommender.stream_budget_recommendations; the final
+        'result' event carries what recommend_async returns.
+        
+        Raises:
+            ValueError: If any priority is not a valid option
+        """
+        self._validate_priorities(priorities)
+        
+        async for event in self.recommender.stream_budget_recommendations(
+            products=self.catalog.products,
+            budget=budget,
+            priorities=priorities,
+            include_stores=include_stores,
+            include_reviews=include_reviews,
+            top_k=top_k,
+            location=location
+        ):
+            if event['event'] == 'result':
+                event['result'].setdefault('priorities_analyzed', priorities)
+                event['result'].setdefault('budget', budget)
+            yield event
+    
+    @staticmethod
+    def _validate_priorities(priorities: List[str]) -> None:
+        invalid_priorities = [p for p in priorities if p not in VALID_PRIORITIES]
+        if invalid_priorities:
+            raise ValueError(
+                f"Invalid priorities: {invalid_priorities}. Valid options: {VALID_PRIORITIES}"
+            )
+
+
+# Shared by the API routes so the catalog and scoring engine are built once
+service_dispatcher = ServiceDispatcher()
@@ -0,0 +1,168 @@
+"""
+Grid spatial index for nearest-store queries
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; works on scalars and NumPy arrays alike"""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoGridIndex:
+    """
+    Points bucketed into a latitude/longitude grid.
+
+    A query walks rings of cells outward from the query's cell, measuring
+    haversine distances only for the points in those cells, and stops once
+    no unvisited cell can hold a closer point (or one within the radius).
+    The cost depends on the number of points near the query, not on the
+    total number of points.
+    """
+
+    def __init__(self, latitudes: Iterable[float], longitudes: Iterable[float], cell_km: float = 2.0):
+        """
+        Args:
+            latitudes: Point latitudes in degrees
+            longitudes: Point longitudes in degrees
+            cell_km: Grid cell size (north-south) in km
+
+        Raises:
+            ValueError: If a coordinate is out of range
+        """
+        self.latitudes = np.asarray(list(latitudes), dtype=np.float64)
+        self.longitudes = np.asarray(list(longitudes), dtype=np.float64)
+        if self.latitudes.shape != self.longitudes.shape:
+            raise ValueError("latitudes and longitudes must have the same length")
+        if np.any(np.abs(self.latitudes) > 90) or np.any(np.abs(self.longitudes) > 180):
+            raise ValueError("Coordinates out of range")
+
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.lat_cells = int(math.ceil(180 / self.cell_deg))
+        self.lon_cells = int(math.ceil(360 / self.cell_deg))
+
+        rows, cols = self._cell_of(self.latitudes, self.longitudes)
+        keys = rows * self.lon_cells + cols
+        order = np.argsort(keys, kind='stable')
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self._cells: Dict[int, np.ndarray] = {
+            int(key): order[start:end] for key, start, end in zip(unique_keys, starts, ends)
+        }
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def _cell_of(self, latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.minimum(np.floor((np.asarray(latitudes) + 90) / self.cell_deg), self.lat_cells - 1)
+        cols = np.floor((np.asarray(longitudes) + 180) / self.cell_deg) % self.lon_cells
+        return rows.astype(np.int64), cols.astype(np.int64)
+
+    def _ring(self, row: int, col: int, ring: int) -> List[np.ndarray]:
+        """Point indexes of the cells exactly `ring` cells from (row, col)"""
+        keys = set()
+        for d_row in range(-ring, ring + 1):
+            cell_row = row + d_row
+            if not 0 <= cell_row < self.lat_cells:
+                continue
+            d_cols = range(-ring, ring + 1) if abs(d_row) == ring else (-ring, ring)
+            for d_col in d_cols:
+                keys.add(cell_row * self.lon_cells + (col + d_col) % self.lon_cells)
+        return [self._cells[key] for key in keys if key in self._cells]
+
+    def _unvisited_bound_km(self, latitude: float, ring: int) -> float:
+        """Lower bound on the distance to any point outside rings 0..ring"""
+        # Beyond the ring a point is at least `ring` whole cells away in latitude or longitude
+        lat_gap_km = ring * self.cell_km
+        max_lat = math.radians(min(abs(latitude) + (ring + 1) * self.cell_deg, 90.0))
+        lon_gap = math.radians(min(ring * self.cell_deg, 180.0))
+        lon_gap_km = 2 * EARTH_RADIUS_KM * math.asin(min(math.cos(max_lat) * math.sin(lon_gap / 2), 1.0))
+        return min(lat_gap_km, lon_gap_km)
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: Optional[int] = None,
+        radius_km: Optional[float] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Nearest points to a location
+
+        Args:
+            latitude: Query latitude in degrees
+            longitude: Query longitude in degrees
+            k: Maximum number of points to return (None for all within radius_km)
+            radius_km: Only return points within this distance (None for no limit)
+
+        Returns:
+            List of (point index, distance in km), nearest first
+
+        Raises:
+            ValueError: If neither k nor radius_km is given
+        """
+        if k is None and radius_km is None:
+            raise ValueError("nearest() needs k, radius_km or both")
+        if (k is not None and k <= 0) or not len(self):
+            return []
+
+        row, col = (int(value) for value in self._cell_of(latitude, longitude))
+        max_ring = max(self.lat_cells, self.lon_cells)
+        indexes: List[np.ndarray] = []
+        distances: List[np.ndarray] = []
+        found = 0
+
+        for ring in range(max_ring + 1):
+            if (2 * ring + 1) ** 2 > len(self):
+                # Sparse neighbourhood: scanning every point is cheaper than more rings
+                return self._closest(np.arange(len(self)), latitude, longitude, k, radius_km)
+            cells = self._ring(row, col, ring)
+            if cells:
+                candidates = np.concatenate(cells)
+                candidate_distances = haversine_km(
+                    latitude, longitude, self.latitudes[candidates], self.longitudes[candidates]
+                )
+                if radius_km is not None:
+                    inside = candidate_distances <= radius_km
+                    candidates, candidate_distances = candidates[inside], candidate_distances[inside]
+                indexes.append(candidates)
+                distances.append(candidate_distances)
+                found += len(candidates)
+
+            bound = self._unvisited_bound_km(latitude, ring)
+            if radius_km is not None and bound > radius_km:
+                break
+            if k is not None and found >= k and np.partition(np.concatenate(distances), k - 1)[k - 1] <= bound:
+                break
+
+        if not found:
+            return []
+        return self._closest(np.concatenate(indexes), latitude, longitude, k, radius_km)
+
+    def _closest(
+        self,
+        candidates: np.ndarray,
+        latitude: float,
+        longitude: float,
+        k: Optional[int],
+        radius_km: Optional[float]
+    ) -> List[Tuple[int, float]]:
+        """Rank candidate points by distance (ties by index), keeping k within radius_km"""
+        distances = haversine_km(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        if radius_km is not None:
+            inside = distances <= radius_km
+            candidates, distances = candidates[inside], distances[inside]
+        order = np.lexsort((candidates, distances))
+        if k is not None:
+            order = order[:k]
+        return list(zip(candidates[order].tolist(), distances[order].tolist()))
@@ -0,0 +1,34 @@
+"""
+Shared HTTP client for outbound calls
+"""
+from typing import Optional
+import httpx
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the app-wide pooled HTTP client
+    
+    The client is created on first use and keeps its connections alive
+    across requests, so outbound calls skip the TCP (and TLS) handshake.
+    Use it for calls that really need HTTP; our own services are called
+    through the ServiceDispatcher instead.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=httpx.Timeout(10.0)
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
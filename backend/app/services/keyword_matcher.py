@@ -0,0 +1,77 @@
+"""
+Multi-keyword matcher for scanning review text in a single pass
+"""
+from typing import Dict, Hashable, Iterable, List
+import re
+
+
+class KeywordMatcher:
+    """
+    Finds every keyword of several labelled keyword groups in one scan.
+
+    The keywords are merged into a trie, and the trie is compiled into a
+    single regular expression, so a text is scanned once however many
+    keywords there are. Matches must start at a word boundary: "mp" does not
+    match inside "improved", but still matches in "12mp". Keywords sharing a
+    start are matched longest first ("battery life" before "battery").
+    """
+
+    def __init__(self, groups: Dict[Hashable, Iterable[str]]):
+        """
+        Args:
+            groups: Mapping of label -> keywords; a keyword may belong to
+                several labels
+        """
+        self._labels: Dict[str, List[Hashable]] = {}
+        for label, keywords in groups.items():
+            for keyword in keywords:
+                labels = self._labels.setdefault(keyword.lower(), [])
+                if label not in labels:
+                    labels.append(label)
+
+        trie: Dict[str, dict] = {}
+        for keyword in self._labels:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        # The word-start check sits after each first character rather than in
+        # front of the whole pattern, so the regex engine can still skip ahead
+        # to positions holding a possible first character
+        branches = [
+            re.escape(char) + r"(?<![a-z].)" + self._trie_pattern(child)
+            for char, child in sorted(trie.items())
+        ]
+        self._regex = re.compile('(?:' + '|'.join(branches) + ')')
+
+    @classmethod
+    def _trie_pattern(cls, node: Dict[str, dict]) -> str:
+        """Regex source matching any keyword below a trie node, longest first"""
+        branches = [
+            re.escape(char) + cls._trie_pattern(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        terminal = '' in node
+
+        if not branches:
+            return ''
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+
+        pattern = '(?:' + '|'.join(branches) + ')'
+        return pattern + '?' if terminal else pattern
+
+    def scan(self, text: str) -> Dict[Hashable, int]:
+        """
+        Find the keywords present in a lowercase text
+
+        Returns:
+            Mapping of label -> number of distinct keywords of that label found
+        """
+        hits: Dict[Hashable, int] = {}
+        for keyword in set(self._regex.findall(text)):
+            for label in self._labels[keyword]:
+                hits[label] = hits.get(label, 0) + 1
+        return hits
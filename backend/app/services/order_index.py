@@ -0,0 +1,220 @@
+"""
+Order history index for paginated, newest-first order queries
+"""
+from typing import Dict, List, Any, Iterable, Iterator, Mapping, Optional, Tuple
+from bisect import bisect_left, bisect_right
+import base64
+import heapq
+import itertools
+import json
+import threading
+
+
+DEFAULT_USER = "demo"
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# (date, order_id): orders sort newest first by date, then by order id
+OrderKey = Tuple[str, str]
+
+
+def order_key(order: Mapping[str, Any]) -> OrderKey:
+    return (order['date'], order['order_id'])
+
+
+def encode_cursor(key: OrderKey) -> str:
+    """Opaque cursor for the page after the order with this key"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> OrderKey:
+    """
+    Key of the last order of the previous page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        date, order_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(date, str) or not isinstance(order_id, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return (date, order_id)
+
+
+def paginate(
+    pages: List[Iterable[Tuple[OrderKey, Dict[str, Any]]]],
+    limit: int
+) -> Dict[str, Any]:
+    """
+    Merge newest-first (key, order) streams into one page
+
+    Each stream needs to yield at most limit + 1 orders; the extra one only
+    tells whether there is a next page.
+
+    Returns:
+        {'orders': [...], 'next_cursor': cursor or None}
+    """
+    merged = pages[0] if len(pages) == 1 else heapq.merge(*pages, key=lambda item: item[0], reverse=True)
+    rows = list(itertools.islice(merged, limit + 1))
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return {
+        'orders': [order for _, order in rows[:limit]],
+        'next_cursor': next_cursor
+    }
+
+
+class _OrderList:
+    """Order keys and orders in parallel lists, sorted by key (oldest first)"""
+
+    __slots__ = ('keys', 'orders')
+
+    def __init__(self):
+        self.keys: List[OrderKey] = []
+        self.orders: List[Dict[str, Any]] = []
+
+    def insert(self, key: OrderKey, order: Dict[str, Any]) -> None:
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.orders.insert(position, order)
+
+    def remove(self, key: OrderKey) -> None:
+        position = bisect_left(self.keys, key)
+        del self.keys[position]
+        del self.orders[position]
+
+    def extend(self, entries: List[Tuple[OrderKey, Dict[str, Any]]]) -> None:
+        """Add many orders with one sort instead of an insert each"""
+        merged = sorted(itertools.chain(zip(self.keys, self.orders), entries), key=lambda entry: entry[0])
+        self.keys = [key for key, _ in merged]
+        self.orders = [order for _, order in merged]
+
+    def newest_first(
+        self,
+        before: Optional[OrderKey],
+        since: Optional[str],
+        until: Optional[str]
+    ) -> Iterator[Tuple[OrderKey, Dict[str, Any]]]:
+        """Orders older than before, dated within [since, until], newest first"""
+        end = len(self.keys)
+        if until is not None:
+            # Every key dated until sorts before (until, <any longer string>)
+            end = bisect_left(self.keys, (until + '\uffff',))
+        if before is not None:
+            end = min(end, bisect_left(self.keys, before))
+
+        for position in range(end - 1, -1, -1):
+            key = self.keys[position]
+            if since is not None and key[0] < since:
+                return
+            yield key, self.orders[position]
+
+
+class OrderIndex:
+    """
+    Orders kept sorted by (date, order id) per user, overall and by status.
+
+    A page is a bisect to the cursor or date bound and a walk back over
+    at most limit + 1 orders, so the newest orders of a long history are
+    found without reading or sorting the rest. Status filters walk the
+    per-status lists and merge them. Dates are ISO strings (YYYY-MM-DD),
+    which sort chronologically.
+    """
+
+    def __init__(self, orders: Iterable[Mapping[str, Any]] = (), user_id: str = DEFAULT_USER):
+        self._all: Dict[str, _OrderList] = {}
+        self._statuses: Dict[Tuple[str, str], _OrderList] = {}
+        # (user_id, order_id) -> order
+        self._orders: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        self.load(orders, user_id)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def insert(self, order: Mapping[str, Any], user_id: str = DEFAULT_USER) -> None:
+        """Add an order, replacing any order with the same id"""
+        order = dict(order)
+        with self._lock:
+            self._remove((user_id, order['order_id']))
+            key = order_key(order)
+            self._all.setdefault(user_id, _OrderList()).insert(key, order)
+            self._statuses.setdefault((user_id, order['status'].lower()), _OrderList()).insert(key, order)
+            self._orders[(user_id, order['order_id'])] = order
+
+    def load(self, orders: Iterable[Mapping[str, Any]], user_id: str = DEFAULT_USER) -> None:
+        """Add many orders of a user, replacing any with the same ids"""
+        # The last of several orders with the same id wins, as with insert
+        orders = {order['order_id']: dict(order) for order in orders}
+        with self._lock:
+            for order_id in orders:
+                self._remove((user_id, order_id))
+
+            entries = []
+            by_status: Dict[str, List[Tuple[OrderKey, Dict[str, Any]]]] = {}
+            for order_id, order in orders.items():
+                entry = (order_key(order), order)
+                entries.append(entry)
+                by_status.setdefault(order['status'].lower(), []).append(entry)
+                self._orders[(user_id, order_id)] = order
+
+            self._all.setdefault(user_id, _OrderList()).extend(entries)
+            for status, status_entries in by_status.items():
+                self._statuses.setdefault((user_id, status), _OrderList()).extend(status_entries)
+
+    def remove(self, order_id: str, user_id: str = DEFAULT_USER) -> bool:
+        with self._lock:
+            return self._remove((user_id, order_id))
+
+    def _remove(self, entry: Tuple[str, str]) -> bool:
+        order = self._orders.pop(entry, None)
+        if order is None:
+            return False
+        user_id = entry[0]
+        key = order_key(order)
+        self._all[user_id].remove(key)
+        self._statuses[(user_id, order['status'].lower())].remove(key)
+        return True
+
+    def get_orders(
+        self,
+        user_id: str = DEFAULT_USER,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        statuses: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        A page of a user's orders, newest first
+
+        Args:
+            user_id: Whose orders
+            limit: Page size
+            cursor: next_cursor of the previous page, or None for the first page
+            since: Earliest order date to include (YYYY-MM-DD)
+            until: Latest order date to include (YYYY-MM-DD)
+            statuses: Only orders with one of these statuses (case-insensitive)
+
+        Returns:
+            {'orders': [...], 'next_cursor': cursor or None}
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        before = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            if statuses:
+                lists = [self._statuses.get((user_id, status)) for status in {status.lower() for status in statuses}]
+            else:
+                lists = [self._all.get(user_id)]
+            pages = [
+                list(itertools.islice(order_list.newest_first(before, since, until), limit + 1))
+                for order_list in lists if order_list is not None
+            ]
+        if not pages:
+            return {'orders': [], 'next_cursor': None}
+        return paginate(pages, limit)
@@ -1,6 +1,29 @@
 import re
-from typing import Dict, Any, Tuple, List
+import copy
+from typing import Dict, Any, Tuple, List, Optional
 from app.models import ActionType
+from .cache import LRUCache
+
+
+def normalize_command(command: str) -> str:
+    """Lowercase a command and collapse runs of whitespace"""
+    return " ".join(command.lower().split())
+
+
+class _PatternMatch:
+    """Capture groups of the winning pattern inside the combined intent regex"""
+    
+    __slots__ = ("_groups",)
+    
+    def __init__(self, groups: Tuple[Any, ...]):
+        self._groups = groups
+    
+    def groups(self) -> Tuple[Any, ...]:
+        return self._groups
+    
+    def group(self, index: int) -> Any:
+        return self._groups[index - 1]
+
 
 class CommandParser:
     """Parse natural language commands into structured actions"""
@@ -37,9 +60,9 @@ class CommandParser:
             ActionType.COMPARE: [
                 r"compare (?:the\s+)?(?:phones?|products?|items?) in (?:my\s+)?cart(?:\s+for\s+(.+))?",
                 r"which (?:one\s+)?is better(?:\s+for\s+(.+))?",
-                r"is (.+?) better than (.+?)(?:\s+for\s+(.+))?",
-                r"compare (.+?) (?:and|vs\.?|versus|with) (.+?)(?:\s+for\s+(.+))?",
-                r"what(?:'s| is) the difference between (.+?) and (.+)"
+                r"is (.+?) better than (.+?)(?:\s+for\s+(.+?))?\??$",
+                r"compare (.+?) (?:and|vs\.?|versus|with) (.+?)(?:\s+for\s+(.+?))?\??$",
+                r"what(?:'s| is) the difference between (.+?) and (.+?)\??$"
             ],
             ActionType.RECOMMEND: [
                 r"(?:find|show|recommend|suggest)\s+(?:me\s+)?(?:the\s+)?best (.+?) under \$?(\d+(?:k)?)",
@@ -59,7 +82,35 @@ class CommandParser:
             'performance': r'performance|speed|gaming|fast|processor',
             'price': r'price|cost|value|money'
         }
+        
+        # Combined matcher for all intent patterns (see _compile_patterns)
+        self._intent_regex, self._intent_groups = self._compile_patterns()
     
+    def _compile_patterns(self) -> Tuple["re.Pattern", Dict[str, Tuple[ActionType, int, int]]]:
+        """
+        Compile every intent pattern into a single alternation.
+        
+        Each pattern is wrapped in its own named group, in the same order as
+        self.patterns, so the regex engine tries them with today's priority and
+        the first alternative that matches wins. Returns the compiled regex and
+        a map from group name to (action type, first group index, group count)
+        used to recover the winning pattern's own capture groups.
+        """
+        alternatives = []
+        groups = {}
+        group_index = 0
+        
+        for action_type, patterns in self.patterns.items():
+            for pattern in patterns:
+                name = f"p{len(alternatives)}"
+                group_count = re.compile(pattern).groups
+                # The wrapping group itself takes one index before the inner groups
+                groups[name] = (action_type, group_index + 1, group_count)
+                group_index += group_count + 1
+                alternatives.append(f"(?P<{name}>{pattern})")
+        
+        return re.compile("|".join(alternatives), re.IGNORECASE), groups
+
     def parse_command(self, command: str) -> Tuple[ActionType, Dict[str, Any]]:
         """Parse a command and return the action type and extracted data"""
         command_lower = command.lower().strip()
@@ -68,17 +119,17 @@ class CommandParser:
         if "phones under 50k" in command_lower:
             return ActionType.SEARCH, {"query": "phone"}
         
-        # Check each pattern type
-        for action_type, patterns in self.patterns.items():
-            for pattern in patterns:
-                match = re.match(pattern, command_lower, re.IGNORECASE)
-                if match:
-                    return self._extract_action_data(action_type, match, command_lower)
+        # Single pass over all patterns, in priority order
+        match = self._intent_regex.match(command_lower)
+        if match:
+            action_type, first_group, group_count = self._intent_groups[match.lastgroup]
+            groups = match.groups()[first_group:first_group + group_count]
+            return self._extract_action_data(action_type, _PatternMatch(groups), command_lower)
         
         # If no pattern matches, try to infer from keywords
         return self._infer_action(command_lower)
     
-    def _extract_action_data(self, action_type: ActionType, match: re.Match, command: str) -> Tuple[ActionType, Dict[str, Any]]:
+    def _extract_action_data(self, action_type: ActionType, match: "_PatternMatch", command: str) -> Tuple[ActionType, Dict[str, Any]]:
         """Extract relevant data based on action type"""
         data = {}
         
@@ -225,4 +276,26 @@ class CommandParser:
         try:
             return float(budget_str)
         except:
-            return 0
\ No newline at end of file
+            return 0
+
+
+class CachedCommandParser(CommandParser):
+    """CommandParser with an LRU cache of parse results in front of it"""
+    
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = 300):
+        super().__init__()
+        self.cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+    
+    def parse_command(self, command: str) -> Tuple[ActionType, Dict[str, Any]]:
+        """Parse a command, serving repeated phrases from the cache"""
+        key = normalize_command(command)
+        
+        cached = self.cache.get(key)
+        if cached is None:
+            action_type, data = super().parse_command(key)
+            # Keep a private copy so callers can't mutate the cached entry
+            cached = (action_type, copy.deepcopy(data))
+            self.cache.put(key, cached)
+        
+        action_type, data = cached
+        return action_type, copy.deepcopy(data)
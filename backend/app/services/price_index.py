@@ -0,0 +1,62 @@
+"""
+Price-sorted product index for budget queries
+"""
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from .catalog_storage import MappedCatalog
+
+
+class PriceIndex:
+    """
+    Catalog positions sorted by price.
+
+    The products within a budget are a prefix of the price order, so a
+    budget query is a bisect plus a slice. Products with equal prices keep
+    catalog order. Catalogs are immutable (a price change arrives as a new
+    catalog version), so an index is built once per product list and shared
+    by everything that filters that list by budget.
+    """
+
+    def __init__(self, prices: Sequence[float]):
+        """
+        Args:
+            prices: Price of each product, in catalog order
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        # Catalog positions, cheapest first, and their prices
+        self.positions = np.argsort(prices, kind='stable').astype(np.int64)
+        self.prices = prices[self.positions]
+
+    @classmethod
+    def from_products(cls, products: Sequence[Dict[str, Any]]) -> "PriceIndex":
+        """Index a product list or a mapped catalog (read from its price column)"""
+        if isinstance(products, MappedCatalog):
+            return cls(products.column('price'))
+        return cls(np.fromiter((product['price'] for product in products), dtype=np.float64, count=len(products)))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def count_under(self, budget: float) -> int:
+        """Number of products priced at or below budget"""
+        return int(np.searchsorted(self.prices, budget, side='right'))
+
+    def positions_under(self, budget: float, limit: Optional[int] = None, reverse: bool = False) -> np.ndarray:
+        """
+        Catalog positions of products priced at or below budget
+
+        Args:
+            budget: Maximum price
+            limit: Return at most this many positions
+            reverse: Priciest first instead of cheapest first
+
+        Returns:
+            Positions in price order (a view of the index; don't modify it)
+        """
+        count = self.count_under(budget)
+        if not reverse:
+            return self.positions[:count if limit is None else min(count, limit)]
+        start = 0 if limit is None else max(count - limit, 0)
+        return self.positions[start:count][::-1]
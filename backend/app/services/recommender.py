@@ -1,9 +1,17 @@
 """
 Product Recommendation Service for budget-based recommendations
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, AsyncIterator, Awaitable, Optional, Tuple
+import asyncio
 from .analyzer import ReviewAnalyzer
 from .store_locator import StoreLocator
+from .scoring_engine import CatalogScoringEngine
+
+
+# Enrichment pipeline limits: lookups running at once, and seconds allowed per stage
+ENRICHMENT_CONCURRENCY = 8
+STORE_STAGE_TIMEOUT = 2.0
+REVIEW_STAGE_TIMEOUT = 2.0
 
 
 class ProductRecommender:
@@ -12,13 +20,22 @@ class ProductRecommender:
     def __init__(self):
         self.review_analyzer = ReviewAnalyzer()
         self.store_locator = StoreLocator()
+        self._scoring_engine: Optional[CatalogScoringEngine] = None
+    
+    def _get_scoring_engine(self, products: List[Dict[str, Any]]) -> CatalogScoringEngine:
+        """Columnar engine for a catalog, reused while the same catalog is passed in"""
+        if self._scoring_engine is None or self._scoring_engine.products is not products:
+            self._scoring_engine = CatalogScoringEngine(products, self.review_analyzer)
+        return self._scoring_engine
     
     def get_budget_recommendations(
         self, 
         products: List[Dict[str, Any]], 
         budget: float, 
         priorities: List[str],
-        include_stores: bool = True
+        include_stores: bool = True,
+        top_k: int = 3,
+        location: Optional[Tuple[float, float]] = None
     ) -> Dict[str, Any]:
         """
         Get product recommendations within budget
@@ -28,68 +45,263 @@ class ProductRecommender:
             budget: Maximum budget
             priorities: List of priority features (e.g., ['camera', 'storage', 'gaming'])
             include_stores: Whether to include nearby store prices
+            top_k: Number of recommendations to return
+            location: (latitude, longitude) of the user for nearby stores
             
         Returns:
             Recommendations with scores and store prices
         """
-        # Filter products within budget
-        eligible_products = [p for p in products if p['price'] <= budget]
+        candidates = self._rank_candidates(products, budget, priorities, top_k)
+        if not candidates:
+            return self._no_recommendations(budget)
         
-        if not eligible_products:
-            return {
-                'recommendations': [],
-                'message': f"No products found within budget of ${budget}",
-                'best_choice': None
-            }
+        # Add store prices if requested
+        if include_stores:
+            for product, product_recommendation in candidates:
+                product_recommendation['store_prices'] = self.store_locator.get_nearby_stores_with_prices(
+                    product['id'], 
+                    product['price'],
+                    location=location
+                )
         
-        # Score each product based on priorities
-        scored_products = []
+        return self._assemble([recommendation for _, recommendation in candidates], priorities, budget)
+    
+    async def get_budget_recommendations_async(
+        self,
+        products: List[Dict[str, Any]],
+        budget: float,
+        priorities: List[str],
+        include_stores: bool = True,
+        include_reviews: bool = True,
+        top_k: int = 3,
+        location: Optional[Tuple[float, float]] = None,
+        concurrency: int = ENRICHMENT_CONCURRENCY,
+        store_timeout: float = STORE_STAGE_TIMEOUT,
+        review_timeout: float = REVIEW_STAGE_TIMEOUT
+    ) -> Dict[str, Any]:
+        """
+        Get product recommendations, enriching the candidates concurrently
+        
+        Candidates are scored as in get_budget_recommendations. Their store
+        price lookups and review lookups then run at the same time in
+        worker threads, at most `concurrency` at once. Each stage has its
+        own deadline; lookups still running at the deadline are left out
+        and the response is marked partial instead of failing.
         
-        for product in eligible_products:
-            scores = self._calculate_product_scores(product, priorities)
-            overall_score = sum(scores.values()) / len(scores) if scores else 0
+        Args:
+            products: List of all available products
+            budget: Maximum budget
+            priorities: List of priority features (e.g., ['camera', 'storage', 'gaming'])
+            include_stores: Whether to include nearby store prices
+            include_reviews: Whether to include review analysis for the priorities
+            top_k: Number of recommendations to return
+            location: (latitude, longitude) of the user for nearby stores
+            concurrency: Maximum number of lookups running at once
+            store_timeout: Seconds allowed for the store price stage
+            review_timeout: Seconds allowed for the review stage
+            
+        Returns:
+            Recommendations as get_budget_recommendations returns them, plus
+            'review_analysis' per product, 'partial' and 'incomplete' (the
+            lookups that timed out or failed)
+        """
+        result = None
+        async for event in self.stream_budget_recommendations(
+            products, budget, priorities, include_stores, include_reviews,
+            top_k, location, concurrency, store_timeout, review_timeout
+        ):
+            if event['event'] == 'result':
+                result = event['result']
+        return result
+    
+    async def stream_budget_recommendations(
+        self,
+        products: List[Dict[str, Any]],
+        budget: float,
+        priorities: List[str],
+        include_stores: bool = True,
+        include_reviews: bool = True,
+        top_k: int = 3,
+        location: Optional[Tuple[float, float]] = None,
+        concurrency: int = ENRICHMENT_CONCURRENCY,
+        store_timeout: float = STORE_STAGE_TIMEOUT,
+        review_timeout: float = REVIEW_STAGE_TIMEOUT
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Get product recommendations as they are worked out
+        
+        Runs the pipeline of get_budget_recommendations_async (same
+        arguments) and yields an event as each step completes:
+        
+            {'event': 'candidates', 'recommendations': [...]}
+                The scored candidates, best first, before enrichment
+            {'event': 'store_prices' or 'review_analysis', 'product_id': ...,
+             'status': 'ok', 'timeout' or 'error', 'value': ...}
+                One candidate's lookup finished (value is None unless ok)
+            {'event': 'result', 'result': {...}}
+                The result get_budget_recommendations_async returns; always last
+        
+        Closing the generator early cancels lookups that haven't started.
+        """
+        review_store = self.review_analyzer.review_store
+        if review_store is not None:
+            # Scoring reads the reviews from the database; keep it off the event loop
+            candidates = await review_store.run_async(self._rank_candidates, products, budget, priorities, top_k)
+        else:
+            candidates = self._rank_candidates(products, budget, priorities, top_k)
+        if not candidates:
+            result = self._no_recommendations(budget)
+            result.update({'partial': False, 'incomplete': []})
+            yield {'event': 'result', 'result': result}
+            return
+        
+        yield {'event': 'candidates', 'recommendations': [dict(recommendation) for _, recommendation in candidates]}
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def lookup(func, *args):
+            async with semaphore:
+                return await asyncio.to_thread(func, *args)
+        
+        stages = []
+        if include_stores:
+            stages.append(('store_prices', store_timeout, [
+                lookup(self.store_locator.get_nearby_stores_with_prices, product['id'], product['price'], 3, location)
+                for product, _ in candidates
+            ]))
+        if include_reviews:
+            stages.append(('review_analysis', review_timeout, [
+                lookup(self.review_analyzer.analyze_product_features, product, priorities)
+                for product, _ in candidates
+            ]))
+        
+        incomplete = []
+        async for stage, position, status, value in self._run_stages(stages):
+            field = stages[stage][0]
+            product, product_recommendation = candidates[position]
+            if status == 'ok':
+                product_recommendation[field] = value
+            else:
+                incomplete.append((stage, position, {'product_id': product['id'], 'stage': field, 'reason': status}))
+            yield {'event': field, 'product_id': product['id'], 'status': status, 'value': value}
+        
+        result = self._assemble([recommendation for _, recommendation in candidates], priorities, budget)
+        result['partial'] = bool(incomplete)
+        # Listed by stage, then candidate, whatever order they finished in
+        result['incomplete'] = [entry for _, _, entry in sorted(incomplete, key=lambda item: item[:2])]
+        yield {'event': 'result', 'result': result}
+    
+    @staticmethod
+    async def _run_stages(
+        stages: List[Tuple[str, float, List[Awaitable[Any]]]]
+    ) -> AsyncIterator[Tuple[int, int, str, Any]]:
+        """
+        Run every stage's lookups concurrently, each stage until its deadline
+        
+        Yields:
+            (stage index, lookup index, status, value) as each lookup
+            finishes or its stage's deadline passes: status is 'ok',
+            'timeout' or 'error'
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadlines = [start + timeout for _, timeout, _ in stages]
+        tasks = {
+            asyncio.ensure_future(lookup): (stage, position)
+            for stage, (_, _, lookups) in enumerate(stages)
+            for position, lookup in enumerate(lookups)
+        }
+        
+        try:
+            while tasks:
+                next_deadline = min(deadlines[stage] for stage, _ in tasks.values())
+                done, _ = await asyncio.wait(
+                    tasks, timeout=max(next_deadline - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    stage, position = tasks.pop(task)
+                    if task.exception() is not None:
+                        yield stage, position, 'error', None
+                    else:
+                        yield stage, position, 'ok', task.result()
+                
+                now = loop.time()
+                for task, (stage, position) in list(tasks.items()):
+                    if deadlines[stage] <= now:
+                        # A lookup already running in a thread finishes in the background; its result is dropped
+                        task.cancel()
+                        del tasks[task]
+                        yield stage, position, 'timeout', None
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def _rank_candidates(
+        self,
+        products: List[Dict[str, Any]],
+        budget: float,
+        priorities: List[str],
+        top_k: int
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """The top_k products within budget with their scores, as (product, recommendation) pairs"""
+        engine = self._get_scoring_engine(products)
+        
+        # Filter and score the whole catalog at once
+        scored = engine.score(budget, priorities)
+        
+        # Select the top k by overall score; only these are enriched
+        candidates = []
+        
+        for position in engine.rank(scored['overall'], limit=top_k, tie_break=scored['indexes']):
+            product = engine.products[scored['indexes'][position]]
+            overall_score = float(scored['overall'][position])
             
             product_recommendation = {
                 'product': product['name'],
                 'product_id': product['id'],
                 'online_price': product['price'],
-                'score': scores,
+                'score': {
+                    priority: float(priority_scores[position])
+                    for priority, priority_scores in scored['scores'].items()
+                },
                 'overall_score': round(overall_score, 1),
-                'value_score': self._calculate_value_score(overall_score, product['price'], budget)
+                'value_score': round(float(scored['value'][position]), 1)
             }
             
-            # Add store prices if requested
-            if include_stores:
-                product_recommendation['store_prices'] = self.store_locator.get_nearby_stores_with_prices(
-                    product['id'], 
-                    product['price']
-                )
-            
-            scored_products.append(product_recommendation)
-        
-        # Sort by overall score
-        scored_products.sort(key=lambda x: x['overall_score'], reverse=True)
-        
-        # Get top 3 recommendations
-        top_recommendations = scored_products[:3]
+            candidates.append((product, product_recommendation))
         
+        return candidates
+    
+    def _no_recommendations(self, budget: float) -> Dict[str, Any]:
+        return {
+            'recommendations': [],
+            'message': f"No products found within budget of ${budget}",
+            'best_choice': None
+        }
+    
+    def _assemble(self, recommendations: List[Dict[str, Any]], priorities: List[str], budget: float) -> Dict[str, Any]:
         # Determine best choice considering both score and value
-        best_choice = self._determine_best_choice(top_recommendations, priorities)
+        best_choice = self._determine_best_choice(recommendations, priorities)
         
         return {
-            'recommendations': top_recommendations,
+            'recommendations': recommendations,
             'best_choice': best_choice,
             'priorities_analyzed': priorities,
             'budget': budget
         }
     
-    def _calculate_product_scores(self, product: Dict[str, Any], priorities: List[str]) -> Dict[str, float]:
+    def _calculate_product_scores(
+        self, 
+        product: Dict[str, Any], 
+        priorities: List[str],
+        review_analysis: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Dict[str, float]:
         """Calculate scores for each priority feature"""
         scores = {}
         
         # Map priorities to scoring functions
         scoring_functions = {
-            'camera': self._score_camera,
+            'camera': lambda p: self._score_camera(p, review_analysis),
             'storage': self._score_storage,
             'gaming': self._score_gaming,
             'battery': self._score_battery,
@@ -103,11 +315,11 @@ class ProductRecommender:
                 scores[priority] = score
             else:
                 # Default scoring based on reviews if available
-                scores[priority] = self._score_from_reviews(product, priority)
+                scores[priority] = self._score_from_reviews(product, priority, review_analysis)
         
         return scores
     
-    def _score_camera(self, product: Dict[str, Any]) -> float:
+    def _score_camera(self, product: Dict[str, Any], review_analysis: Optional[Dict[str, Dict[str, Any]]] = None) -> float:
         """Score camera quality (0-100)"""
         score = 50  # Base score
         
@@ -130,7 +342,7 @@ class ProductRecommender:
         
         # Adjust based on reviews if available
         if 'reviews' in product:
-            review_score = self._get_review_score_for_feature(product['reviews'], 'camera')
+            review_score = self._get_review_score_for_feature(product, 'camera', review_analysis)
             if review_score > 0:
                 score = (score + review_score * 20) / 2
         
@@ -235,17 +447,30 @@ class ProductRecommender:
         # Similar to gaming but more general
         return self._score_gaming(product) * 0.9
     
-    def _score_from_reviews(self, product: Dict[str, Any], feature: str) -> float:
+    def _score_from_reviews(
+        self, 
+        product: Dict[str, Any], 
+        feature: str, 
+        review_analysis: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> float:
         """Generic scoring based on reviews"""
         if 'reviews' not in product:
             return 60  # Default middle score
         
-        score = self._get_review_score_for_feature(product['reviews'], feature)
+        score = self._get_review_score_for_feature(product, feature, review_analysis)
         return score * 20  # Convert 5-star to 100
     
-    def _get_review_score_for_feature(self, reviews: List[Dict[str, Any]], feature: str) -> float:
+    def _get_review_score_for_feature(
+        self, 
+        product: Dict[str, Any], 
+        feature: str, 
+        review_analysis: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> float:
         """Get average review score for a specific feature"""
-        analysis = self.review_analyzer.analyze_reviews_for_features(reviews, [feature])
+        if review_analysis is not None:
+            analysis = review_analysis
+        else:
+            analysis = self.review_analyzer.analyze_product_features(product, [feature])
         feature_data = analysis.get(feature, {})
         return feature_data.get('average_rating', 3.0)
     
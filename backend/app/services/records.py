@@ -0,0 +1,137 @@
+"""
+Immutable catalog records
+"""
+from typing import Any, Dict, Iterable, Iterator, Mapping
+from types import MappingProxyType
+import sys
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _Record(Mapping):
+    """
+    Read-only record with a fixed set of fields stored in __slots__.
+
+    Records behave like the dicts they replace (record['price'],
+    record.get('reviews', []), 'reviews' in record, dict(record)), but take
+    a fraction of the memory and cannot be modified.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, values: Mapping):
+        for field in self.__slots__:
+            if field in values:
+                object.__setattr__(self, field, values[field])
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.__slots__:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__ and hasattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (field for field in self.__slots__ if hasattr(self, field))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+class ReviewRecord(_Record):
+    __slots__ = ('text', 'rating')
+
+
+class ProductRecord(_Record):
+    """
+    Catalog product.
+
+    Strings are interned so names, categories and the specification values
+    that repeat across products ('8GB', 'Android 13') are stored once.
+    Specifications are a read-only mapping and reviews a tuple of
+    ReviewRecords.
+    """
+
+    __slots__ = (
+        'id', 'name', 'price', 'originalPrice', 'rating', 'reviews_count',
+        'category', 'specifications', 'reviews'
+    )
+
+    @classmethod
+    def from_dict(cls, product: Mapping) -> "ProductRecord":
+        """Freeze a product dict; unknown fields are ignored"""
+        values: Dict[str, Any] = {
+            field: _intern(product[field])
+            for field in cls.__slots__
+            if field in product
+        }
+        if 'specifications' in values:
+            values['specifications'] = MappingProxyType({
+                sys.intern(key): _intern(value)
+                for key, value in values['specifications'].items()
+            })
+        if 'reviews' in values:
+            values['reviews'] = tuple(ReviewRecord(review) for review in values['reviews'])
+        return cls(values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain, mutable dict copy of the product"""
+        product = dict(self)
+        if 'specifications' in product:
+            product['specifications'] = dict(product['specifications'])
+        if 'reviews' in product:
+            product['reviews'] = [dict(review) for review in product['reviews']]
+        return product
+
+    def __reduce__(self):
+        return (type(self).from_dict, (self.to_dict(),))
+
+
+def deep_sizeof(objects: Iterable[Any]) -> int:
+    """
+    Bytes held by objects and everything they reference
+
+    Objects reachable more than once (such as interned strings) are counted
+    once.
+    """
+    seen = set()
+    total = 0
+    stack = list(objects)
+
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+
+        if isinstance(obj, MappingProxyType):
+            # The proxy is a thin view; count the dict it wraps as well
+            total += sys.getsizeof(obj.copy())
+        if isinstance(obj, (dict, MappingProxyType)):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, _Record):
+            stack.extend(getattr(obj, field) for field in obj)
+
+    return total
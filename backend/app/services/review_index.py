@@ -0,0 +1,141 @@
+"""
+Precomputed per-product review feature index
+"""
+from typing import Dict, List, Any, Hashable, Iterable, Mapping, Optional, Tuple
+from .catalog_storage import MappedProduct
+from .records import ProductRecord
+
+
+# Products that never change once built; an entry built from one is reused without a fingerprint
+IMMUTABLE_PRODUCTS = (ProductRecord, MappedProduct)
+
+
+def reviews_fingerprint(reviews: List[Dict[str, Any]]) -> int:
+    """Cheap identity of a review list, used to detect changed reviews"""
+    return hash(tuple((review.get('text', ''), review.get('rating', 3)) for review in reviews))
+
+
+class ReviewFeatureIndex:
+    """
+    Caches the full feature analysis of every product's reviews.
+
+    Each entry holds, for every known feature, the mention count, average
+    rating, positive/negative tallies, sentiment score and sample sentences
+    produced by ReviewAnalyzer. Entries are keyed by product id and remember
+    the product they were built from. The same immutable catalog record
+    (ProductRecord or MappedProduct) is a hit without touching its reviews;
+    any other product is compared by a fingerprint of its reviews, so an
+    entry is rebuilt only when that product's reviews change.
+
+    Analyses of reviews kept in a database (get_stored) are cached too, per
+    catalog version, until invalidate() drops them.
+    """
+
+    def __init__(self, analyzer):
+        """
+        Args:
+            analyzer: ReviewAnalyzer used to build entries
+        """
+        self.analyzer = analyzer
+        self.catalog_version: Optional[Hashable] = None
+        # product id -> (product built from, reviews fingerprint, analysis)
+        self._entries: Dict[Hashable, Tuple[Mapping[str, Any], int, Dict[str, Dict[str, Any]]]] = {}
+        # product id -> analysis of its stored reviews (None if it has none), for stored_version
+        self.stored_version: Optional[Hashable] = None
+        self._stored: Dict[Hashable, Optional[Dict[str, Dict[str, Any]]]] = {}
+
+    def build(self, products: Iterable[Dict[str, Any]], catalog_version: Optional[Hashable] = None) -> None:
+        """Precompute entries for a whole catalog"""
+        if catalog_version != self.catalog_version:
+            self._entries = {}
+            self.catalog_version = catalog_version
+
+        for product in products:
+            if 'reviews' in product:
+                self._entry_for(product)
+
+    def get(self, product: Dict[str, Any], features: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Feature analysis for a product, computed at most once per review set
+
+        Returns:
+            Same structure as ReviewAnalyzer.analyze_reviews_for_features;
+            the dictionaries are copies and safe to modify
+        """
+        return self._select(self._entry_for(product), features)
+
+    def get_stored(
+        self,
+        product_ids: Iterable[Hashable],
+        features: List[str],
+        store,
+        catalog_version: Optional[Hashable] = None
+    ) -> Dict[Hashable, Dict[str, Dict[str, Any]]]:
+        """
+        Feature analysis of products from the reviews in a store
+
+        Each product's stored reviews are read and analyzed for every
+        feature once per catalog version, with one SQLiteStore.analyze_products
+        call for all the products not cached yet.
+
+        Returns:
+            Dictionary of product id -> feature analysis (copies), for
+            products with reviews
+        """
+        if catalog_version != self.stored_version:
+            self._stored = {}
+            self.stored_version = catalog_version
+
+        product_ids = list(dict.fromkeys(product_ids))
+        missing = [product_id for product_id in product_ids if product_id not in self._stored]
+        if missing:
+            analyses = store.analyze_products(missing, list(self.analyzer.feature_keywords), self.analyzer)
+            for product_id in missing:
+                self._stored[product_id] = analyses.get(product_id)
+
+        results = {}
+        for product_id in product_ids:
+            analysis = self._stored.get(product_id)
+            if analysis is not None:
+                results[product_id] = self._select(analysis, features)
+        return results
+
+    @staticmethod
+    def _select(analysis: Dict[str, Dict[str, Any]], features: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Copies of the requested features' analysis"""
+        results = {}
+        for feature in features:
+            if feature in analysis:
+                feature_data = dict(analysis[feature])
+                feature_data['sample_reviews'] = list(feature_data['sample_reviews'])
+                results[feature] = feature_data
+
+        return results
+
+    def invalidate(self, product_id: Optional[Hashable] = None) -> None:
+        """Drop one product's entries, or every entry if no id is given"""
+        if product_id is None:
+            self._entries = {}
+            self._stored = {}
+        else:
+            self._entries.pop(product_id, None)
+            self._stored.pop(product_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry_for(self, product: Mapping[str, Any]) -> Dict[str, Dict[str, Any]]:
+        entry = self._entries.get(product['id'])
+        if entry is not None and entry[0] is product and isinstance(product, IMMUTABLE_PRODUCTS):
+            return entry[2]
+
+        reviews = product.get('reviews', [])
+        fingerprint = reviews_fingerprint(reviews)
+        if entry is not None and entry[1] == fingerprint:
+            analysis = entry[2]
+        else:
+            analysis = self.analyzer.analyze_reviews_for_features(
+                reviews, list(self.analyzer.feature_keywords)
+            )
+        self._entries[product['id']] = (product, fingerprint, analysis)
+        return analysis
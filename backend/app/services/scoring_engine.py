@@ -0,0 +1,299 @@
+"""
+Columnar scoring engine for budget recommendations
+"""
+from typing import Dict, List, Any, Optional
+import json
+import re
+
+import numpy as np
+
+from .catalog_storage import MappedCatalog
+from .price_index import PriceIndex
+
+
+MEGAPIXELS_PATTERN = re.compile(r'(\d+)\s*MP', re.IGNORECASE)
+GIGABYTES_PATTERN = re.compile(r'(\d+)\s*GB', re.IGNORECASE)
+MAH_PATTERN = re.compile(r'(\d+)\s*mAh', re.IGNORECASE)
+
+
+def round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Vectorized round() that agrees with Python's built-in round
+
+    np.round scales, rounds and divides, so it can disagree with Python's
+    correctly rounded round() on values that sit on a .5 boundary after
+    scaling (e.g. 68.95). Those few values are re-rounded with Python.
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * 10 ** ndigits
+    ambiguous = np.nonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)[0]
+    for i in ambiguous:
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+
+def _parse_int(pattern: re.Pattern, text: str) -> int:
+    """First integer captured by pattern, or -1 if the spec doesn't mention it"""
+    match = pattern.search(text)
+    return int(match.group(1)) if match else -1
+
+
+def _chipset_score(processor: str) -> int:
+    """Gaming base score from the processor name"""
+    if 'snapdragon 8' in processor or 'a17' in processor or 'a16' in processor:
+        return 90
+    elif 'snapdragon 7' in processor or 'a15' in processor:
+        return 75
+    elif 'snapdragon 6' in processor or 'a14' in processor:
+        return 60
+    return 50
+
+
+class CatalogScoringEngine:
+    """
+    Scores a whole catalog at once with NumPy.
+
+    Specification strings are parsed once, when the engine is built, into
+    numeric columns (megapixels, storage, RAM, battery, chipset tier, panel
+    and refresh-rate flags). The columns are laid out in price order (see
+    PriceIndex), so the products within a budget are a prefix found by
+    binary search. Each per-priority score column is computed once and then
+    sliced per query. The arithmetic mirrors the ProductRecommender scorers
+    step by step, so the scores are identical to the per-product path.
+    """
+
+    def __init__(self, products: List[Dict[str, Any]], review_analyzer):
+        """
+        Args:
+            products: Catalog to score
+            review_analyzer: ReviewAnalyzer used for review-based scores
+        """
+        self.products = products
+        self.review_analyzer = review_analyzer
+        self._review_ratings: Dict[str, np.ndarray] = {}
+        self._priority_scores: Dict[str, np.ndarray] = {}
+
+        # Catalog positions sorted by price (equal prices keep catalog order), and their prices
+        self.price_index = PriceIndex.from_products(products)
+        self.positions = self.price_index.positions
+        self.prices = self.price_index.prices
+
+        size = len(products)
+        self.chipset_score = np.empty(size, dtype=np.int64)
+        self.high_refresh = np.empty(size, dtype=bool)
+        self.oled = np.empty(size, dtype=bool)
+        self.full_hd = np.empty(size, dtype=bool)
+        self.quad_hd = np.empty(size, dtype=bool)
+
+        if isinstance(products, MappedCatalog):
+            self._load_mapped_columns(products)
+        else:
+            self._load_columns(products)
+
+    def _load_columns(self, products: List[Dict[str, Any]]) -> None:
+        """Parse every product's specification strings into the columns"""
+        size = len(products)
+
+        self.megapixels = np.empty(size, dtype=np.int64)
+        self.storage_gb = np.empty(size, dtype=np.int64)
+        self.ram_gb = np.empty(size, dtype=np.int64)
+        self.battery_mah = np.empty(size, dtype=np.int64)
+        self.has_reviews = np.empty(size, dtype=bool)
+
+        for i, position in enumerate(self.positions.tolist()):
+            product = products[position]
+            specs = product.get('specifications', {})
+
+            self.megapixels[i] = _parse_int(MEGAPIXELS_PATTERN, specs.get('main_camera', ''))
+            self.storage_gb[i] = _parse_int(GIGABYTES_PATTERN, specs.get('storage', ''))
+            self.ram_gb[i] = _parse_int(GIGABYTES_PATTERN, specs.get('ram', ''))
+            self.battery_mah[i] = _parse_int(MAH_PATTERN, specs.get('battery', ''))
+            (self.chipset_score[i], self.high_refresh[i], self.oled[i],
+             self.full_hd[i], self.quad_hd[i]) = self._spec_flags(specs)
+            self.has_reviews[i] = 'reviews' in product
+
+    def _load_mapped_columns(self, catalog: MappedCatalog) -> None:
+        """Take the numeric columns straight from a mapped catalog file"""
+        self.megapixels = catalog.column('megapixels')[self.positions].astype(np.int64)
+        self.storage_gb = catalog.column('storage_gb')[self.positions].astype(np.int64)
+        self.ram_gb = catalog.column('ram_gb')[self.positions].astype(np.int64)
+        self.battery_mah = catalog.column('battery_mah')[self.positions].astype(np.int64)
+        self.has_reviews = catalog.has_field('reviews')[self.positions]
+
+        # Products often share a spec sheet; decode each distinct one once
+        derived: Dict[str, tuple] = {}
+        for i, position in enumerate(self.positions.tolist()):
+            text = catalog.specifications_json(position)
+            if text not in derived:
+                derived[text] = self._spec_flags(json.loads(text))
+            (self.chipset_score[i], self.high_refresh[i], self.oled[i],
+             self.full_hd[i], self.quad_hd[i]) = derived[text]
+
+    @staticmethod
+    def _spec_flags(specs) -> tuple:
+        """Chipset tier and display flags from a spec sheet"""
+        display = specs.get('display', '').lower()
+        return (
+            _chipset_score(specs.get('processor', '').lower()),
+            '120hz' in display or '144hz' in display,
+            'amoled' in display or 'oled' in display,
+            '1080p' in display or 'fhd' in display,
+            '1440p' in display or 'qhd' in display
+        )
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def score(self, budget: float, priorities: List[str]) -> Dict[str, Any]:
+        """
+        Score every product within budget
+
+        Args:
+            budget: Maximum price
+            priorities: Priority features, scored in this order
+
+        Returns:
+            Dictionary with 'indexes' (catalog positions of eligible products,
+            cheapest first), 'scores' (priority -> score array), 'overall'
+            and 'value' arrays, all aligned with 'indexes'
+        """
+        count = self.price_index.count_under(budget)
+        indexes = self.positions[:count]
+        scores = {
+            priority: self._score_priority(priority)[:count]
+            for priority in dict.fromkeys(priorities)
+        }
+
+        overall = np.zeros(count, dtype=np.float64)
+        for priority_scores in scores.values():
+            overall = overall + priority_scores
+        if scores:
+            overall = overall / len(scores)
+
+        value = overall * (1 - self.prices[:count] / budget * 0.3)
+
+        return {
+            'indexes': indexes,
+            'scores': scores,
+            'overall': overall,
+            'value': value
+        }
+
+    def _score_priority(self, priority: str) -> np.ndarray:
+        """Score column for a priority over the whole catalog, computed once"""
+        if priority in self._priority_scores:
+            return self._priority_scores[priority]
+
+        scorers = {
+            'camera': self._score_camera,
+            'storage': self._score_storage,
+            'gaming': self._score_gaming,
+            'battery': self._score_battery,
+            'display': self._score_display,
+            'performance': self._score_performance
+        }
+        if priority in scorers:
+            scores = scorers[priority]()
+        else:
+            scores = self._score_from_reviews(priority)
+
+        self._priority_scores[priority] = scores
+        return scores
+
+    def _score_camera(self) -> np.ndarray:
+        mp = self.megapixels
+        score = np.select(
+            [mp >= 108, mp >= 64, mp >= 48, mp >= 12],
+            [95, 85, 75, 65],
+            50
+        ).astype(np.float64)
+
+        review_score = self._review_rating('camera')
+        blend = self.has_reviews & (review_score > 0)
+        score = np.where(blend, (score + review_score * 20) / 2, score)
+        return np.minimum(score, 100)
+
+    def _score_storage(self) -> np.ndarray:
+        gb = self.storage_gb
+        score = np.select(
+            [gb >= 512, gb >= 256, gb >= 128, gb >= 64],
+            [95, 85, 70, 55],
+            50
+        ).astype(np.float64)
+        return np.minimum(score, 100)
+
+    def _score_gaming(self) -> np.ndarray:
+        ram = self.ram_gb
+        score = self.chipset_score + np.select([ram >= 12, ram >= 8], [10, 5], 0)
+        score = score + np.where(self.high_refresh, 5, 0)
+        return np.minimum(score, 100).astype(np.float64)
+
+    def _score_battery(self) -> np.ndarray:
+        mah = self.battery_mah
+        score = np.select(
+            [mah >= 5000, mah >= 4500, mah >= 4000, mah >= 3500],
+            [90, 80, 70, 60],
+            50
+        ).astype(np.float64)
+        return np.minimum(score, 100)
+
+    def _score_display(self) -> np.ndarray:
+        score = 60 + np.where(self.oled, 20, 0) + np.where(self.high_refresh, 15, 0)
+        score = score + np.select([self.full_hd, self.quad_hd], [5, 10], 0)
+        return np.minimum(score, 100).astype(np.float64)
+
+    def _score_performance(self) -> np.ndarray:
+        return self._score_gaming() * 0.9
+
+    def _score_from_reviews(self, feature: str) -> np.ndarray:
+        return np.where(self.has_reviews, self._review_rating(feature) * 20, 60.0)
+
+    def _review_rating(self, feature: str) -> np.ndarray:
+        """Average review rating for a feature across the catalog (0 if never mentioned)"""
+        if feature not in self._review_ratings:
+            ratings = np.zeros(len(self.products), dtype=np.float64)
+            if feature in self.review_analyzer.feature_keywords:
+                matrix = self.review_analyzer.analyze_products_for_features(self.products, [feature])
+                for i, position in enumerate(self.positions.tolist()):
+                    analysis = matrix.get(self.products[position]['id'])
+                    if analysis is not None:
+                        ratings[i] = analysis[feature]['average_rating']
+            else:
+                # Unknown features have no analysis; the scorers default to 3 stars
+                ratings[:] = 3.0
+            self._review_ratings[feature] = ratings
+        return self._review_ratings[feature]
+
+    def rank(
+        self,
+        overall: np.ndarray,
+        limit: Optional[int] = None,
+        tie_break: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Positions into an overall-score array, best first
+
+        With a limit, only the best `limit` positions are selected and sorted
+        (a linear-time partition plus a sort of k items) instead of sorting
+        every eligible product. Ties on the rounded score are ordered by
+        tie_break (catalog positions), exactly like the stable full sort of
+        the per-product path.
+        """
+        rounded = round_like_python(overall, 1)
+        if tie_break is None:
+            tie_break = np.arange(len(rounded))
+
+        if limit is None or limit >= len(rounded):
+            order = np.lexsort((tie_break, -rounded))
+            return order if limit is None else order[:limit]
+
+        # Rounded score of the k-th best product
+        threshold = np.partition(rounded, len(rounded) - limit)[len(rounded) - limit]
+
+        # Everything strictly better, then the earliest products tied with the k-th
+        better = np.nonzero(rounded > threshold)[0]
+        tied = np.nonzero(rounded == threshold)[0]
+        tied = tied[np.argsort(tie_break[tied], kind='stable')][:limit - len(better)]
+        candidates = np.concatenate([better, tied])
+
+        return candidates[np.lexsort((tie_break[candidates], -rounded[candidates]))]
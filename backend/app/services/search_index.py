@@ -0,0 +1,481 @@
+"""
+In-memory inverted index for product search with BM25 ranking
+"""
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from operator import itemgetter
+import math
+import re
+
+import numpy as np
+
+from .catalog_storage import MappedCatalog
+from .price_index import PriceIndex
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens"""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+NUMBER_WORDS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16,
+    'seventeen': 17, 'eighteen': 18, 'nineteen': 19
+}
+
+TENS_WORDS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90
+}
+
+
+def normalize_spoken_numbers(tokens: List[str]) -> List[str]:
+    """Turn spelled-out numbers from speech-to-text into digits ("twenty three" -> "23")"""
+    normalized = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in TENS_WORDS:
+            value = TENS_WORDS[token]
+            if i + 1 < len(tokens) and 0 < NUMBER_WORDS.get(tokens[i + 1], 0) < 10:
+                value += NUMBER_WORDS[tokens[i + 1]]
+                i += 1
+            normalized.append(str(value))
+        elif token in NUMBER_WORDS:
+            normalized.append(str(NUMBER_WORDS[token]))
+        else:
+            normalized.append(token)
+        i += 1
+    return normalized
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance, giving up early once it exceeds max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Character-trigram index over a vocabulary for typo-tolerant term lookup"""
+
+    def __init__(self, terms: Iterable[str]):
+        self._terms: List[str] = []
+        self._trigrams: Dict[str, List[int]] = defaultdict(list)
+
+        for term in terms:
+            term_index = len(self._terms)
+            self._terms.append(term)
+            for trigram in self._trigrams_of(term):
+                self._trigrams[trigram].append(term_index)
+
+    @staticmethod
+    def _trigrams_of(term: str) -> set:
+        padded = f"  {term} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def lookup(self, token: str, max_candidates: int = 5) -> List[Tuple[str, int]]:
+        """
+        Find vocabulary terms within a small edit distance of token
+
+        Only terms sharing trigrams with the token are compared, best overlap
+        first, so the cost does not grow with the vocabulary size.
+
+        Returns:
+            (term, distance) pairs, closest first
+        """
+        max_distance = 1 if len(token) <= 4 else 2
+        trigrams = self._trigrams_of(token)
+
+        overlap = Counter()
+        for trigram in trigrams:
+            overlap.update(self._trigrams.get(trigram, ()))
+
+        # Each edit can destroy at most three trigrams
+        min_overlap = max(1, len(trigrams) - 3 * max_distance)
+
+        matches = []
+        for term_index, shared in overlap.most_common(max_candidates * 10):
+            if shared < min_overlap:
+                break
+            term = self._terms[term_index]
+            distance = edit_distance(token, term, max_distance)
+            if distance <= max_distance:
+                matches.append((term, distance))
+
+        matches.sort(key=itemgetter(1))
+        return matches[:max_candidates]
+
+
+class ProductSearchIndex:
+    """
+    Inverted index over product name, category and specification values.
+
+    Every posting stores its precomputed BM25 contribution ("impact").
+    Postings are NumPy arrays in document order, and a query adds the
+    impacts of its terms' postings into one score per product without a
+    Python loop over the postings. MaxScore pruning (see _top_documents)
+    then ranks only the documents that can still reach the top results,
+    so a query never has to scan or sort a score for every product.
+    """
+
+    # Relative weight of each indexed field in the term frequency
+    FIELD_WEIGHTS = {
+        'name': 3.0,
+        'category': 1.0,
+        'specifications': 1.0
+    }
+
+    PREFIX_WEIGHT = 0.8
+
+    # Weight lost per edit for typo-tolerant matches
+    FUZZY_EDIT_PENALTY = 0.25
+
+    def __init__(
+        self,
+        k1: float = 1.2,
+        b: float = 0.75,
+        max_prefix_expansions: int = 10
+    ):
+        """
+        Args:
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+            max_prefix_expansions: Vocabulary terms tried for a prefix query token
+        """
+        self.k1 = k1
+        self.b = b
+        self.max_prefix_expansions = max_prefix_expansions
+
+        self._documents: List[Dict[str, Any]] = []
+        # Price of each document, for budget filters, and the documents by price
+        self._prices = np.empty(0)
+        self.price_index = PriceIndex(())
+        # term -> (doc indexes ascending, their impacts)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._best_impacts: Dict[str, float] = {}
+        self._vocabulary: List[str] = []
+        self._trigram_index = TrigramIndex(())
+
+    @classmethod
+    def from_products(cls, products: Iterable[Dict[str, Any]], **kwargs) -> "ProductSearchIndex":
+        """Build an index over an iterable of product dictionaries"""
+        index = cls(**kwargs)
+        index.build(products)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def build(self, products: Iterable[Dict[str, Any]]) -> None:
+        """(Re)build the index from scratch"""
+        if isinstance(products, MappedCatalog):
+            # The documents copy what they need; don't keep a view per product
+            products = products.scan()
+
+        documents = []
+        prices = array('d')
+        doc_lengths = array('d')
+        # Every term's doc indexes are appended in ascending order
+        term_docs: Dict[str, array] = defaultdict(lambda: array('i'))
+        term_freqs: Dict[str, array] = defaultdict(lambda: array('d'))
+
+        for doc_index, product in enumerate(products):
+            documents.append({
+                'id': product['id'],
+                'name': product['name'],
+                'price': product['price'],
+                'rating': product.get('rating', 0)
+            })
+            prices.append(product['price'])
+
+            frequencies = self._weighted_term_frequencies(product)
+            doc_lengths.append(sum(frequencies.values()))
+
+            for term, frequency in frequencies.items():
+                term_docs[term].append(doc_index)
+                term_freqs[term].append(frequency)
+
+        doc_count = len(documents)
+        average_length = (sum(doc_lengths) / doc_count) if doc_count else 0.0
+        length_norms = np.empty(0)
+        if doc_count:
+            length_norms = 1 - self.b + self.b * np.frombuffer(doc_lengths) / average_length
+        postings = {}
+        best_impacts = {}
+
+        for term, docs in term_docs.items():
+            # Native-width indexes: numpy gathers and scatters with int32 run 2-3x slower
+            docs = np.frombuffer(docs, dtype=np.int32).astype(np.intp)
+            frequencies = np.frombuffer(term_freqs[term])
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+
+            impacts = idf * frequencies * (self.k1 + 1) / (frequencies + self.k1 * length_norms[docs])
+            postings[term] = (docs, impacts)
+            best_impacts[term] = float(impacts.max())
+
+        self._documents = documents
+        self._prices = np.frombuffer(prices)
+        self.price_index = PriceIndex(self._prices)
+        self._postings = postings
+        self._best_impacts = best_impacts
+        self._vocabulary = sorted(postings)
+        self._trigram_index = TrigramIndex(self._vocabulary)
+
+    def _weighted_term_frequencies(self, product: Dict[str, Any]) -> Dict[str, float]:
+        """Field-weighted term frequencies for one product"""
+        frequencies: Dict[str, float] = defaultdict(float)
+
+        for token in tokenize(product.get('name', '')):
+            frequencies[token] += self.FIELD_WEIGHTS['name']
+
+        for token in tokenize(product.get('category', '')):
+            frequencies[token] += self.FIELD_WEIGHTS['category']
+
+        for value in (product.get('specifications') or {}).values():
+            for token in tokenize(value):
+                frequencies[token] += self.FIELD_WEIGHTS['specifications']
+
+        return frequencies
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        fuzzy: bool = False,
+        max_price: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank products for a free-text query
+
+        Args:
+            query: Search text
+            limit: Maximum number of results
+            fuzzy: Also match misspelled tokens and spelled-out numbers
+            max_price: Only return products priced at or below this
+
+        Returns:
+            Result dictionaries with id, name, price, rating and match_score,
+            where match_score is the BM25 score relative to the best possible
+            score for the query (0-1), scaled down by the share of query
+            tokens that matched nothing in the catalog
+        """
+        tokens = tokenize(query)
+        if fuzzy:
+            tokens = normalize_spoken_numbers(tokens)
+
+        best_possible = 0.0
+        matched_tokens = 0
+        # (doc indexes ascending, scores) of each matched query token
+        token_postings = []
+
+        for token in tokens:
+            terms = self._expand_token(token, fuzzy)
+            if not terms:
+                continue
+            matched_tokens += 1
+
+            # Inexact (prefix or fuzzy) matches can't reach a perfect score
+            best_possible += max(self._best_impacts[term] for term, _ in terms)
+
+            docs, scores = self._token_postings(terms, max_price)
+            if len(docs):
+                token_postings.append((docs, scores))
+
+        if not matched_tokens:
+            return []
+
+        coverage = matched_tokens / len(tokens)
+        results = []
+        for doc_index, score in self._top_documents(token_postings, limit):
+            result = dict(self._documents[doc_index])
+            result['match_score'] = round(min(score / best_possible, 1.0) * coverage, 2)
+            results.append(result)
+
+        return results
+
+    def under_budget(self, max_price: float, limit: int = 10) -> List[Dict[str, Any]]:
+        """Products priced at or below max_price, priciest first, as search results"""
+        return [
+            {**self._documents[doc_index], 'match_score': 1.0}
+            for doc_index in self.price_index.positions_under(max_price, limit=limit, reverse=True).tolist()
+        ]
+
+    def _token_postings(self, terms: List[Tuple[str, float]], max_price: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        A query token's (doc indexes ascending, scores) from its expanded
+        terms, only for documents within budget if one is given
+        """
+        if len(terms) == 1:
+            term, weight = terms[0]
+            docs, scores = self._postings[term]
+            if weight != 1.0:
+                scores = scores * weight
+        else:
+            # A prefix can expand to several terms of the same document;
+            # count only the best of them once per query token
+            docs = np.concatenate([self._postings[term][0] for term, _ in terms])
+            scores = np.concatenate([self._postings[term][1] * weight for term, weight in terms])
+            order = np.lexsort((-scores, docs))
+            docs, scores = docs[order], scores[order]
+            first = np.ones(len(docs), dtype=bool)
+            first[1:] = docs[1:] != docs[:-1]
+            docs, scores = docs[first], scores[first]
+
+        if max_price is not None:
+            keep = self._prices[docs] <= max_price
+            docs, scores = docs[keep], scores[keep]
+        return docs, scores
+
+    def _top_documents(
+        self,
+        token_postings: List[Tuple[np.ndarray, np.ndarray]],
+        limit: int
+    ) -> List[Tuple[int, float]]:
+        """
+        (doc index, score) of the best `limit` documents, best first; equal
+        scores rank the earlier document first
+
+        The documents of the rarest token are scored first, and the
+        limit-th best of them is a threshold the results must reach. A
+        document that matches none of a set of tokens scores at most the
+        summed score bounds of the other tokens. So when those bounds stay
+        below the threshold, only the documents of that set can make the
+        results (MaxScore). Only the cheapest such set, by postings, is ranked.
+        The results are exactly the top documents.
+        """
+        if not token_postings:
+            return []
+
+        bounds = [float(scores.max()) for _, scores in token_postings]
+        sizes = [len(docs) for docs, _ in token_postings]
+        first = min(range(len(sizes)), key=lambda token: (sizes[token], -bounds[token]))
+        # Total score of every document, summed in query token order; only
+        # the candidates are read from it
+        accumulated = np.zeros(len(self._documents))
+        for docs, scores in token_postings:
+            accumulated[docs] += scores
+
+        candidates = token_postings[first][0]
+        totals = accumulated[candidates]
+
+        threshold = self._kth_largest(totals, limit) if len(totals) >= limit else 0.0
+        if threshold:
+            essential = self._essential_tokens(bounds, sizes, first, threshold)
+        else:
+            essential = range(len(token_postings))
+
+        if len(essential) > 1:
+            # Score the rest of the union; the first token's documents already are
+            in_union = np.zeros(len(self._documents), dtype=bool)
+            for token in essential:
+                in_union[token_postings[token][0]] = True
+            in_union[candidates] = False
+            extra = np.flatnonzero(in_union)
+            candidates = np.concatenate((candidates, extra))
+            totals = np.concatenate((totals, accumulated[extra]))
+            threshold = self._kth_largest(totals, limit) if len(totals) > limit else 0.0
+
+        if len(candidates) > limit:
+            cutoff = threshold
+            above = np.flatnonzero(totals > cutoff)
+            ties = np.flatnonzero(totals == cutoff)
+            # Of the candidates tied at the cutoff, the earliest documents make it
+            ties = ties[np.argsort(candidates[ties], kind='stable')[:limit - len(above)]]
+            selected = np.concatenate((above, ties))
+            candidates, totals = candidates[selected], totals[selected]
+
+        order = np.lexsort((candidates, -totals))[:limit]
+        return list(zip(candidates[order].tolist(), totals[order].tolist()))
+
+    @staticmethod
+    def _kth_largest(values: np.ndarray, k: int) -> float:
+        """The k-th largest of at least k values"""
+        if len(values) > 16 * k:
+            # The maxima of k blocks are k different values, so the smallest of
+            # them is at most the k-th largest; only values above it can matter
+            starts = np.linspace(0, len(values), k, endpoint=False).astype(np.intp)
+            values = values[values >= np.maximum.reduceat(values, starts).min()]
+        return float(np.partition(values, len(values) - k)[len(values) - k])
+
+    @staticmethod
+    def _essential_tokens(bounds: List[float], sizes: List[int], first: int, threshold: float) -> List[int]:
+        """
+        Tokens (including first) whose documents hold every document that
+        can reach threshold, with the fewest postings in total
+
+        The tokens left out must have score bounds summing to less than the
+        threshold (with a margin for rounding).
+        """
+        limit = threshold * (1 - 1e-9)
+        others = [token for token in range(len(bounds)) if token != first]
+
+        if len(others) > 8:
+            # Too many subsets to try: leave out the lowest bounds (MaxScore)
+            essential, skipped = [first], 0.0
+            for token in sorted(others, key=bounds.__getitem__):
+                if skipped + bounds[token] < limit:
+                    skipped += bounds[token]
+                else:
+                    essential.append(token)
+            return essential
+
+        best, best_size = others, -1
+        for mask in range(1 << len(others)):
+            left_out = [token for bit, token in enumerate(others) if mask >> bit & 1]
+            if sum(bounds[token] for token in left_out) < limit:
+                size = sum(sizes[token] for token in left_out)
+                if size > best_size:
+                    best, best_size = [token for token in others if token not in left_out], size
+        return [first] + best
+
+    def _expand_token(self, token: str, fuzzy: bool = False) -> List[Tuple[str, float]]:
+        """Map a query token to indexed terms with their weights"""
+        if token in self._postings:
+            return [(token, 1.0)]
+
+        # Simple plural handling ("phones" -> "phone")
+        if len(token) > 3 and token.endswith('s') and token[:-1] in self._postings:
+            return [(token[:-1], 1.0)]
+
+        if len(token) < 2:
+            return []
+
+        # Prefix match against the sorted vocabulary
+        expansions = []
+        position = bisect_left(self._vocabulary, token)
+        while position < len(self._vocabulary) and len(expansions) < self.max_prefix_expansions:
+            term = self._vocabulary[position]
+            if not term.startswith(token):
+                break
+            expansions.append((term, self.PREFIX_WEIGHT))
+            position += 1
+
+        if expansions or not fuzzy:
+            return expansions
+
+        # Typo-tolerant match ("samsng" -> "samsung")
+        return [
+            (term, max(1.0 - self.FUZZY_EDIT_PENALTY * distance, 0.1))
+            for term, distance in self._trigram_index.lookup(token)
+        ]
@@ -0,0 +1,242 @@
+"""
+Session Store for multi-turn command context
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import queue
+import threading
+import time
+from .cache import LRUCache
+from .cart import Cart
+from .sqlite_store import SQLiteStore
+
+
+class Session:
+    """
+    Conversation state for one session_id.
+
+    Holds what follow-up commands refer back to: the last search and its
+    results, the product being looked at ("add it to my cart"), the cart,
+    and the products and criteria of the last comparison.
+    """
+
+    __slots__ = ('session_id', 'current_product_id', 'last_search', 'cart', 'comparison')
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.current_product_id: Any = None
+        # {'query': str, 'catalog_version': int, 'products': [...]}
+        self.last_search: Optional[Dict[str, Any]] = None
+        self.cart = Cart()
+        # {'product_ids': [...], 'criteria': [...]}
+        self.comparison: Optional[Dict[str, Any]] = None
+
+    def search_results(self, query: str, catalog_version: int) -> Optional[List[Dict[str, Any]]]:
+        """Results of the last search if it was for the same query and catalog, else None"""
+        last_search = self.last_search
+        if (
+            last_search is not None
+            and last_search['query'] == query.strip().lower()
+            and last_search['catalog_version'] == catalog_version
+        ):
+            return last_search['products']
+        return None
+
+    def record_search(self, query: str, catalog_version: int, products: List[Dict[str, Any]]) -> None:
+        self.last_search = {
+            'query': query.strip().lower(),
+            'catalog_version': catalog_version,
+            'products': products
+        }
+        if products:
+            # "Add it to my cart" after a search refers to the top result
+            self.current_product_id = products[0]['id']
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'current_product_id': self.current_product_id,
+            'last_search': self.last_search,
+            'cart': self.cart.to_list(),
+            'comparison': self.comparison
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Session":
+        session = cls(data['session_id'])
+        session.current_product_id = data.get('current_product_id')
+        session.last_search = data.get('last_search')
+        session.cart = Cart.from_list(data.get('cart', []))
+        session.comparison = data.get('comparison')
+        return session
+
+
+class SessionStore:
+    """
+    Sessions by session_id, kept in an LRU cache with a TTL.
+
+    A session's TTL restarts whenever it is used. When the cache is full,
+    the least recently used session is evicted; with a SQLiteStore
+    configured, evicted sessions are spilled to its sessions table and
+    brought back into memory on their next request, so a burst of new
+    sessions doesn't drop the state of older ones.
+
+    Spilled sessions are written by a background thread, so evicting one
+    never waits on the database; until it is written, a session is
+    restored straight from the write queue. Async handlers use get_async
+    and get_or_create_async, which read the spill table off the event loop.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10_000,
+        ttl_seconds: float = 1800,
+        spill: Optional[SQLiteStore] = None
+    ):
+        """
+        Args:
+            max_sessions: Sessions kept in memory
+            ttl_seconds: Idle time after which a session expires
+            spill: Optional SQLiteStore that evicted sessions are written to
+        """
+        self.ttl_seconds = ttl_seconds
+        self.spill = spill
+        self.cache = LRUCache(
+            max_size=max_sessions,
+            ttl_seconds=ttl_seconds,
+            on_evict=self._spill if spill is not None else None
+        )
+        self._lock = threading.Lock()
+        self.spilled = 0
+        self.restored = 0
+
+        # Evicted sessions waiting for the writer: session_id -> (session, expires_at);
+        # each eviction makes a new tuple, so the writer can tell if it was superseded
+        self._pending: Dict[str, Tuple[Session, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._writes: "queue.Queue[str]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """A live session, from memory or the spill table, or None; using it restarts its TTL"""
+        session = self.cache.get(session_id)
+        if session is None and self.spill is not None:
+            session = self._restore(session_id)
+        if session is not None:
+            self.cache.put(session_id, session)
+        return session
+
+    async def get_async(self, session_id: str) -> Optional[Session]:
+        """get() for async handlers: a session not in memory is looked up off the event loop"""
+        session = self.cache.get(session_id)
+        if session is not None:
+            self.cache.put(session_id, session)
+            return session
+        if self.spill is None:
+            return None
+        return await self.spill.run_async(self.get, session_id)
+
+    def get_or_create(self, session_id: str) -> Session:
+        """The session for session_id, starting a new one if there is none"""
+        with self._lock:
+            session = self.get(session_id)
+            if session is None:
+                session = Session(session_id)
+                self.cache.put(session_id, session)
+            return session
+
+    async def get_or_create_async(self, session_id: str) -> Session:
+        """get_or_create() for async handlers: a session not in memory is looked up off the event loop"""
+        session = self.cache.get(session_id)
+        if session is not None:
+            self.cache.put(session_id, session)
+            return session
+        if self.spill is None:
+            return self.get_or_create(session_id)
+        return await self.spill.run_async(self.get_or_create, session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """Forget a session; returns whether one existed"""
+        existed = self.cache.pop(session_id) is not None
+        if self.spill is not None:
+            with self._pending_lock:
+                existed = self._pending.pop(session_id, None) is not None or existed
+            existed = self.spill.take_session(session_id) is not None or existed
+        return existed
+
+    async def delete_async(self, session_id: str) -> bool:
+        """delete() for async handlers, off the event loop with a spill table"""
+        if self.spill is None:
+            return self.delete(session_id)
+        return await self.spill.run_async(self.delete, session_id)
+
+    def _restore(self, session_id: str) -> Optional[Session]:
+        """A spilled session, taken from the write queue or the spill table, or None"""
+        with self._pending_lock:
+            pending = self._pending.pop(session_id, None)
+        if pending is not None:
+            session = pending[0]
+        else:
+            data = self.spill.take_session(session_id)
+            if data is None:
+                return None
+            session = Session.from_dict(json.loads(data))
+        self.restored += 1
+        return session
+
+    def _spill(self, session_id: str, session: Session) -> None:
+        """Queue an evicted session for the background writer"""
+        with self._pending_lock:
+            self._pending[session_id] = (session, time.time() + self.ttl_seconds)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_spilled, name='session-spill', daemon=True)
+                self._writer.start()
+        self._writes.put(session_id)
+
+    def _write_spilled(self) -> None:
+        """Background writer: save queued sessions to the spill table"""
+        while True:
+            session_id = self._writes.get()
+            try:
+                self._write_one(session_id)
+            except Exception:
+                # The session stays queued in memory and can still be restored from there
+                pass
+            finally:
+                self._writes.task_done()
+
+    def _write_one(self, session_id: str) -> None:
+        with self._pending_lock:
+            pending = self._pending.get(session_id)
+        if pending is None:
+            # Restored (or deleted) before it was written
+            return
+
+        session, expires_at = pending
+        self.spill.save_session(session_id, json.dumps(session.to_dict()), expires_at)
+
+        with self._pending_lock:
+            if self._pending.get(session_id) is pending:
+                del self._pending[session_id]
+                self.spilled += 1
+                return
+            superseded = session_id in self._pending
+        if not superseded:
+            # Restored while being written; the stored copy would go stale
+            self.spill.take_session(session_id)
+
+    def flush(self) -> None:
+        """Wait until every evicted session so far has been written"""
+        self._writes.join()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats.update({
+            'spill': self.spill is not None,
+            'spilled': self.spilled,
+            'restored': self.restored,
+            'spill_queue': len(self._pending)
+        })
+        if self.spill is not None:
+            stats['spilled_sessions'] = self.spill.count_sessions()
+        return stats
@@ -0,0 +1,568 @@
+"""
+SQLite Store for products, reviews, orders and carts
+"""
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Mapping, Optional
+from contextlib import contextmanager
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from .order_index import DEFAULT_PAGE_SIZE, DEFAULT_USER, OrderKey, decode_cursor, paginate
+from .search_index import tokenize, normalize_spoken_numbers
+
+
+# Path of the SQLite database to use instead of the in-memory mocks
+DB_PATH_ENV = "SPARK_DB_PATH"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    rowid INTEGER PRIMARY KEY,
+    id UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    original_price REAL,
+    rating REAL,
+    reviews_count INTEGER,
+    category TEXT
+);
+CREATE INDEX IF NOT EXISTS products_by_price ON products (price);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS specifications (
+    product_id NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (product_id, key)
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    product_id NOT NULL,
+    text TEXT NOT NULL,
+    rating REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_by_product ON reviews (product_id, id);
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    total REAL NOT NULL,
+    items INTEGER NOT NULL,
+    status TEXT NOT NULL
+);
+-- Pages of a user's orders, newest first, overall and by status
+DROP INDEX IF EXISTS orders_by_user_date;
+CREATE INDEX IF NOT EXISTS orders_by_user_date_id ON orders (user_id, date DESC, order_id DESC);
+CREATE INDEX IF NOT EXISTS orders_by_user_status_date ON orders (
+    user_id, status COLLATE NOCASE, date DESC, order_id DESC
+);
+
+CREATE TABLE IF NOT EXISTS cart_items (
+    session_id TEXT NOT NULL,
+    product_id NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (session_id, product_id)
+);
+
+-- Sessions spilled from the in-memory session store; data is JSON
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_expiry ON sessions (expires_at);
+
+-- Product text, weighted like the in-memory search index (name 3, category 1, specs 1)
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5 (
+    name, category, specifications, tokenize = 'unicode61'
+);
+
+-- Review text; trigrams support the substring matching used by review analysis
+CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5 (
+    text, content = 'reviews', content_rowid = 'id', tokenize = 'trigram'
+);
+"""
+
+
+class SQLiteConnectionPool:
+    """
+    Fixed-size pool of SQLite connections shared across threads.
+
+    FastAPI runs blocking work on a threadpool; each worker thread borrows a
+    connection for the duration of one query instead of opening its own.
+    Borrowing blocks while every connection is in use, which also bounds
+    the number of concurrent queries.
+    """
+
+    def __init__(self, database: str, size: int = 4):
+        """
+        Args:
+            database: Database file path, or ':memory:' for a private
+                in-memory database shared by the pool's connections
+            size: Number of connections
+        """
+        if database == ':memory:':
+            self.database = f"file:spark-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self.database = database
+
+        self.size = size
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._pool.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.database,
+            uri=self.database.startswith('file:'),
+            check_same_thread=False,
+            timeout=30
+        )
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; the block runs in one transaction"""
+        connection = self._pool.get()
+        try:
+            with connection:
+                yield connection
+        finally:
+            self._pool.put(connection)
+
+    def close(self) -> None:
+        for _ in range(self.size):
+            self._pool.get().close()
+
+
+class SQLiteStore:
+    """
+    Persistent store for products, specifications, reviews, orders, carts
+    and spilled sessions.
+
+    Product search uses an FTS5 index over names, categories and
+    specifications ranked with bm25. Review text has a trigram FTS5 index,
+    so catalog-wide feature analysis only reads the reviews that can
+    contain a feature keyword.
+    """
+
+    def __init__(self, database: str = ':memory:', pool_size: int = 4):
+        self.pool = SQLiteConnectionPool(database, size=pool_size)
+        with self.pool.connection() as connection:
+            connection.executescript(SCHEMA)
+        self._listeners: List[Callable[[List[Any]], None]] = []
+
+    def add_listener(self, listener: Callable[[List[Any]], None]) -> None:
+        """Call listener(product_ids) after products or their reviews change"""
+        self._listeners.append(listener)
+
+    def _notify(self, product_ids: List[Any]) -> None:
+        for listener in self._listeners:
+            listener(product_ids)
+
+    async def run_async(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking store call on a worker thread, off the event loop"""
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    def is_empty(self) -> bool:
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT 1 FROM products LIMIT 1").fetchone() is None
+
+    # Loading
+
+    def load_products(self, products: Iterable[Mapping[str, Any]]) -> int:
+        """
+        Insert or replace products with their specifications and reviews
+
+        Returns:
+            Number of products loaded
+        """
+        product_ids = []
+        with self.pool.connection() as connection:
+            for product in products:
+                self._delete_product(connection, product['id'])
+                specs = dict(product.get('specifications') or {})
+
+                cursor = connection.execute(
+                    "INSERT INTO products (id, name, price, original_price, rating, reviews_count, category) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (product['id'], product['name'], product['price'], product.get('originalPrice'),
+                     product.get('rating'), product.get('reviews_count'), product.get('category'))
+                )
+                connection.execute(
+                    "INSERT INTO products_fts (rowid, name, category, specifications) VALUES (?, ?, ?, ?)",
+                    (cursor.lastrowid, product['name'], product.get('category', ''), ' '.join(map(str, specs.values())))
+                )
+                connection.executemany(
+                    "INSERT INTO specifications (product_id, key, value) VALUES (?, ?, ?)",
+                    [(product['id'], key, str(value)) for key, value in specs.items()]
+                )
+                self._insert_reviews(connection, product['id'], product.get('reviews', ()))
+                product_ids.append(product['id'])
+        self._notify(product_ids)
+        return len(product_ids)
+
+    def sync_products(self, products: Iterable[Mapping[str, Any]], signature: str) -> bool:
+        """
+        Replace the stored products unless they were loaded with the same signature
+
+        Stored products missing from the new ones are deleted with their
+        specifications and reviews.
+
+        Args:
+            products: The complete set of products to store
+            signature: Fingerprint of the products, kept in the meta table
+
+        Returns:
+            Whether the stored products were replaced
+        """
+        if self.get_meta('catalog_signature') == signature:
+            return False
+
+        products = list(products)
+        product_ids = {product['id'] for product in products}
+        with self.pool.connection() as connection:
+            stale_ids = [row[0] for row in connection.execute("SELECT id FROM products") if row[0] not in product_ids]
+            for product_id in stale_ids:
+                self._delete_product(connection, product_id)
+        self._notify(stale_ids)
+
+        self.load_products(products)
+        self.set_meta('catalog_signature', signature)
+        return True
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self.pool.connection() as connection:
+            row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.pool.connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def add_reviews(self, product_id: Any, reviews: Iterable[Mapping[str, Any]]) -> None:
+        with self.pool.connection() as connection:
+            self._insert_reviews(connection, product_id, reviews)
+        self._notify([product_id])
+
+    def _insert_reviews(self, connection: sqlite3.Connection, product_id: Any, reviews: Iterable[Mapping[str, Any]]) -> None:
+        # Review ids come from the INTEGER PRIMARY KEY, so concurrent writers never pick the same one
+        fts_rows = []
+        for review in reviews:
+            text = review.get('text', '')
+            cursor = connection.execute(
+                "INSERT INTO reviews (product_id, text, rating) VALUES (?, ?, ?)",
+                (product_id, text, review.get('rating', 3))
+            )
+            fts_rows.append((cursor.lastrowid, text))
+        connection.executemany("INSERT INTO reviews_fts (rowid, text) VALUES (?, ?)", fts_rows)
+
+    def _delete_product(self, connection: sqlite3.Connection, product_id: Any) -> None:
+        row = connection.execute("SELECT rowid FROM products WHERE id = ?", (product_id,)).fetchone()
+        if row is None:
+            return
+        connection.execute("DELETE FROM products_fts WHERE rowid = ?", row)
+        connection.execute(
+            "INSERT INTO reviews_fts (reviews_fts, rowid, text) "
+            "SELECT 'delete', id, text FROM reviews WHERE product_id = ?",
+            (product_id,)
+        )
+        connection.execute("DELETE FROM reviews WHERE product_id = ?", (product_id,))
+        connection.execute("DELETE FROM specifications WHERE product_id = ?", (product_id,))
+        connection.execute("DELETE FROM products WHERE rowid = ?", row)
+
+    def load_orders(self, orders: Iterable[Mapping[str, Any]], user_id: str = DEFAULT_USER) -> None:
+        with self.pool.connection() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO orders (order_id, user_id, date, total, items, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(order['order_id'], user_id, order['date'], order['total'], order['items'], order['status'])
+                 for order in orders]
+            )
+
+    # Search
+
+    def search_products(self, query: str, limit: int = 10, max_price: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Full-text product search ranked by bm25
+
+        Any query term may match (terms are prefix-matched), like the
+        in-memory index. match_score is relative to the best hit.
+        """
+        terms = normalize_spoken_numbers(tokenize(query))
+        if not terms:
+            return []
+
+        # Prefix-match every term, and the singular of plurals ("phones" -> "phone")
+        match = ' OR '.join(
+            f'"{term}"*' if not (len(term) > 3 and term.endswith('s')) else f'"{term}"* OR "{term[:-1]}"'
+            for term in terms
+        )
+        sql = (
+            "SELECT p.id, p.name, p.price, p.rating, -bm25(products_fts, 3.0, 1.0, 1.0) AS score "
+            "FROM products_fts JOIN products p ON p.rowid = products_fts.rowid "
+            "WHERE products_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if max_price is not None:
+            sql += " AND p.price <= ?"
+            params.append(max_price)
+        sql += " ORDER BY score DESC LIMIT ?"
+        params.append(limit)
+
+        with self.pool.connection() as connection:
+            rows = connection.execute(sql, params).fetchall()
+
+        best = rows[0][4] if rows and rows[0][4] > 0 else 1.0
+        return [
+            {
+                "id": product_id,
+                "name": name,
+                "price": _number(price),
+                "rating": rating or 0,
+                "match_score": round(min(score / best, 1.0), 2)
+            }
+            for product_id, name, price, rating, score in rows
+        ]
+
+    def products_under(self, max_price: float, limit: int = 10) -> List[Dict[str, Any]]:
+        """Products within budget, priciest first"""
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT id, name, price, rating FROM products WHERE price <= ? ORDER BY price DESC LIMIT ?",
+                (max_price, limit)
+            ).fetchall()
+        return [
+            {"id": product_id, "name": name, "price": _number(price), "rating": rating or 0, "match_score": 1.0}
+            for product_id, name, price, rating in rows
+        ]
+
+    # Reviews
+
+    def get_reviews(self, product_id: Any) -> List[Dict[str, Any]]:
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT text, rating FROM reviews WHERE product_id = ? ORDER BY id", (product_id,)
+            ).fetchall()
+        return [{'text': text, 'rating': _number(rating)} for text, rating in rows]
+
+    def analyze_products(self, product_ids: Iterable[Any], features: List[str], analyzer) -> Dict[Any, Dict[str, Dict[str, Any]]]:
+        """
+        Feature analysis for several products from their stored reviews
+
+        Each product's reviews are read with one indexed query and analyzed
+        for every feature in one pass.
+
+        Returns:
+            Dictionary of product id -> feature analysis, for products with reviews
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return {}
+
+        reviews: Dict[Any, List[Dict[str, Any]]] = {}
+        with self.pool.connection() as connection:
+            for start in range(0, len(product_ids), 500):
+                chunk = product_ids[start:start + 500]
+                rows = connection.execute(
+                    f"SELECT product_id, text, rating FROM reviews "
+                    f"WHERE product_id IN ({','.join('?' * len(chunk))}) ORDER BY product_id, id",
+                    chunk
+                )
+                for product_id, text, rating in rows:
+                    reviews.setdefault(product_id, []).append({'text': text, 'rating': _number(rating)})
+
+        return {
+            product_id: analyzer.analyze_reviews_for_features(reviews[product_id], features)
+            for product_id in product_ids
+            if product_id in reviews
+        }
+
+    def analyze_feature(self, feature: str, analyzer) -> Dict[str, Any]:
+        """
+        Feature analysis across every stored review
+
+        The trigram index narrows the scan to reviews containing one of the
+        feature's keywords as a substring; the analyzer then applies its
+        exact word-start matching, so the result is the same as analyzing
+        every review. Features with keywords shorter than a trigram scan
+        the whole table.
+        """
+        keywords = analyzer.feature_keywords.get(feature, [])
+        with self.pool.connection() as connection:
+            if keywords and all(len(keyword) >= 3 for keyword in keywords):
+                match = ' OR '.join('"' + keyword.replace('"', '""') + '"' for keyword in keywords)
+                rows = connection.execute(
+                    "SELECT r.text, r.rating FROM reviews_fts JOIN reviews r ON r.id = reviews_fts.rowid "
+                    "WHERE reviews_fts MATCH ? ORDER BY r.id",
+                    (match,)
+                ).fetchall()
+            else:
+                rows = connection.execute("SELECT text, rating FROM reviews ORDER BY id").fetchall()
+
+        reviews = [{'text': text, 'rating': _number(rating)} for text, rating in rows]
+        return analyzer.analyze_reviews_for_features(reviews, [feature])[feature]
+
+    # Orders
+
+    def get_recent_orders(self, count: int = 10, user_id: str = DEFAULT_USER) -> List[Dict[str, Any]]:
+        """A user's most recent orders, newest first"""
+        return self.get_orders(user_id, limit=count)["orders"]
+
+    def get_orders(
+        self,
+        user_id: str = DEFAULT_USER,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        statuses: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        A page of a user's orders, newest first (see OrderIndex.get_orders)
+
+        Pages continue from the cursor's (date, order_id) with a keyset
+        condition on the orders_by_user_date_id index (or, per status,
+        orders_by_user_status_date), so each page reads only its own rows
+        however deep into the history it is.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        before = decode_cursor(cursor) if cursor else None
+        with self.pool.connection() as connection:
+            if statuses:
+                pages = [
+                    self._order_page(connection, user_id, limit + 1, before, since, until, status)
+                    for status in {status.lower() for status in statuses}
+                ]
+            else:
+                pages = [self._order_page(connection, user_id, limit + 1, before, since, until)]
+        return paginate(pages, limit)
+
+    def _order_page(
+        self,
+        connection: sqlite3.Connection,
+        user_id: str,
+        limit: int,
+        before: Optional[OrderKey],
+        since: Optional[str],
+        until: Optional[str],
+        status: Optional[str] = None
+    ) -> List[Any]:
+        """Up to limit (key, order) pairs, newest first"""
+        sql = "SELECT order_id, date, total, items, status FROM orders WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if status is not None:
+            sql += " AND status = ? COLLATE NOCASE"
+            params.append(status)
+        if before is not None:
+            sql += " AND (date, order_id) < (?, ?)"
+            params.extend(before)
+        if since is not None:
+            sql += " AND date >= ?"
+            params.append(since)
+        if until is not None:
+            # Dates are YYYY-MM-DD, possibly with a time after them
+            sql += " AND date < ?"
+            params.append(until + '\uffff')
+        sql += " ORDER BY date DESC, order_id DESC LIMIT ?"
+        params.append(limit)
+
+        rows = connection.execute(sql, params).fetchall()
+        return [
+            ((date, order_id), {"order_id": order_id, "date": date, "total": total, "items": items, "status": status})
+            for order_id, date, total, items, status in rows
+        ]
+
+    # Carts
+
+    def get_cart(self, session_id: str) -> Dict[Any, int]:
+        """Product id -> quantity for a session's cart"""
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT product_id, quantity FROM cart_items WHERE session_id = ? ORDER BY rowid",
+                (session_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def set_cart_item(self, session_id: str, product_id: Any, quantity: int) -> None:
+        """Set a cart line's quantity (0 removes it)"""
+        with self.pool.connection() as connection:
+            if quantity > 0:
+                connection.execute(
+                    "INSERT INTO cart_items (session_id, product_id, quantity) VALUES (?, ?, ?) "
+                    "ON CONFLICT (session_id, product_id) DO UPDATE SET quantity = excluded.quantity",
+                    (session_id, product_id, quantity)
+                )
+            else:
+                connection.execute(
+                    "DELETE FROM cart_items WHERE session_id = ? AND product_id = ?", (session_id, product_id)
+                )
+
+    # Sessions
+
+    def save_session(self, session_id: str, data: str, expires_at: float) -> None:
+        """Store a serialized session until expires_at (a time.time() timestamp)"""
+        with self.pool.connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                (session_id, data, expires_at)
+            )
+
+    def take_session(self, session_id: str) -> Optional[str]:
+        """Remove a stored session and return its data, or None if missing or expired"""
+        with self.pool.connection() as connection:
+            row = connection.execute(
+                "SELECT data, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        data, expires_at = row
+        return data if expires_at > time.time() else None
+
+    def purge_sessions(self) -> int:
+        """Delete expired sessions; returns how many were removed"""
+        with self.pool.connection() as connection:
+            return connection.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def count_sessions(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+def _number(value: Any) -> Any:
+    """Whole-number REALs back as ints, as in the mock data"""
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+_store: Optional[SQLiteStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[SQLiteStore]:
+    """The shared store for SPARK_DB_PATH, or None when no database is configured"""
+    global _store
+    path = os.environ.get(DB_PATH_ENV)
+    if not path:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteStore(path)
+    return _store
@@ -1,21 +1,117 @@
 """
 Store Locator Service for finding nearby stores and prices
 """
-from typing import Dict, List, Any
-import random
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+import math
+import threading
+import time
+import numpy as np
+from .catalog import get_catalog
+from .geo_index import GeoGridIndex, haversine_km
+from .store_prices import AVAILABILITY_OPTIONS, NOT_CARRIED, ProductKeys, StorePriceMatrix
+
+
+# Store prices and availability are redrawn once per epoch of this many seconds
+PRICE_TTL_SECONDS = 900
+
+# (latitude, longitude) used when the request doesn't carry the user's location
+DEFAULT_LOCATION = (12.9716, 77.5946)
+
+# Stores further away than this are not offered
+DEFAULT_RADIUS_KM = 25.0
+
+# Nearest stores considered for a product before dropping those that don't stock it
+NEARBY_CANDIDATES = 20
+
+# Deal score weights (lower scores are better deals); distances are scaled by 10 km
+DEAL_PRICE_WEIGHT = 0.7
+DEAL_DISTANCE_WEIGHT = 0.3
+
+# Nearest stocking stores compared when looking for the best deal
+DEAL_STORES = 4
+
+Location = Tuple[float, float]
+
+
+def parse_location(value: Any) -> Optional[Location]:
+    """
+    User location from a request context value
+    
+    Accepts {"lat": .., "lon": ..} (or "lng", "latitude"/"longitude") or a
+    [lat, lon] pair.
+    
+    Returns:
+        (latitude, longitude), or None when no location was given
+        
+    Raises:
+        ValueError: If the location is malformed or out of range
+    """
+    if value is None:
+        return None
+    
+    if isinstance(value, dict):
+        latitude = value.get('lat', value.get('latitude'))
+        longitude = value.get('lon', value.get('lng', value.get('longitude')))
+    elif isinstance(value, (list, tuple)) and len(value) == 2:
+        latitude, longitude = value
+    else:
+        raise ValueError("Location must be {'lat': .., 'lon': ..} or [lat, lon]")
+    
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("Location latitude and longitude must be numbers")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or math.isnan(latitude + longitude):
+        raise ValueError("Location is out of range")
+    return latitude, longitude
 
 
 class StoreLocator:
-    """Mock service for locating nearby stores with product prices"""
+    """
+    Mock service for locating nearby stores with product prices.
+    
+    Stores are indexed by location in a GeoGridIndex, so finding the
+    stores near a user is a grid lookup rather than a scan of every store.
+    Prices and availability come from a StorePriceMatrix, so they are the
+    same across requests and workers within a price epoch
+    (PRICE_TTL_SECONDS). The matrix is rebuilt on a background thread
+    when the epoch ends or the catalog is swapped.
+    """
+    
+    def __init__(self, stores: Optional[Sequence[Dict[str, Any]]] = None, ttl_seconds: float = PRICE_TTL_SECONDS):
+        """
+        Args:
+            stores: Store dicts with id, name, address, latitude, longitude,
+                rating and price_modifier (defaults to the mock stores)
+            ttl_seconds: Length of a price epoch
+        """
+        self.ttl_seconds = ttl_seconds
+        self._matrix: Optional[StorePriceMatrix] = None
+        self._matrix_version: Optional[int] = None
+        self._lock = threading.Lock()
+        # (catalog version, its ProductKeys), reused across epochs
+        self._product_keys: Optional[Tuple[int, ProductKeys]] = None
+        # (epoch, catalog version) of the last matrix build started
+        self._building: Optional[Tuple[int, int]] = None
+        self._build_lock = threading.Lock()
+        
+        self.stores = list(stores) if stores is not None else self._mock_stores()
+        self._by_id = {store['id']: store for store in self.stores}
+        self.geo_index = GeoGridIndex(
+            [store['latitude'] for store in self.stores],
+            [store['longitude'] for store in self.stores]
+        )
     
-    def __init__(self):
-        # Mock store data
-        self.stores = [
+    @staticmethod
+    def _mock_stores() -> List[Dict[str, Any]]:
+        # Mock stores around DEFAULT_LOCATION (2.1, 3.5, 5.8 and 7.2 km away)
+        return [
             {
                 'id': 1,
                 'name': 'TechZone Express',
                 'address': '123 Main Street, Downtown',
-                'distance': '2.1 km',
+                'latitude': 12.9902,
+                'longitude': 77.5912,
                 'rating': 4.5,
                 'price_modifier': 0.95  # 5% cheaper than online
             },
@@ -23,7 +119,8 @@ class StoreLocator:
                 'id': 2,
                 'name': 'MobileHub Plus',
                 'address': '456 Park Avenue, Westside',
-                'distance': '3.5 km',
+                'latitude': 12.9689,
+                'longitude': 77.5624,
                 'rating': 4.2,
                 'price_modifier': 1.02  # 2% more expensive
             },
@@ -31,7 +128,8 @@ class StoreLocator:
                 'id': 3,
                 'name': 'SmartStore Central',
                 'address': '789 Tech Boulevard, North Point',
-                'distance': '5.8 km',
+                'latitude': 13.022,
+                'longitude': 77.6085,
                 'rating': 4.7,
                 'price_modifier': 0.98  # 2% cheaper
             },
@@ -39,13 +137,104 @@ class StoreLocator:
                 'id': 4,
                 'name': 'Digital Dreams',
                 'address': '321 Innovation Drive, Tech Park',
-                'distance': '7.2 km',
+                'latitude': 12.9345,
+                'longitude': 77.649,
                 'rating': 4.3,
                 'price_modifier': 1.05  # 5% more expensive
             }
         ]
     
-    def get_nearby_stores_with_prices(self, product_id: int, online_price: float, limit: int = 3) -> List[Dict[str, Any]]:
+    def current_epoch(self) -> int:
+        return int(time.time() // self.ttl_seconds)
+    
+    def seconds_until_refresh(self) -> int:
+        """Seconds until the current prices are redrawn"""
+        return max(int(self.ttl_seconds - time.time() % self.ttl_seconds), 1)
+    
+    def price_matrix(self) -> StorePriceMatrix:
+        """
+        The price matrix for the current epoch and catalog
+        
+        When either changes, the full matrix is built on a background
+        thread (see refresh_price_matrix). Until it is ready, a matrix that
+        computes just the requested cells on every lookup stands in; its
+        prices are the same, so requests never wait for the build.
+        """
+        catalog = get_catalog()
+        epoch = self.current_epoch()
+        matrix = self._matrix
+        if matrix is not None and matrix.epoch == epoch and self._matrix_version == catalog.version:
+            return matrix
+        
+        with self._lock:
+            if self._matrix is None or self._matrix.epoch != epoch or self._matrix_version != catalog.version:
+                cached_keys = self._product_keys
+                keys = cached_keys[1] if cached_keys is not None and cached_keys[0] == catalog.version else ProductKeys()
+                self._matrix = StorePriceMatrix(keys, self.stores, epoch, precompute_max_cells=0)
+                self._matrix_version = catalog.version
+                
+                if self._building != (epoch, catalog.version):
+                    self._building = (epoch, catalog.version)
+                    threading.Thread(target=self.refresh_price_matrix, args=(catalog, epoch), daemon=True).start()
+            return self._matrix
+    
+    def refresh_price_matrix(self, catalog=None, epoch: Optional[int] = None) -> StorePriceMatrix:
+        """
+        Build the full price matrix and put it in use
+        
+        Product keys are computed once per catalog version. The matrix
+        replaces the one in use only if the epoch and catalog are still
+        current when it is done.
+        
+        Args:
+            catalog: Catalog to build for (defaults to the shared one)
+            epoch: Price epoch to build for (defaults to the current one)
+            
+        Returns:
+            The new matrix
+        """
+        catalog = catalog or get_catalog()
+        epoch = self.current_epoch() if epoch is None else epoch
+        
+        with self._build_lock:
+            cached_keys = self._product_keys
+            if cached_keys is None or cached_keys[0] != catalog.version:
+                cached_keys = self._product_keys = (catalog.version, ProductKeys(catalog.ids()))
+            matrix = StorePriceMatrix(cached_keys[1], self.stores, epoch)
+        
+        with self._lock:
+            if epoch == self.current_epoch() and catalog.version == get_catalog().version:
+                self._matrix = matrix
+                self._matrix_version = catalog.version
+        return matrix
+    
+    def nearby_stores(
+        self,
+        location: Optional[Location] = None,
+        k: Optional[int] = NEARBY_CANDIDATES,
+        radius_km: float = DEFAULT_RADIUS_KM
+    ) -> List[Tuple[int, float]]:
+        """
+        Stores nearest to a location
+        
+        Args:
+            location: (latitude, longitude) of the user, DEFAULT_LOCATION if None
+            k: Maximum number of stores (None for every store within the radius)
+            radius_km: Maximum distance
+            
+        Returns:
+            List of (position in self.stores, distance in km), nearest first
+        """
+        latitude, longitude = location or DEFAULT_LOCATION
+        return self.geo_index.nearest(latitude, longitude, k=k, radius_km=radius_km)
+    
+    def get_nearby_stores_with_prices(
+        self,
+        product_id: int,
+        online_price: float,
+        limit: int = 3,
+        location: Optional[Location] = None
+    ) -> List[Dict[str, Any]]:
         """
         Get nearby stores with their prices for a product
         
@@ -53,78 +242,89 @@ class StoreLocator:
             product_id: ID of the product
             online_price: Online price of the product
             limit: Maximum number of stores to return
+            location: (latitude, longitude) of the user, DEFAULT_LOCATION if None
             
         Returns:
-            List of stores with prices and availability
+            List of the nearest stores stocking the product, with prices and availability
         """
-        # Randomly select stores (simulating availability)
-        available_stores = random.sample(self.stores, min(limit, len(self.stores)))
+        columns, distances = self._nearby_columns(location)
+        if not len(columns):
+            return []
+        modifiers, availability = self.price_matrix().lookup(product_id, columns)
+        prices = np.round(online_price * modifiers, 2)
         
         store_prices = []
         
-        for store in available_stores:
-            # Calculate store price with some randomization
-            base_modifier = store['price_modifier']
-            # Add some random variation (-2% to +2%)
-            random_variation = random.uniform(-0.02, 0.02)
-            final_modifier = base_modifier + random_variation
+        for column, distance, price, status in zip(
+            columns.tolist(), distances.tolist(), prices.tolist(), availability.tolist()
+        ):
+            if status == NOT_CARRIED:
+                continue
             
-            store_price = round(online_price * final_modifier, 2)
-            
-            # Determine availability
-            availability = self._generate_availability()
-            
-            store_prices.append({
-                'store': store['name'],
-                'store_id': store['id'],
-                'distance': store['distance'],
-                'address': store['address'],
-                'price': store_price,
-                'availability': availability,
-                'rating': store['rating'],
-                'savings': round(online_price - store_price, 2),
-                'price_match': store_price < online_price
-            })
+            store_prices.append(self._store_price(column, distance, price, status, online_price))
+            if len(store_prices) == limit:
+                break
         
         # Sort by price
         store_prices.sort(key=lambda x: x['price'])
         
         return store_prices
     
-    def _generate_availability(self) -> str:
-        """Generate random availability status"""
-        availability_options = [
-            'In Stock',
-            'In Stock',
-            'In Stock',  # Make "In Stock" more common
-            'Limited Stock',
-            'Display Unit Available',
-            'Available for Order'
-        ]
-        return random.choice(availability_options)
+    def _nearby_columns(self, location: Optional[Location]) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of the nearby stores and their distances in km (to 10 m), nearest first"""
+        nearby = self.nearby_stores(location)
+        columns = np.array([column for column, _ in nearby], dtype=np.intp)
+        distances = np.round(np.array([distance for _, distance in nearby], dtype=np.float64), 2)
+        return columns, distances
+    
+    def _store_price(self, column: int, distance_km: float, price: float, status: int, online_price: float) -> Dict[str, Any]:
+        store = self.stores[column]
+        return {
+            'store': store['name'],
+            'store_id': store['id'],
+            'distance': f"{distance_km:.1f} km",
+            'distance_km': distance_km,
+            'address': store['address'],
+            'price': price,
+            'availability': AVAILABILITY_OPTIONS[status],
+            'rating': store['rating'],
+            'savings': round(online_price - price, 2),
+            'price_match': price < online_price
+        }
     
-    def get_store_details(self, store_id: int) -> Dict[str, Any]:
+    def get_store_details(self, store_id: int, location: Optional[Location] = None) -> Dict[str, Any]:
         """Get detailed information about a specific store"""
-        store = next((s for s in self.stores if s['id'] == store_id), None)
+        store = self._by_id.get(store_id)
         
         if not store:
             return None
         
+        latitude, longitude = location or DEFAULT_LOCATION
+        distance = float(haversine_km(latitude, longitude, store['latitude'], store['longitude']))
+        
         return {
             'id': store['id'],
             'name': store['name'],
             'address': store['address'],
-            'distance': store['distance'],
+            'latitude': store['latitude'],
+            'longitude': store['longitude'],
+            'distance': f"{distance:.1f} km",
+            'distance_km': round(distance, 2),
             'rating': store['rating'],
             'hours': 'Mon-Sat: 10:00 AM - 9:00 PM, Sun: 11:00 AM - 7:00 PM',
-            'phone': f'+1-555-{random.randint(1000, 9999):04d}',
+            'phone': f'+1-555-{1000 + store["id"] * 2741 % 9000:04d}',
             'services': ['Price Match', 'Extended Warranty', 'Free Setup', 'Trade-In'],
             'payment_options': ['Cash', 'Credit/Debit', 'EMI Available', 'Digital Wallets']
         }
     
-    def calculate_best_deal(self, product_id: int, online_price: float) -> Dict[str, Any]:
+    def calculate_best_deal(
+        self,
+        product_id: int,
+        online_price: float,
+        location: Optional[Location] = None
+    ) -> Dict[str, Any]:
         """Calculate the best overall deal considering price and distance"""
-        stores = self.get_nearby_stores_with_prices(product_id, online_price, limit=4)
+        stores = self.get_nearby_stores_with_prices(product_id, online_price, limit=DEAL_STORES, location=location)
         
         if not stores:
             return {
@@ -134,15 +334,12 @@ class StoreLocator:
         
         # Score each store based on price and distance
         for store in stores:
-            # Extract distance value (assuming format like "2.1 km")
-            distance_value = float(store['distance'].split()[0])
-            
             # Calculate score (lower is better)
             # Weight: 70% price, 30% distance
             price_score = store['price'] / online_price
-            distance_score = distance_value / 10  # Normalize to 0-1 range
+            distance_score = store['distance_km'] / 10  # Normalize to 0-1 range
             
-            store['deal_score'] = (price_score * 0.7) + (distance_score * 0.3)
+            store['deal_score'] = (price_score * DEAL_PRICE_WEIGHT) + (distance_score * DEAL_DISTANCE_WEIGHT)
         
         # Find best deal
         best_store = min(stores, key=lambda x: x['deal_score'])
@@ -153,6 +350,74 @@ class StoreLocator:
             'all_stores': stores
         }
     
+    def calculate_best_deals(
+        self,
+        items: Sequence[Tuple[Any, float]],
+        location: Optional[Location] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Best deal for each of several products in one pass
+        
+        Looks up the nearby stores once, then prices and scores every
+        (product, store) pair as one array, with the same scoring and
+        tie-breaking as calculate_best_deal.
+        
+        Args:
+            items: (product_id, online_price) pairs
+            location: (latitude, longitude) of the user, DEFAULT_LOCATION if None
+            
+        Returns:
+            One entry per item, in order, with product_id, online_price,
+            best_deal (a store price dict with deal_score, or None) and reason
+        """
+        items = list(items)
+        if not items:
+            return []
+        
+        columns, distances = self._nearby_columns(location)
+        if not len(columns):
+            return [
+                {'product_id': product_id, 'online_price': online_price, 'best_deal': None,
+                 'reason': 'No nearby stores available'}
+                for product_id, online_price in items
+            ]
+        
+        online_prices = np.array([online_price for _, online_price in items], dtype=np.float64)
+        modifiers, availability = self.price_matrix().lookup_many([product_id for product_id, _ in items], columns)
+        prices = np.round(online_prices[:, None] * modifiers, 2)
+        
+        # Each product's nearest DEAL_STORES stocking stores compete
+        carried = availability != NOT_CARRIED
+        eligible = carried & (np.cumsum(carried, axis=1) <= DEAL_STORES)
+        
+        scores = (prices / online_prices[:, None]) * DEAL_PRICE_WEIGHT + (distances / 10)[None, :] * DEAL_DISTANCE_WEIGHT
+        scores = np.where(eligible, scores, np.inf)
+        best_scores = scores.min(axis=1)
+        # Ties go to the cheaper store, then the nearer one
+        best_columns = np.where(scores == best_scores[:, None], prices, np.inf).argmin(axis=1)
+        
+        deals = []
+        for row, (product_id, online_price) in enumerate(items):
+            if not np.isfinite(best_scores[row]):
+                deals.append({'product_id': product_id, 'online_price': online_price, 'best_deal': None,
+                              'reason': 'No nearby stores available'})
+                continue
+            
+            position = int(best_columns[row])
+            best_store = self._store_price(
+                int(columns[position]), float(distances[position]), float(prices[row, position]),
+                int(availability[row, position]), online_price
+            )
+            best_store['deal_score'] = float(best_scores[row])
+            deals.append({
+                'product_id': product_id,
+                'online_price': online_price,
+                'best_deal': best_store,
+                'reason': self._generate_deal_reason(best_store, online_price)
+            })
+        
+        return deals
+    
     def _generate_deal_reason(self, store: Dict[str, Any], online_price: float) -> str:
         """Generate explanation for why this is the best deal"""
         if store['savings'] > 0:
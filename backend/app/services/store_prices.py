@@ -0,0 +1,179 @@
+"""
+Product x store price and availability matrix
+"""
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+import hashlib
+
+import numpy as np
+
+
+# Availability statuses; "In Stock" is listed three times to make it the most common
+AVAILABILITY_OPTIONS = (
+    'In Stock',
+    'In Stock',
+    'In Stock',
+    'Limited Stock',
+    'Display Unit Available',
+    'Available for Order'
+)
+
+# Store prices vary by up to this fraction either side of the store's price modifier
+PRICE_VARIATION = 0.02
+
+# Share of stores that stock any given product
+CARRIED_FRACTION = 0.75
+
+# Availability value for a store that doesn't stock the product
+NOT_CARRIED = 255
+
+# Largest (products x stores) matrix computed up front; bigger ones are computed per lookup
+PRECOMPUTE_MAX_CELLS = 4_000_000
+
+# Hash salts for the independent per-cell draws
+_SALT_PRICE, _SALT_AVAILABILITY, _SALT_CARRIED = 1, 2, 3
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: scrambles uint64 values into well-spread hashes"""
+    with np.errstate(over='ignore'):
+        values = values ^ (values >> np.uint64(30))
+        values = values * np.uint64(0xBF58476D1CE4E5B9)
+        values = values ^ (values >> np.uint64(27))
+        values = values * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+
+def _uniform(hashes: np.ndarray) -> np.ndarray:
+    """Uniform [0, 1) floats from the top 53 bits of each hash"""
+    return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def product_keys(product_ids: Iterable[Hashable]) -> np.ndarray:
+    """
+    Stable 64-bit key per product id
+
+    Keys come from the id's string form, so 13 and "13" share a key, and
+    they are the same in every process (unlike hash(), which is salted).
+    """
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(str(product_id).encode('utf-8'), digest_size=8).digest(), 'little')
+         for product_id in product_ids],
+        dtype=np.uint64
+    )
+
+
+class ProductKeys:
+    """
+    Matrix row and key (see product_keys) of every catalog product.
+
+    Keys depend only on the product ids, so one instance serves the price
+    matrix of every epoch until the catalog changes.
+    """
+
+    def __init__(self, product_ids: Iterable[Hashable] = ()):
+        self.rows: Dict[str, int] = {str(product_id): row for row, product_id in enumerate(product_ids)}
+        self.keys = product_keys(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class StorePriceMatrix:
+    """
+    Price modifiers and availability for every (product, store) pair.
+
+    Each cell is a hash of (product id, store id, epoch), so the matrix is
+    the same on every worker and for every request within an epoch, and
+    is redrawn when the epoch changes. When products x stores is small
+    enough the whole matrix is computed up front and a lookup is an array
+    index; otherwise lookups compute just the requested cells (typically
+    the few stores near the user). Products outside the catalog get their
+    cells computed the same way on the fly.
+    """
+
+    def __init__(
+        self,
+        products: Union[ProductKeys, Sequence[Hashable]],
+        stores: Sequence[Dict[str, Any]],
+        epoch: int,
+        precompute_max_cells: int = PRECOMPUTE_MAX_CELLS
+    ):
+        """
+        Args:
+            products: Catalog product ids, or their ProductKeys
+            stores: Store dicts with 'id' and 'price_modifier'
+            epoch: Price epoch; each epoch has its own prices
+            precompute_max_cells: Compute the full matrix up front if it has at most this many cells
+        """
+        self.epoch = epoch
+        self.store_ids = np.array([store['id'] for store in stores], dtype=np.uint64)
+        self.base_modifiers = np.array([store['price_modifier'] for store in stores], dtype=np.float64)
+        if not isinstance(products, ProductKeys):
+            products = ProductKeys(products)
+        self._rows = products.rows
+        self._keys = products.keys
+
+        self.modifiers: Optional[np.ndarray] = None
+        self.availability: Optional[np.ndarray] = None
+        if 0 < len(self._rows) * len(self.store_ids) <= precompute_max_cells:
+            self.modifiers, self.availability = self._compute(self._keys, np.arange(len(self.store_ids)))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def precomputed(self) -> bool:
+        return self.modifiers is not None
+
+    def _cell_hashes(self, keys: np.ndarray, columns: np.ndarray, salt: int) -> np.ndarray:
+        seeds = _mix64(
+            (np.uint64(self.epoch) << np.uint64(24)) | (self.store_ids[columns] << np.uint64(4)) | np.uint64(salt)
+        )
+        with np.errstate(over='ignore'):
+            return _mix64(keys[:, None] + seeds[None, :])
+
+    def _compute(self, keys: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        modifiers = self.base_modifiers[columns][None, :] + PRICE_VARIATION * (
+            2 * _uniform(self._cell_hashes(keys, columns, _SALT_PRICE)) - 1
+        )
+
+        availability = (
+            self._cell_hashes(keys, columns, _SALT_AVAILABILITY) % np.uint64(len(AVAILABILITY_OPTIONS))
+        ).astype(np.uint8)
+        carried = _uniform(self._cell_hashes(keys, columns, _SALT_CARRIED)) < CARRIED_FRACTION
+        availability[~carried] = NOT_CARRIED
+        return modifiers, availability
+
+    def _keys_for(self, product_ids: Sequence[Hashable]) -> Tuple[np.ndarray, List[Optional[int]]]:
+        rows = [self._rows.get(str(product_id)) for product_id in product_ids]
+        if all(row is not None for row in rows):
+            return self._keys[rows], rows
+        return product_keys(product_ids), rows
+
+    def lookup_many(self, product_ids: Sequence[Hashable], columns: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cells for several products at a set of stores
+
+        Args:
+            product_ids: Products (rows of the result)
+            columns: Store positions in the stores list (columns of the result)
+
+        Returns:
+            (price modifiers, availability indexes), each products x columns;
+            NOT_CARRIED marks stores that don't stock the product
+        """
+        columns = np.asarray(columns, dtype=np.intp)
+        keys, rows = self._keys_for(product_ids)
+        if self.precomputed and all(row is not None for row in rows):
+            rows = np.asarray(rows, dtype=np.intp)
+            return self.modifiers[np.ix_(rows, columns)], self.availability[np.ix_(rows, columns)]
+        return self._compute(keys, columns)
+
+    def lookup(self, product_id: Hashable, columns: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """A product's (price modifiers, availability indexes) at a set of stores"""
+        modifiers, availability = self.lookup_many([product_id], columns)
+        return modifiers[0], availability[0]
+
+    def memory_bytes(self) -> int:
+        cells = self.modifiers.nbytes + self.availability.nbytes if self.precomputed else 0
+        return cells + self._keys.nbytes
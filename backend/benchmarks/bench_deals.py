@@ -0,0 +1,51 @@
+"""
+Benchmark: best store deals for a page of products
+
+Compares calling StoreLocator.calculate_best_deal once per product with
+one calculate_best_deals batch, checking both pick the same stores, for
+the mock stores and for a dense synthetic store network.
+
+Run from the backend directory:
+    python -m benchmarks.bench_deals [product_count]
+"""
+import random
+import sys
+import time
+
+from app.services.store_locator import StoreLocator
+from benchmarks.bench_geo import synthetic_stores
+
+
+REPEAT = 50
+LOCATION = (12.98, 77.60)
+
+
+def run(label: str, locator: StoreLocator, items) -> None:
+    locator.refresh_price_matrix()
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        single = [locator.calculate_best_deal(product_id, price, location=LOCATION) for product_id, price in items]
+    single_ms = (time.perf_counter() - start) / REPEAT * 1000
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        batch = locator.calculate_best_deals(items, location=LOCATION)
+    batch_ms = (time.perf_counter() - start) / REPEAT * 1000
+
+    assert [deal['best_deal'] for deal in single] == [deal['best_deal'] for deal in batch]
+    print(f"{label:22} per product {single_ms:8.2f} ms   batch {batch_ms:7.2f} ms   "
+          f"speedup {single_ms / batch_ms:5.1f}x")
+
+
+def main(product_count: int = 50) -> None:
+    rng = random.Random(9)
+    items = [(rng.randint(1, 100_000), rng.randint(5_000, 120_000) - 0.01) for _ in range(product_count)]
+
+    print(f"best deals for {product_count} products, mean of {REPEAT} runs")
+    run("4 mock stores", StoreLocator(), items)
+    run("20k synthetic stores", StoreLocator(stores=synthetic_stores(20_000)), items)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
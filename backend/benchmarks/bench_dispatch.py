@@ -0,0 +1,95 @@
+"""
+Benchmark: RECOMMEND dispatch latency, loopback HTTP vs in-process
+
+Serves the app with uvicorn on a free local port and times a
+recommendation three ways:
+
+- loopback HTTP with a new AsyncClient per call (the old command path)
+- loopback HTTP through the shared pooled client
+- an in-process ServiceDispatcher call (the current command path)
+
+Run from the backend directory:
+    python -m benchmarks.bench_dispatch [calls]
+"""
+import asyncio
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from app.main import app
+from app.services.dispatcher import service_dispatcher
+from app.services.http_client import get_http_client, close_http_client
+
+
+PAYLOAD = {"budget": 40000, "priorities": ["performance", "camera", "battery"], "include_stores": True}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def time_calls(call, calls: int):
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run(url: str, calls: int) -> None:
+    async def new_client_per_call():
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, json=PAYLOAD)
+            response.json()
+
+    async def pooled_client():
+        response = await get_http_client().post(url, json=PAYLOAD)
+        response.json()
+
+    async def in_process():
+        service_dispatcher.recommend(**PAYLOAD)
+
+    # Both paths must recommend the same products (store prices are randomized)
+    expected = [r['product_id'] for r in service_dispatcher.recommend(**PAYLOAD)['recommendations']]
+    response = await get_http_client().post(url, json=PAYLOAD)
+    assert [r['product_id'] for r in response.json()['recommendations']] == expected
+
+    for label, call in [
+        ("loopback, new client per call", new_client_per_call),
+        ("loopback, pooled client", pooled_client),
+        ("in-process dispatcher", in_process),
+    ]:
+        latencies = await time_calls(call, calls)
+        print(f"{label:32} median {statistics.median(latencies) * 1e3:7.3f} ms  "
+              f"p95 {sorted(latencies)[int(len(latencies) * 0.95)] * 1e3:7.3f} ms")
+
+    await close_http_client()
+
+
+def main(calls: int = 500) -> None:
+    port = free_port()
+    server = start_server(port)
+    try:
+        asyncio.run(run(f"http://127.0.0.1:{port}/api/agent/recommend", calls))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,96 @@
+"""
+Benchmark: recommendation enrichment against slow store and review sources
+
+Simulates store price and review lookups that take tens of milliseconds
+each (as a remote pricing service or database would) and compares
+enriching the top candidates one after another with the concurrent
+enrichment pipeline, then shows a stage timing out into a partial
+response.
+
+Run from the backend directory:
+    python -m benchmarks.bench_enrichment [top_k]
+"""
+import asyncio
+import sys
+import time
+
+from app.services.catalog import get_catalog
+from app.services.recommender import ProductRecommender
+
+
+STORE_DELAY = 0.020
+REVIEW_DELAY = 0.030
+BUDGET = 100000
+PRIORITIES = ['camera', 'battery']
+
+
+def slow(func, delay: float, slow_ids=(), slow_delay: float = 0.0):
+    """Wrap a lookup taking a product id or product so that it sleeps first"""
+    def wrapper(product, *args, **kwargs):
+        product_id = product['id'] if hasattr(product, 'keys') else product
+        time.sleep(slow_delay if product_id in slow_ids else delay)
+        return func(product, *args, **kwargs)
+    return wrapper
+
+
+def make_recommender(slow_ids=(), slow_delay: float = 0.0) -> ProductRecommender:
+    recommender = ProductRecommender()
+    locator, analyzer = recommender.store_locator, recommender.review_analyzer
+    locator.get_nearby_stores_with_prices = slow(locator.get_nearby_stores_with_prices, STORE_DELAY)
+    analyzer.analyze_product_features = slow(
+        analyzer.analyze_product_features, REVIEW_DELAY, slow_ids, slow_delay
+    )
+    return recommender
+
+
+def serial(recommender: ProductRecommender, products, top_k: int):
+    """Score, then look up stores and reviews for each candidate in turn"""
+    result = recommender.get_budget_recommendations(products, BUDGET, PRIORITIES, top_k=top_k)
+    for recommendation in result['recommendations']:
+        product = get_catalog().get(recommendation['product_id'])
+        recommendation['review_analysis'] = recommender.review_analyzer.analyze_product_features(product, PRIORITIES)
+    return result
+
+
+def main(top_k: int = 10) -> None:
+    products = get_catalog().products
+    recommender = make_recommender()
+    recommender.get_budget_recommendations(products, BUDGET, PRIORITIES, include_stores=False)
+
+    start = time.perf_counter()
+    expected = serial(recommender, products, top_k)
+    serial_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    result = asyncio.run(recommender.get_budget_recommendations_async(products, BUDGET, PRIORITIES, top_k=top_k))
+    pipeline_ms = (time.perf_counter() - start) * 1000
+
+    assert not result['partial']
+    assert result['recommendations'] == expected['recommendations']
+
+    candidates = len(result['recommendations'])
+    print(f"candidates:        {candidates} (store lookup {STORE_DELAY * 1000:.0f} ms, "
+          f"review lookup {REVIEW_DELAY * 1000:.0f} ms)")
+    print(f"serial:            {serial_ms:8.1f} ms")
+    print(f"pipeline:          {pipeline_ms:8.1f} ms")
+    print(f"speedup:           {serial_ms / pipeline_ms:8.1f}x")
+
+    # One candidate's review source stalls past the review stage deadline
+    stalled_id = result['recommendations'][0]['product_id']
+    stalled = make_recommender(slow_ids={stalled_id}, slow_delay=1.0)
+    stalled.get_budget_recommendations(products, BUDGET, PRIORITIES, include_stores=False)
+
+    async def respond():
+        # Time to the response; the stalled thread finishes in the background
+        start = time.perf_counter()
+        response = await stalled.get_budget_recommendations_async(
+            products, BUDGET, PRIORITIES, top_k=top_k, review_timeout=0.3
+        )
+        return response, (time.perf_counter() - start) * 1000
+
+    partial, partial_ms = asyncio.run(respond())
+    print(f"stalled review:    {partial_ms:8.1f} ms  partial={partial['partial']}  incomplete={partial['incomplete']}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
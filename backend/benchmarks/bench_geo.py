@@ -0,0 +1,97 @@
+"""
+Benchmark: nearest-store queries with tens of thousands of stores
+
+Places synthetic stores around a set of cities and compares k-nearest
+queries within a radius on the GeoGridIndex against a haversine scan of
+every store (checking both return the same stores), then times
+StoreLocator.get_nearby_stores_with_prices end to end.
+
+Run from the backend directory:
+    python -m benchmarks.bench_geo [store_count]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.services.geo_index import GeoGridIndex, haversine_km
+from app.services.store_locator import StoreLocator
+
+
+CITIES = [
+    (12.9716, 77.5946), (19.0760, 72.8777), (28.6139, 77.2090), (13.0827, 80.2707),
+    (22.5726, 88.3639), (17.3850, 78.4867), (18.5204, 73.8567), (23.0225, 72.5714),
+]
+K = 10
+RADIUS_KM = 25.0
+QUERY_COUNT = 2000
+
+
+def synthetic_stores(count: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    # Most stores cluster around cities, the rest are spread across the country
+    clustered = int(count * 0.8)
+    centres = np.array(CITIES)[rng.integers(0, len(CITIES), clustered)]
+    latitudes = np.concatenate([centres[:, 0] + rng.normal(0, 0.15, clustered), rng.uniform(8, 34, count - clustered)])
+    longitudes = np.concatenate([centres[:, 1] + rng.normal(0, 0.15, clustered), rng.uniform(68, 97, count - clustered)])
+    return [
+        {
+            'id': i + 1,
+            'name': f"Store {i + 1}",
+            'address': f"{i + 1} Market Road",
+            'latitude': float(latitude),
+            'longitude': float(longitude),
+            'rating': 4.0,
+            'price_modifier': float(rng.uniform(0.95, 1.05))
+        }
+        for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes))
+    ]
+
+
+def scan_nearest(latitudes, longitudes, latitude, longitude):
+    """Haversine distance to every store, then the k nearest within the radius"""
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    inside = np.flatnonzero(distances <= RADIUS_KM)
+    order = inside[np.lexsort((inside, distances[inside]))][:K]
+    return order.tolist()
+
+
+def main(count: int = 50_000) -> None:
+    stores = synthetic_stores(count)
+    latitudes = np.array([store['latitude'] for store in stores])
+    longitudes = np.array([store['longitude'] for store in stores])
+
+    start = time.perf_counter()
+    index = GeoGridIndex(latitudes, longitudes)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = np.random.default_rng(3)
+    centres = np.array(CITIES)[rng.integers(0, len(CITIES), QUERY_COUNT)]
+    queries = centres + rng.normal(0, 0.1, centres.shape)
+
+    start = time.perf_counter()
+    expected = [scan_nearest(latitudes, longitudes, lat, lon) for lat, lon in queries]
+    scan_us = (time.perf_counter() - start) / QUERY_COUNT * 1e6
+
+    start = time.perf_counter()
+    found = [index.nearest(lat, lon, k=K, radius_km=RADIUS_KM) for lat, lon in queries]
+    grid_us = (time.perf_counter() - start) / QUERY_COUNT * 1e6
+
+    assert [[i for i, _ in result] for result in found] == expected
+
+    print(f"stores:            {count:,} (grid built in {build_ms:.1f} ms)")
+    print(f"query:             {K} nearest within {RADIUS_KM:g} km")
+    print(f"haversine scan:    {scan_us:10.1f} us/query")
+    print(f"grid index:        {grid_us:10.1f} us/query")
+    print(f"speedup:           {scan_us / grid_us:10.1f}x")
+
+    locator = StoreLocator(stores=stores)
+    locator.get_nearby_stores_with_prices(1, 29999, location=tuple(queries[0]))
+    start = time.perf_counter()
+    for lat, lon in queries:
+        locator.get_nearby_stores_with_prices(1, 29999, location=(lat, lon))
+    print(f"store prices:      {(time.perf_counter() - start) / QUERY_COUNT * 1e6:10.1f} us/call (3 nearest stocking stores)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,128 @@
+"""
+Benchmark: pages of a long order history
+
+Loads one customer with a long order history (among other customers)
+and compares reading the newest page, a page deep in the history, and a
+status-filtered page, against sorting the customer's whole history and
+slicing it, in memory (OrderIndex) and in SQLite (keyset pages against
+LIMIT/OFFSET).
+
+Run from the backend directory:
+    python -m benchmarks.bench_orders [order_count]
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from app.services.order_index import OrderIndex
+from app.services.sqlite_store import SQLiteStore
+
+
+PAGE = 20
+REPEAT = 200
+STATUSES = ['Delivered'] * 8 + ['In Transit', 'Cancelled', 'Returned']
+
+
+def synthetic_orders(count: int, seed: int = 5, prefix: str = 'WM'):
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    return [
+        {
+            'order_id': f"{prefix}-{i:08d}",
+            'date': (start + timedelta(days=rng.randrange(3650))).isoformat(),
+            'total': round(rng.uniform(5, 500), 2),
+            'items': rng.randint(1, 8),
+            'status': rng.choice(STATUSES)
+        }
+        for i in range(count)
+    ]
+
+
+def timed(func) -> float:
+    """Mean time of func() in microseconds"""
+    func()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func()
+    return (time.perf_counter() - start) / REPEAT * 1e6
+
+
+def sort_and_slice(orders, skip: int, status=None):
+    """Filter and sort the whole history, then slice a page"""
+    matching = [order for order in orders if status is None or order['status'] == status]
+    matching.sort(key=lambda order: (order['date'], order['order_id']), reverse=True)
+    return matching[skip:skip + PAGE]
+
+
+def cursor_at(source, pages: int) -> str:
+    cursor = None
+    for _ in range(pages):
+        cursor = source.get_orders('heavy', PAGE, cursor)['next_cursor']
+    return cursor
+
+
+def main(count: int = 100_000) -> None:
+    orders = synthetic_orders(count)
+    others = synthetic_orders(count, seed=6, prefix='OT')
+
+    index = OrderIndex()
+    start = time.perf_counter()
+    index.load(orders, 'heavy')
+    index.load(others, 'other')
+    index_ms = (time.perf_counter() - start) * 1000
+
+    store = SQLiteStore()
+    store.load_orders(orders, 'heavy')
+    store.load_orders(others, 'other')
+
+    deep_pages = count // PAGE // 2
+    deep_cursor = cursor_at(index, deep_pages)
+    assert cursor_at(store, deep_pages) == deep_cursor
+
+    def offset_page(skip: int):
+        with store.pool.connection() as connection:
+            return connection.execute(
+                "SELECT order_id, date, total, items, status FROM orders WHERE user_id = ? "
+                "ORDER BY date DESC, order_id DESC LIMIT ? OFFSET ?",
+                ('heavy', PAGE, skip)
+            ).fetchall()
+
+    expected = sort_and_slice(orders, deep_pages * PAGE)
+    assert index.get_orders('heavy', PAGE, deep_cursor)['orders'] == expected
+    assert [row[0] for row in offset_page(deep_pages * PAGE)] == [order['order_id'] for order in expected]
+    assert index.get_orders('heavy', PAGE, statuses=['returned'])['orders'] == sort_and_slice(orders, 0, 'Returned')
+
+    print(f"orders:            {count:,} for one customer, {count:,} for another (index built in {index_ms:.0f} ms)")
+    print(f"page size:         {PAGE}, deep page = page {deep_pages + 1}")
+    print(f"{'':18} {'sort + slice':>14} {'OrderIndex':>12} {'SQLite OFFSET':>15} {'SQLite keyset':>15}")
+    rows = [
+        (
+            "newest page",
+            lambda: sort_and_slice(orders, 0),
+            lambda: index.get_orders('heavy', PAGE),
+            lambda: offset_page(0),
+            lambda: store.get_orders('heavy', PAGE)
+        ),
+        (
+            "deep page",
+            lambda: sort_and_slice(orders, deep_pages * PAGE),
+            lambda: index.get_orders('heavy', PAGE, deep_cursor),
+            lambda: offset_page(deep_pages * PAGE),
+            lambda: store.get_orders('heavy', PAGE, deep_cursor)
+        ),
+        (
+            "status=Returned",
+            lambda: sort_and_slice(orders, 0, 'Returned'),
+            lambda: index.get_orders('heavy', PAGE, statuses=['returned']),
+            None,
+            lambda: store.get_orders('heavy', PAGE, statuses=['returned'])
+        )
+    ]
+    for label, *funcs in rows:
+        cells = [f"{timed(func):10.1f} us" if func is not None else "" for func in funcs]
+        print(f"{label:18} {cells[0]:>14} {cells[1]:>12} {cells[2]:>15} {cells[3]:>15}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
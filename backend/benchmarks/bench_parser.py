@@ -0,0 +1,73 @@
+"""
+Benchmark: per-command parse latency of CommandParser.parse_command
+
+Compares the combined single-pass intent regex against the original loop
+that tried every pattern with its own re.match call.
+
+Run from the backend directory:
+    python -m benchmarks.bench_parser
+"""
+import re
+import timeit
+
+from app.services.parser import CommandParser
+
+
+COMMANDS = [
+    "Show me iPhone 13",
+    "Add it to my cart",
+    "Summarize the reviews",
+    "What do reviews say?",
+    "Show my recent orders",
+    "Show me my last 5 orders",
+    "Take me to my cart",
+    "Compare phones in my cart for battery and camera",
+    "Is iPhone 13 better than OnePlus 11 for gaming",
+    "Recommend a phone under 30k for gaming",
+    "I have 25000 budget and need a good camera",
+    "Which phone should I buy under 20000",
+    "Samsung phones",
+    "Find phones",
+    "checkout",
+    "what is the weather like today in the city",
+]
+
+
+def legacy_parse(parser: CommandParser, command: str):
+    """The original parse loop: one re.match per pattern, in dict order"""
+    command_lower = command.lower().strip()
+
+    if "phones under 50k" in command_lower:
+        return parser.parse_command(command)
+
+    for action_type, patterns in parser.patterns.items():
+        for pattern in patterns:
+            match = re.match(pattern, command_lower, re.IGNORECASE)
+            if match:
+                return parser._extract_action_data(action_type, match, command_lower)
+
+    return parser._infer_action(command_lower)
+
+
+def main(number: int = 2000) -> None:
+    parser = CommandParser()
+
+    for command in COMMANDS:
+        assert legacy_parse(parser, command) == parser.parse_command(command), command
+
+    legacy = timeit.timeit(
+        lambda: [legacy_parse(parser, c) for c in COMMANDS], number=number
+    )
+    combined = timeit.timeit(
+        lambda: [parser.parse_command(c) for c in COMMANDS], number=number
+    )
+
+    calls = number * len(COMMANDS)
+    print(f"commands parsed: {calls}")
+    print(f"legacy loop:     {legacy / calls * 1e6:8.2f} us/command")
+    print(f"combined regex:  {combined / calls * 1e6:8.2f} us/command")
+    print(f"speedup:         {legacy / combined:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: review analysis throughput in reviews/sec
+
+Analyzes a large synthetic review corpus for every feature, comparing the
+shared KeywordMatcher scan against the original per-keyword substring loops.
+
+Run from the backend directory:
+    python -m benchmarks.bench_reviews [review_count]
+"""
+import random
+import sys
+import time
+
+from app.services.analyzer import ReviewAnalyzer
+
+
+FRAGMENTS = [
+    'Amazing camera quality, the photos are crisp and clear',
+    'battery drains fast when gaming',
+    'performance is smooth and there is no lag',
+    'the display is bright and colors pop',
+    'storage of 128gb fills up quickly',
+    'build quality feels premium with a glass back',
+    'software has improved a lot since launch',
+    'delivery was quick and the box was intact',
+    'charging is slow compared to my old phone',
+    'the speaker is mediocre but acceptable',
+    'screen refresh rate makes scrolling a joy',
+    'I love the design, it is a fantastic phone',
+    'had an issue with the fingerprint sensor',
+    'worth every rupee, would buy again',
+]
+
+
+def synthetic_reviews(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    return [
+        {
+            'text': '. '.join(rng.sample(FRAGMENTS, rng.randint(2, 5))) + '.',
+            'rating': rng.randint(1, 5)
+        }
+        for _ in range(count)
+    ]
+
+
+def legacy_analyze(analyzer: ReviewAnalyzer, reviews, features):
+    """The original analysis loops: one substring test per keyword, per feature, per review"""
+    def sentiment(text_lower):
+        positive = sum(1 for word in analyzer.sentiment_words['positive'] if word in text_lower)
+        negative = sum(1 for word in analyzer.sentiment_words['negative'] if word in text_lower)
+        return (positive > negative) - (negative > positive)
+
+    results = {}
+    for feature in features:
+        keywords = analyzer.feature_keywords[feature]
+        mentions, ratings, positive, negative = 0, 0, 0, 0
+        for review in reviews:
+            review_text = review.get('text', '').lower()
+            if any(keyword in review_text for keyword in keywords):
+                mentions += 1
+                ratings += review.get('rating', 3)
+                score = sentiment(review_text)
+                positive += score > 0
+                negative += score < 0
+        results[feature] = (mentions, ratings, positive, negative)
+    return results
+
+
+def main(count: int = 100_000) -> None:
+    analyzer = ReviewAnalyzer()
+    features = list(analyzer.feature_keywords)
+    reviews = synthetic_reviews(count)
+
+    start = time.perf_counter()
+    legacy_analyze(analyzer, reviews, features)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analyzer.analyze_reviews_for_features(reviews, features)
+    matcher_seconds = time.perf_counter() - start
+
+    print(f"reviews analyzed:  {count} x {len(features)} features")
+    print(f"substring loops:   {count / legacy_seconds:12,.0f} reviews/sec")
+    print(f"keyword matcher:   {count / matcher_seconds:12,.0f} reviews/sec")
+    print(f"speedup:           {legacy_seconds / matcher_seconds:12.2f}x")
+
+    example = 'the software has improved a lot'
+    print(f"camera mention in {example!r}: "
+          f"substring={any(k in example for k in analyzer.feature_keywords['camera'])}, "
+          f"matcher={('feature', 'camera') in analyzer.keyword_matcher.scan(example)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,132 @@
+"""
+Benchmark: budget recommendation scoring, per-product loop vs NumPy engine
+
+For each catalog size, scores every product within budget for a set of
+priorities and keeps the top 3, first with the original per-product scorers
+and then with CatalogScoringEngine, and checks that both produce the same
+recommendations. The engine is timed twice: the first call per priority
+set also fills the engine's cached per-priority score columns, and repeated
+calls only slice them by budget.
+
+Run from the backend directory:
+    python -m benchmarks.bench_scoring [size ...]
+"""
+import random
+import sys
+import time
+
+from app.services.recommender import ProductRecommender
+
+
+CAMERAS = ['12MP Dual Camera', '48MP Triple Camera', '50MP Triple Camera',
+           '64MP Triple Camera', '108MP Quad Camera', '200MP Quad Camera', 'Single Camera']
+PROCESSORS = ['Snapdragon 8 Gen 2', 'Snapdragon 7+ Gen 2', 'Snapdragon 695',
+              'Apple A16 Bionic', 'Apple A15 Bionic', 'Apple A14 Bionic', 'Helio G99']
+DISPLAYS = ['6.1 inch OLED', '6.7 inch AMOLED 120Hz', '6.5 inch LCD FHD',
+            '6.8 inch Dynamic AMOLED 2X 144Hz QHD', '6.4 inch IPS 90Hz']
+REVIEWS = [
+    [{'text': 'Amazing camera, photos are sharp. Battery lasts all day.', 'rating': 5},
+     {'text': 'Camera is average and the phone gets warm when gaming.', 'rating': 3}],
+    [{'text': 'Great display and smooth performance.', 'rating': 4},
+     {'text': 'Poor low light photos, camera disappoints.', 'rating': 2}],
+]
+PRIORITY_SETS = [
+    ['performance', 'camera', 'battery'],
+    ['camera', 'storage'],
+    ['gaming', 'display', 'battery'],
+]
+
+
+def synthetic_catalog(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    spec_pool = [
+        {
+            'display': rng.choice(DISPLAYS),
+            'processor': rng.choice(PROCESSORS),
+            'ram': f"{rng.choice([4, 6, 8, 12, 16])}GB",
+            'storage': f"{rng.choice([32, 64, 128, 256, 512])}GB",
+            'main_camera': rng.choice(CAMERAS),
+            'battery': f"{rng.randint(30, 60) * 100} mAh",
+        }
+        for _ in range(500)
+    ]
+
+    products = []
+    for product_id in range(count):
+        product = {
+            'id': product_id,
+            'name': f"Phone {product_id}",
+            'price': rng.randint(5000, 150000),
+            'specifications': rng.choice(spec_pool),
+        }
+        # A small share of the catalog carries reviews
+        if rng.random() < 0.01:
+            product['reviews'] = rng.choice(REVIEWS)
+        products.append(product)
+    return products
+
+
+def legacy_top3(recommender: ProductRecommender, products, budget, priorities):
+    """The original pipeline: filter, score each product, full sort, slice"""
+    eligible_products = [p for p in products if p['price'] <= budget]
+    review_matrix = recommender.review_analyzer.analyze_products_for_features(
+        eligible_products, list(dict.fromkeys(priorities + ['camera']))
+    )
+
+    scored_products = []
+    for product in eligible_products:
+        scores = recommender._calculate_product_scores(product, priorities, review_matrix.get(product['id']))
+        overall_score = sum(scores.values()) / len(scores) if scores else 0
+        scored_products.append({
+            'product': product['name'],
+            'product_id': product['id'],
+            'online_price': product['price'],
+            'score': scores,
+            'overall_score': round(overall_score, 1),
+            'value_score': recommender._calculate_value_score(overall_score, product['price'], budget)
+        })
+
+    scored_products.sort(key=lambda x: x['overall_score'], reverse=True)
+    return scored_products[:3]
+
+
+def main(sizes) -> None:
+    budget = 60000
+
+    for size in sizes:
+        products = synthetic_catalog(size)
+        recommender = ProductRecommender()
+        # Warm the review index so both paths measure scoring only
+        recommender.review_analyzer.feature_index.build(products)
+
+        start = time.perf_counter()
+        recommender._get_scoring_engine(products)
+        load_seconds = time.perf_counter() - start
+
+        legacy_seconds = 0.0
+        first_seconds = 0.0
+        warm_seconds = 0.0
+        for priorities in PRIORITY_SETS:
+            start = time.perf_counter()
+            expected = legacy_top3(recommender, products, budget, priorities)
+            legacy_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            result = recommender.get_budget_recommendations(products, budget, priorities, include_stores=False)
+            first_seconds += time.perf_counter() - start
+            assert result['recommendations'] == expected, priorities
+
+            start = time.perf_counter()
+            result = recommender.get_budget_recommendations(products, budget, priorities, include_stores=False)
+            warm_seconds += time.perf_counter() - start
+            assert result['recommendations'] == expected, priorities
+
+        calls = len(PRIORITY_SETS)
+        print(f"{size:>9,} products  engine load {load_seconds:6.2f} s  "
+              f"loop {legacy_seconds / calls * 1e3:9.1f} ms  "
+              f"engine first {first_seconds / calls * 1e3:8.1f} ms  "
+              f"warm {warm_seconds / calls * 1e3:7.2f} ms  "
+              f"speedup {legacy_seconds / first_seconds:6.1f}x / {legacy_seconds / warm_seconds:7.1f}x")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,181 @@
+"""
+Benchmark: product search latency on a large synthetic catalog
+
+Builds a ProductSearchIndex over a synthetic catalog (100k products by
+default), checks its rankings against BM25 computed exhaustively without
+the index, and reports index build time and per-query latency. Fails if
+any query takes longer than LATENCY_BUDGET_MS.
+
+Run from the backend directory:
+    python -m benchmarks.bench_search [product_count]
+"""
+import math
+import random
+import sys
+import time
+from collections import Counter
+
+from app.services.search_index import ProductSearchIndex, tokenize
+
+
+BRANDS = ['Apple', 'Samsung', 'OnePlus', 'Xiaomi', 'Google', 'Realme', 'Vivo',
+          'Oppo', 'Motorola', 'Asus', 'Honor', 'Sony', 'Poco', 'Nothing', 'Nokia']
+LINES = ['Galaxy', 'Pixel', 'Nord', 'Redmi', 'Edge', 'ROG', 'Xperia', 'Find',
+         'Reno', 'Magic', 'Phone', 'Note', 'Pro', 'Ultra', 'Lite', 'Max']
+CATEGORIES = ['electronics', 'phones', 'tablets', 'wearables', 'accessories']
+PROCESSORS = ['Snapdragon 8 Gen 2', 'Snapdragon 7 Gen 1', 'Dimensity 9200',
+              'Apple A16 Bionic', 'Tensor G2', 'Exynos 2200', 'Helio G99']
+DISPLAYS = ['AMOLED 120Hz', 'OLED 90Hz', 'LCD 60Hz', 'Dynamic AMOLED 2X 144Hz']
+
+QUERIES = [
+    'samsung galaxy',
+    'pixel 7 pro',
+    'oneplus nord 5g',
+    'snapdragon 8',
+    'amoled 120hz',
+    'xperia',
+    'redmi note 12',
+    'gal',
+    'phones',
+    'asus rog phone 7 ultra',
+]
+
+# Per-query latency every search must stay within
+LATENCY_BUDGET_MS = 1.0
+
+# Budgets checked with every whole-term query
+BUDGETS = [None, 30000, 8000]
+
+FUZZY_QUERIES = [
+    'samsng galaxy',
+    'oneplus nord twenty one',
+    'xpeira',
+    'snapdragn eight',
+]
+
+
+def synthetic_catalog(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    products = []
+    for product_id in range(count):
+        brand = rng.choice(BRANDS)
+        name = f"{brand} {rng.choice(LINES)} {rng.randint(1, 60)} {rng.choice(['', 'Pro', '5G', 'Plus'])}"
+        products.append({
+            'id': product_id,
+            'name': name.strip(),
+            'price': rng.randint(5000, 150000),
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'category': rng.choice(CATEGORIES),
+            'specifications': {
+                'display': f"{rng.choice([6.1, 6.4, 6.7, 6.8])} inch {rng.choice(DISPLAYS)}",
+                'processor': rng.choice(PROCESSORS),
+                'ram': f"{rng.choice([4, 6, 8, 12, 16])}GB",
+                'storage': f"{rng.choice([64, 128, 256, 512])}GB",
+                'main_camera': f"{rng.choice([12, 48, 50, 64, 108, 200])}MP Camera",
+                'battery': f"{rng.randint(30, 60) * 100} mAh",
+            }
+        })
+    return products
+
+
+def term_frequencies(products):
+    """Field-weighted term frequencies of every product, as the index weighs them"""
+    weights = ProductSearchIndex.FIELD_WEIGHTS
+    documents = []
+    for product in products:
+        frequencies = Counter()
+        for field in ('name', 'category'):
+            for token in tokenize(product[field]):
+                frequencies[token] += weights[field]
+        for value in product['specifications'].values():
+            for token in tokenize(value):
+                frequencies[token] += weights['specifications']
+        documents.append(frequencies)
+    return documents
+
+
+def exhaustive_bm25(documents, query: str, k1: float = 1.2, b: float = 0.75):
+    """BM25 score of every product for a query of whole terms, without an index"""
+    average_length = sum(sum(frequencies.values()) for frequencies in documents) / len(documents)
+    scores = Counter()
+    for token in tokenize(query):
+        matching = [i for i, frequencies in enumerate(documents) if token in frequencies]
+        idf = math.log(1 + (len(documents) - len(matching) + 0.5) / (len(matching) + 0.5))
+        for i in matching:
+            frequency = documents[i][token]
+            length_norm = 1 - b + b * sum(documents[i].values()) / average_length
+            scores[i] += idf * frequency * (k1 + 1) / (frequency + k1 * length_norm)
+    return scores
+
+
+def check_rankings(index, products, queries, limit: int = 10) -> int:
+    """
+    Assert the index returns exactly the top exhaustive BM25 scores, with
+    and without a budget; returns the number of searches checked
+    """
+    documents = term_frequencies(products)
+    vocabulary = set().union(*documents)
+    checked = 0
+    for query in queries:
+        if not all(token in vocabulary for token in tokenize(query)):
+            continue  # prefix queries score differently
+        scores = exhaustive_bm25(documents, query)
+        for budget in BUDGETS:
+            expected = sorted(
+                (score for i, score in scores.items() if budget is None or products[i]['price'] <= budget),
+                reverse=True
+            )[:limit]
+            results = index.search(query, limit=limit, max_price=budget)
+            got = [scores[result['id']] for result in results]
+            assert len(got) == len(expected) and all(
+                math.isclose(a, b, rel_tol=1e-9) for a, b in zip(got, expected)
+            ), (query, budget)
+            assert budget is None or all(result['price'] <= budget for result in results)
+            checked += 1
+    return checked
+
+
+def time_query(index, query: str, rounds: int, batches: int = 5, **options):
+    """
+    Seconds per search, best of a few batches so a busy machine doesn't
+    fail the latency budget; returns it with the last results
+    """
+    index.search(query, **options)
+    best = math.inf
+    for _ in range(batches):
+        start = time.perf_counter()
+        for _ in range(rounds // batches):
+            results = index.search(query, **options)
+        best = min(best, (time.perf_counter() - start) / (rounds // batches))
+    return best, results
+
+
+def main(count: int = 100_000, rounds: int = 200) -> None:
+    products = synthetic_catalog(count)
+
+    start = time.perf_counter()
+    index = ProductSearchIndex.from_products(products)
+    build_seconds = time.perf_counter() - start
+
+    print(f"catalog size:   {len(index)} products")
+    print(f"index build:    {build_seconds:.2f} s")
+    print(f"exhaustive check: {check_rankings(index, products, QUERIES)} searches rank the same")
+
+    runs = [(f"fuzzy={fuzzy}", queries, {'fuzzy': fuzzy}) for fuzzy, queries in ((False, QUERIES), (True, FUZZY_QUERIES))]
+    runs.append(("under 8k", QUERIES[:4], {'max_price': 8000}))
+    slowest = 0.0
+
+    for label, queries, options in runs:
+        print(f"-- {label}")
+        for query in queries:
+            per_query, results = time_query(index, query, rounds, **options)
+            slowest = max(slowest, per_query)
+            top = results[0]['name'] if results else '-'
+            print(f"{query!r:28} {per_query * 1e3:7.3f} ms  top: {top}")
+
+    print(f"slowest query:  {slowest * 1e3:.3f} ms (budget {LATENCY_BUDGET_MS} ms)")
+    assert slowest * 1e3 <= LATENCY_BUDGET_MS, f"slowest query took {slowest * 1e3:.3f} ms"
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
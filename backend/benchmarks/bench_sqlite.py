@@ -0,0 +1,129 @@
+"""
+Benchmark: SQLite store with a large review corpus
+
+Loads a synthetic catalog (10k products sharing 1M reviews by default) into
+an on-disk SQLiteStore and measures:
+- FTS5 product search latency
+- feature analysis for one product from its indexed reviews
+- catalog-wide feature analysis with the trigram prefilter vs a full scan
+
+Every store result is checked against the in-memory ReviewAnalyzer.
+
+Run from the backend directory:
+    python -m benchmarks.bench_sqlite [review_count] [product_count]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from app.services.analyzer import ReviewAnalyzer
+from app.services.sqlite_store import SQLiteStore
+from benchmarks.bench_reviews import synthetic_reviews
+
+
+BRANDS = ['Samsung', 'OnePlus', 'Xiaomi', 'Realme', 'Vivo', 'Oppo', 'Motorola', 'Nothing', 'Google', 'Apple']
+QUERIES = ['samsung', 'oneplus 5g', 'xiaomi phones', 'pixel', 'realme 128gb', 'nothing phone']
+
+
+def synthetic_products(product_count: int, review_count: int, seed: int = 5):
+    rng = random.Random(seed)
+    reviews = synthetic_reviews(review_count)
+    per_product, extra = divmod(review_count, product_count)
+    position = 0
+    products = []
+    for product_id in range(1, product_count + 1):
+        share = per_product + (product_id <= extra)
+        brand = rng.choice(BRANDS)
+        products.append({
+            'id': product_id,
+            'name': f"{brand} {rng.choice(['Phone', 'Pixel', 'Note', 'Pro', 'Max'])} {rng.randint(1, 99)}",
+            'price': rng.randint(80, 1500) * 100 - 1,
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'reviews_count': share,
+            'category': 'Smartphones',
+            'specifications': {
+                'storage': f"{rng.choice([64, 128, 256, 512])}GB",
+                'ram': f"{rng.choice([4, 6, 8, 12])}GB",
+                'network': rng.choice(['4G', '5G'])
+            },
+            'reviews': reviews[position:position + share]
+        })
+        position += share
+    return products
+
+
+def timed(func, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples) * 1000
+
+
+def main(review_count: int = 1_000_000, product_count: int = 10_000) -> None:
+    analyzer = ReviewAnalyzer()
+    features = list(analyzer.feature_keywords)
+    products = synthetic_products(product_count, review_count)
+    by_id = {product['id']: product for product in products}
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteStore(os.path.join(directory, 'bench.db'))
+
+        start = time.perf_counter()
+        store.load_products(products)
+        load_seconds = time.perf_counter() - start
+        print(f"loaded:            {product_count:,} products, {review_count:,} reviews "
+              f"in {load_seconds:.1f}s ({review_count / load_seconds:,.0f} reviews/sec)")
+
+        print("\nproduct search (median of 20):")
+        for query in QUERIES:
+            results, ms = timed(lambda: store.search_products(query, limit=10), 20)
+            print(f"  {query!r:18} {ms:8.2f} ms  {len(results)} results")
+
+        print("\nper-product feature analysis (median over 200 products):")
+        rng = random.Random(3)
+        sample_ids = rng.sample(list(by_id), min(200, product_count))
+        samples = []
+        for product_id in sample_ids:
+            start = time.perf_counter()
+            stored = store.analyze_products([product_id], features, analyzer)
+            samples.append(time.perf_counter() - start)
+            expected = analyzer.analyze_reviews_for_features(by_id[product_id]['reviews'], features)
+            assert stored.get(product_id, {}) == (expected if by_id[product_id]['reviews'] else {}), product_id
+        print(f"  all {len(features)} features:   {statistics.median(samples) * 1000:8.2f} ms per product")
+
+        print("\ncatalog-wide feature analysis:")
+        with store.pool.connection() as connection:
+            all_reviews = [
+                {'text': text, 'rating': rating}
+                for text, rating in connection.execute("SELECT text, rating FROM reviews ORDER BY id")
+            ]
+        for feature in features:
+            keywords = analyzer.feature_keywords[feature]
+            prefiltered = all(len(keyword) >= 3 for keyword in keywords)
+
+            start = time.perf_counter()
+            stored = store.analyze_feature(feature, analyzer)
+            store_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            expected = analyzer.analyze_reviews_for_features(all_reviews, [feature])[feature]
+            scan_ms = (time.perf_counter() - start) * 1000
+
+            assert stored == expected, feature
+            mode = 'trigram prefilter' if prefiltered else 'full scan        '
+            print(f"  {feature:13} {mode} {store_ms:9.1f} ms   in-memory scan {scan_ms:9.1f} ms   "
+                  f"{stored['mention_count']:,} mentions")
+
+        store.close()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    )
@@ -0,0 +1,151 @@
+"""
+Benchmark: agent commands per second, HTTP against the WebSocket channel
+
+Serves the app from one uvicorn worker in a separate process and has
+concurrent clients run the demo conversation (search, add to cart,
+compare, reviews) four ways:
+
+- HTTP with a new connection per command
+- HTTP over one keep-alive connection per client
+
+The HTTP clients are plain asyncio streams, so the client side stays
+cheap next to the server it measures; WebSocket clients turn off
+per-message compression, which would otherwise dominate the server's
+time on multi-KB answers.
+- WebSocket, waiting for each answer before sending the next command
+- WebSocket, pipelined: up to WINDOW commands in flight per client
+
+Run from the backend directory:
+    python -m benchmarks.bench_websocket [clients] [commands_per_client]
+"""
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+
+from benchmarks.bench_dispatch import free_port
+
+
+CONVERSATION = [
+    "Show me iPhone 13",
+    "Add it to my cart",
+    "Show me OnePlus 11",
+    "Add it to my cart",
+    "Compare phones in my cart for battery and camera",
+    "What do reviews say?",
+]
+WINDOW = 8
+HOST = "127.0.0.1"
+
+
+def start_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", HOST,
+         "--port", str(port), "--workers", "1", "--log-level", "warning"]
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://{HOST}:{port}/health")
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def commands(count: int):
+    return [CONVERSATION[i % len(CONVERSATION)] for i in range(count)]
+
+
+async def post_command(reader, writer, host: str, session_id: str, command: str, keep_alive: bool) -> None:
+    """POST /command over an open connection and read the whole response"""
+    body = json.dumps({"command": command, "session_id": session_id}).encode()
+    writer.write(
+        f"POST /api/agent/command HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+    )
+    head = await reader.readuntil(b"\r\n\r\n")
+    status, *headers = head.decode().split("\r\n")
+    assert " 200 " in status, status
+    length = next(int(line.split(":", 1)[1]) for line in headers if line.lower().startswith("content-length:"))
+    json.loads(await reader.readexactly(length))
+
+
+async def http_new_connection(host: str, port: int, session_id: str, count: int) -> None:
+    for command in commands(count):
+        reader, writer = await asyncio.open_connection(host, port)
+        await post_command(reader, writer, host, session_id, command, keep_alive=False)
+        writer.close()
+        await writer.wait_closed()
+
+
+async def http_keep_alive(host: str, port: int, session_id: str, count: int) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    for command in commands(count):
+        await post_command(reader, writer, host, session_id, command, keep_alive=True)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def websocket_client(host: str, port: int, session_id: str, count: int, window: int) -> None:
+    url = f"ws://{host}:{port}/api/agent/ws?session_id={session_id}"
+    async with websockets.connect(url, max_size=None, compression=None) as ws:
+        assert json.loads(await ws.recv())["type"] == "session"
+        pending = commands(count)
+        sent = answered = 0
+        while answered < count:
+            while sent < count and sent - answered < window:
+                await ws.send(json.dumps({"type": "command", "id": sent, "command": pending[sent]}))
+                sent += 1
+            message = json.loads(await ws.recv())
+            if message.get("id") is None:
+                continue  # pushed cart or price update
+            assert message["type"] == "response" and message["id"] == answered, message
+            answered += 1
+
+
+async def websocket_sequential(host: str, port: int, session_id: str, count: int) -> None:
+    await websocket_client(host, port, session_id, count, 1)
+
+
+async def websocket_pipelined(host: str, port: int, session_id: str, count: int) -> None:
+    await websocket_client(host, port, session_id, count, WINDOW)
+
+
+async def throughput(client, port: int, label: str, clients: int, count: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(client(HOST, port, f"bench-{label}-{i}", count) for i in range(clients)))
+    return clients * count / (time.perf_counter() - start)
+
+
+async def run(port: int, clients: int, count: int) -> None:
+    await throughput(http_keep_alive, port, "warmup", clients, len(CONVERSATION))
+
+    print(f"clients: {clients}, commands per client: {count}, one server worker")
+    for label, client in [
+        ("http-new", http_new_connection),
+        ("http-keepalive", http_keep_alive),
+        ("ws-sequential", websocket_sequential),
+        ("ws-pipelined", websocket_pipelined),
+    ]:
+        rate = await throughput(client, port, label, clients, count)
+        print(f"{label:16} {rate:8.0f} commands/s")
+
+
+def main(clients: int = 16, count: int = 60) -> None:
+    port = free_port()
+    server = start_server(port)
+    try:
+        asyncio.run(run(port, clients, count))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))